@@ -21,6 +21,11 @@ class Configurations:
         # data
         self._data_directory = None
         self.root_file = pathlib.Path(sys.argv[0])
+        self._cache_directory = None
+        self.equipment_interface_cache = True  # keep parsed EquipmentInterfaces on disk (see cache_directory)
+        self.master_controller_journal = False  # journal job queue on disk; restored on restart (see cache_directory)
+        self.buffer_flush_interval = 0.5  # sec; buffers waiting to be saved are written (and flushed) together
+        self.buffer_fsync = False  # fsync buffer files at every flush (survives power loss; slower)
 
         # logging
         self.logging = True
@@ -39,8 +44,14 @@ class Configurations:
         self.rabbit_password = 'guest'
         self.rabbit_exchange = 'chembot'
         self.rabbit_queue_timeout = 1  # sec
+        self.rabbit_queue_cache = True  # cache queue existence checks done before sending a message
+        self.rabbit_queue_cache_timeout = 5  # sec; time before a cached queue is checked with the server again
         self.rabbit_auth = (self.rabbit_username, self.rabbit_password)
         self.pickle_protocol = 5
+        self.rabbit_codec = "pickle"  # wire format of RabbitMessages; see chembot.rabbitmq.messages
+        # (pickle, compact, shared_memory)
+        self.rabbit_out_of_band_size = 1024  # bytes; numpy arrays in replies larger than this are sent out-of-band
+        self.rabbit_shared_memory_lifetime = 60  # sec; time the 'shared_memory' codec keeps arrays for the receiver
 
     @property
     def data_directory(self) -> pathlib.Path:
@@ -61,6 +72,22 @@ class Configurations:
 
         self._data_directory = data_directory
 
+    @property
+    def cache_directory(self) -> pathlib.Path:
+        if self._cache_directory is None:
+            # create new folder 'cache'; not dated as the content is reused between runs
+            self._cache_directory = self.root_file.parent / pathlib.Path("cache")
+            create_folder(self._cache_directory)
+
+        return self._cache_directory
+
+    @cache_directory.setter
+    def cache_directory(self, cache_directory: str):
+        if not check_if_folder_exists(cache_directory):
+            raise ValueError("'cache_directory' not found.")
+
+        self._cache_directory = pathlib.Path(cache_directory)
+
     @property
     def logging_directory(self) -> pathlib.Path:
         if self._logging_directory is None:
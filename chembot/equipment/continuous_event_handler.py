@@ -1,4 +1,5 @@
 import abc
+import inspect
 import typing
 from typing import Callable, Sequence
 import time
@@ -110,9 +111,10 @@ class ContinuousEventHandlerRepeating(ContinuousEventHandlerRepeatingNoEnd):
         self.max_repeats = max_repeats
 
     def poll(self, parent: ParentInterfaceContinuousEventHandler):
-        super().poll(parent)
+        result = super().poll(parent)
         if self.max_repeats is not None and self.max_repeats == self.event_counter:
             parent.profile = None
+        return result
 
 
 class ContinuousEventHandlerProfile(ContinuousEventHandler):
@@ -190,6 +192,14 @@ class ContinuousEventHandlerRepeatingNoEndSaving(ContinuousEventHandlerRepeating
 
     def poll(self, parent: ParentInterfaceContinuousEventHandler):
         result = super().poll(parent)
+        if inspect.isawaitable(result):  # AsyncEquipment
+            return self._save_async(parent, result)
+        return self._save(parent, result)
+
+    async def _save_async(self, parent: ParentInterfaceContinuousEventHandler, result: typing.Awaitable):
+        return self._save(parent, await result)
+
+    def _save(self, parent: ParentInterfaceContinuousEventHandler, result):
         if result is None:
             return
 
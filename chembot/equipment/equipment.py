@@ -1,18 +1,21 @@
 import abc
+import concurrent.futures
 import logging
 import queue
+import threading
 import time
 
 from unitpy import Quantity
 
 from chembot.configuration import config
-from chembot.utils.class_building import get_actions_list
+from chembot.utils.class_building import get_actions_list, is_long_running
 from chembot.equipment.equipment_interface import EquipmentState, get_equipment_interface
 from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageReply, RabbitMessageAction, RabbitMessageRegister, \
     RabbitMessageError, RabbitMessageCritical, RabbitMessageUnRegister
 from chembot.rabbitmq.rabbit_core import RabbitMQConnection
 from chembot.rabbitmq.watchdog import RabbitWatchdog
 from chembot.equipment.continuous_event_handler import ContinuousEventHandler
+from chembot.utils.buffers.buffer_writer_service import get_buffer_metrics
 
 logger = logging.getLogger(config.root_logger_name + ".equipment")
 
@@ -30,10 +33,45 @@ class EquipmentConfig:
         self.min_temperature = min_temperature
 
 
+class RunningAction:
+    """ long-running action submitted to the equipment's worker pool """
+    __slots__ = ("message", "future", "time_submitted", "time_start", "time_end", "cancel_event")
+
+    def __init__(self, message: RabbitMessageAction):
+        self.message = message
+        self.future: concurrent.futures.Future | None = None
+        self.time_submitted = time.monotonic()
+        self.time_start: float | None = None
+        self.time_end: float | None = None
+        self.cancel_event = threading.Event()  # set by write_stop
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def execution_time(self) -> float:
+        if self.time_start is None:
+            return 0
+        if self.time_end is None:
+            return time.monotonic() - self.time_start
+        return self.time_end - self.time_start
+
+
 class Equipment(abc.ABC):
-    """ Equipment """
+    """
+    Equipment
+
+    write_* actions decorated with @long_running (chembot.utils.class_building) are executed on a worker pool
+    (max_workers threads), so the equipment loop keeps processing messages (e.g. write_stop) and watchdogs. The reply is
+    sent when the action finishes. Long-running actions may send messages, but must not consume them.
+    write_stop cancels them: each action has its own cancel flag, which it checks with action_cancelled (or waits on
+    with wait_cancelled()) to return early.
+    """
     pulse = 0.01  # time of each loop in seconds
     states = EquipmentState
+    max_workers = 1  # threads for long-running actions
+    max_queued_actions = 4  # long-running actions (running + waiting) before new ones are refused
 
     def __init__(self, name: str, **kwargs):
         """
@@ -51,14 +89,20 @@ class Equipment(abc.ABC):
         self.actions = get_actions_list(self)
         self.equipment_interface = get_equipment_interface(type(self))
         self.attrs = []
-        self.update = ["state"]
+        self.update = ["state", "buffer_metrics"]
 
         # managers
-        self.rabbit = RabbitMQConnection(name)
+        self.rabbit = self._create_rabbit_connection()
         self.watchdog = RabbitWatchdog(self)
         self.continuous_event_handler: ContinuousEventHandler | None = None
         self._message_queue = queue.Queue(maxsize=6)  # short term storage for later processing (typically used in
         # continuous mode)
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None  # created on first long-running action
+        self._running_actions: list[RunningAction] = []
+        self._action_local = threading.local()  # .action: RunningAction of the worker thread
+        self.action_execution_time: dict[str, float] = {}  # key: action, value: last execution time (s)
+        if any(is_long_running(getattr(type(self), action)) for action in self.actions):
+            self.update += ["action_queue_depth", "action_execution_time"]
 
         # flags
         self._deactivation_event = False  # set to True to deactivate
@@ -67,14 +111,20 @@ class Equipment(abc.ABC):
             for k, v in kwargs:
                 setattr(self, k, v)
 
+    def _create_rabbit_connection(self) -> RabbitMQConnection:
+        return RabbitMQConnection(self.name)
+
     def _register_equipment(self):
         if not self.rabbit.queue_exists("master_controller"):
             logger.critical(config.log_formatter(self, self.name, "No MasterController found on the server."))
             raise ValueError("No MasterController found on the server.")
 
-        # update parameters
-        message = RabbitMessageRegister(self.name, self.equipment_interface)
-        self.rabbit.send_and_consume(message, error_out=True)
+        # only the interface hash is sent; the full interface if the master controller doesn't know it yet
+        message = RabbitMessageRegister(self.name, self.equipment_interface.hash_)
+        reply = self.rabbit.send_and_consume(message, error_out=True)
+        if not reply.value:
+            message = RabbitMessageRegister(self.name, self.equipment_interface.hash_, self.equipment_interface)
+            self.rabbit.send_and_consume(message, error_out=True)
 
     def _unregister_equipment(self):
         if not self.rabbit.queue_exists("master_controller"):
@@ -113,18 +163,24 @@ class Equipment(abc.ABC):
 
     def _run(self):
         """ Main / infinite event loop """
+        self.rabbit.bind_thread()
         while not self._deactivation_event:
             self._poll_status()
             self.watchdog.check_watchdogs()
+            self._check_running_actions()
 
-            # read message
-            self._process_message(self.rabbit.consume())
+            # read message (blocks till a message arrives or the next continuous event is due)
+            self._process_message(self.rabbit.consume(self._get_wait_time()))
 
             # execute continuous commands
             if self.continuous_event_handler is not None:
                 self.continuous_event_handler.poll(self)
-            else:
-                time.sleep(self.pulse)
+
+    def _get_wait_time(self) -> float:
+        """ time till the next continuous event is due; never longer than pulse (watchdogs need checking) """
+        if self.continuous_event_handler is None or self.continuous_event_handler.next_time is None:
+            return self.pulse
+        return min(max(self.continuous_event_handler.next_time - time.time(), 0), self.pulse)
 
     def _poll_status(self):
         pass
@@ -147,18 +203,115 @@ class Equipment(abc.ABC):
                     logger.exception('Build of RabbitMessageReply in queue. '
                                      f'The following message dropped: \n{message.to_str()}')
         elif isinstance(message, RabbitMessageAction):
-            reply = self._execute_action(message, message.action, message.kwargs)
-            if reply is not None:
-                self.rabbit.send(RabbitMessageReply.create_reply(message, reply))
-            logger.info(
-                config.log_formatter(self, self.name, f"Action | {message.action}: {message.kwargs}"
-                                                      f"\n reply: {repr(reply)}"))
+            self._process_action(message)
         else:
             logger.warning("Invalid message!!" + message.to_str())
             self.rabbit.send(RabbitMessageError(self.name, f"InvalidMessage: {message.to_str()}"))
 
+    def _process_action(self, message: RabbitMessageAction):
+        if is_long_running(getattr(self, message.action, None)):
+            self._submit_action(message)
+            return
+
+        reply = self._execute_action(message, message.action, message.kwargs)
+        self._send_reply(message, reply)
+
+    @property
+    def action_queue_depth(self) -> int:
+        """ number of long-running actions running or waiting for a worker """
+        return len(self._running_actions)
+
+    @property
+    def buffer_metrics(self) -> dict[str, dict]:
+        """ backpressure of the buffers created with owner=self.name (key: buffer name; see BufferWriterService) """
+        return get_buffer_metrics(self.name)
+
+    @property
+    def action_cancelled(self) -> bool:
+        """
+        True once write_stop cancelled the long-running action calling it; it should return early. False outside of
+        long-running actions.
+        """
+        action = getattr(self._action_local, "action", None)
+        return action is not None and action.cancelled
+
+    def wait_cancelled(self, timeout: float) -> bool:
+        """ sleep for a long-running action; returns True (early) if it is cancelled meanwhile """
+        action = getattr(self._action_local, "action", None)
+        if action is None:
+            time.sleep(timeout)
+            return False
+        return action.cancel_event.wait(timeout)
+
+    def _submit_action(self, message: RabbitMessageAction):
+        if len(self._running_actions) >= self.max_queued_actions:
+            logger.error(config.log_formatter(self, self.name, "ActionQueueFull" + message.to_str()))
+            self.rabbit.send(RabbitMessageError(self.name, f"ActionQueueFull: {message.to_str()}"), check=False)
+            return
+
+        action = RunningAction(message)
+        action.future = self._get_executor().submit(self._run_action, action)
+        self._running_actions.append(action)
+        logger.debug(config.log_formatter(self, self.name, f"Action submitted | {message.action}"))
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """ worker pool of the long-running actions (created on first use) """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _run_action(self, action: RunningAction):
+        """ runs in worker thread; exceptions are handled by _check_running_actions() in the equipment loop """
+        action.time_start = time.monotonic()
+        self._action_local.action = action
+        try:
+            func = getattr(self, action.message.action)
+            if func.__code__.co_argcount == 1 or action.message.kwargs is None:  # the '1' is 'self'
+                return func()
+            return func(**action.message.kwargs)
+        finally:
+            self._action_local.action = None
+            action.time_end = time.monotonic()
+
+    def _check_running_actions(self):
+        """ send replies of finished long-running actions """
+        if not self._running_actions:
+            return
+
+        running = []
+        for action in self._running_actions:
+            if not action.future.done():
+                running.append(action)
+                continue
+            if action.cancelled or action.future.cancelled():
+                logger.info(config.log_formatter(self, self.name, f"Action cancelled | {action.message.action}"))
+                continue
+
+            message = action.message
+            self.action_execution_time[message.action] = action.execution_time
+            if action.future.exception() is not None:
+                logger.error(config.log_formatter(self, self.name, "ActionError" + message.to_str()),
+                             exc_info=action.future.exception())
+                self.rabbit.send(RabbitMessageError(self.name, f"ActionError: {message.to_str()}"), check=False)
+                continue
+            self._send_reply(message, action.future.result())
+
+        self._running_actions = running
+
+    def _cancel_actions(self):
+        """ waiting actions are dropped; running ones get action_cancelled and their reply is not sent """
+        for action in self._running_actions:
+            action.cancel_event.set()
+            action.future.cancel()
+
+    def _send_reply(self, message: RabbitMessageAction, reply):
+        if reply is not None:
+            self.rabbit.send(RabbitMessageReply.create_reply(message, reply))
+        logger.info(
+            config.log_formatter(self, self.name, f"Action | {message.action}: {message.kwargs}"
+                                                  f"\n reply: {repr(reply)}"))
+
     def _execute_action(self, message: RabbitMessage, func_name: str, kwargs: dict | None):
-        # TODO: wrap this into a thread and use a queue
         try:
             func = getattr(self, func_name)
             if func.__code__.co_argcount == 1 or kwargs is None:  # the '1' is 'self'
@@ -239,6 +392,7 @@ class Equipment(abc.ABC):
         if self.continuous_event_handler is not None:
             self.continuous_event_handler.stop()
             self.continuous_event_handler = None
+        self._cancel_actions()
         self._stop()
 
     def write_continuous_event_handler(self, event_handler: ContinuousEventHandler):
@@ -255,6 +409,9 @@ class Equipment(abc.ABC):
 
     def _deactivate_(self):
         self.state = self.states.SHUTTING_DOWN
+        if self._executor is not None:
+            self._cancel_actions()
+            self._executor.shutdown(wait=False, cancel_futures=True)
         self._unregister_equipment()
         self.rabbit.deactivate()
 
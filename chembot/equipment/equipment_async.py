@@ -0,0 +1,144 @@
+import abc
+import asyncio
+import functools
+import inspect
+import logging
+
+from chembot.configuration import config
+from chembot.equipment.equipment import Equipment
+from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageAction, RabbitMessageRegister, \
+    RabbitMessageUnRegister, RabbitMessageError
+from chembot.rabbitmq.rabbit_async import AsyncRabbitMQConnection
+from chembot.utils.class_building import is_long_running
+
+logger = logging.getLogger(config.root_logger_name + ".equipment")
+
+
+class AsyncEquipment(Equipment, abc.ABC):
+    """
+    Equipment that runs on an asyncio event loop, so all equipment of a process can share one thread
+    (see chembot.utils.asyncio_utils.AsyncEquipmentManager).
+
+    read_*/write_* actions can be normal functions or coroutines ('async def'). Blocking I/O (serial, sockets, ...)
+    should be awaited through run_blocking() so it doesn't stall the other equipment on the loop. @long_running
+    actions run on the worker pool, as for Equipment.
+    """
+    rabbit: AsyncRabbitMQConnection
+
+    def _create_rabbit_connection(self) -> AsyncRabbitMQConnection:
+        return AsyncRabbitMQConnection(self.name)  # opened in activate() as it needs the event loop
+
+    @staticmethod
+    async def run_blocking(func, *args, **kwargs):
+        """ run blocking function in the default executor """
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _register_equipment(self):
+        if not await self.rabbit.queue_exists("master_controller"):
+            logger.critical(config.log_formatter(self, self.name, "No MasterController found on the server."))
+            raise ValueError("No MasterController found on the server.")
+
+        # only the interface hash is sent; the full interface if the master controller doesn't know it yet
+        message = RabbitMessageRegister(self.name, self.equipment_interface.hash_)
+        reply = await self.rabbit.send_and_consume(message, error_out=True)
+        if not reply.value:
+            message = RabbitMessageRegister(self.name, self.equipment_interface.hash_, self.equipment_interface)
+            await self.rabbit.send_and_consume(message, error_out=True)
+
+    async def _unregister_equipment(self):
+        if not await self.rabbit.queue_exists("master_controller"):
+            logger.critical(config.log_formatter(self, self.name, "No MasterController found, so can't skip "
+                                                                  "unregistering."))
+            return
+
+        # update parameters
+        message = RabbitMessageUnRegister(self.name)
+        self.rabbit.send(message)
+        self.watchdog.set_watchdog(message, 5)
+
+    async def activate(self):
+        """ Called to start equipment infinite loop. """
+        try:
+            logger.debug(config.log_formatter(self, self.name, "Activating"))
+            await self.rabbit.open()
+            await self._maybe_await(self._activate())
+            await self._register_equipment()
+            logger.info(config.log_formatter(self, self.name, "Activated\n" + "#" * 80 + "\n\n"))
+            self.state = self.states.STANDBY
+
+            await self._run()  # infinite loop
+
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            logger.info(config.log_formatter(self, self.name, "Cancelled"))
+
+        finally:
+            logger.debug(config.log_formatter(self, self.name, "Deactivating"))
+
+            try:
+                await self._maybe_await(self._deactivate())
+                await self._deactivate_()
+            except Exception as e:
+                logger.exception(str(e))
+            logger.info(config.log_formatter(self, self.name, "Deactivated"))
+
+    async def _run(self):
+        """ Main / infinite event loop """
+        while not self._deactivation_event:
+            self._poll_status()
+            self.watchdog.check_watchdogs()
+            self._check_running_actions()
+
+            # read message (waits till a message arrives or the next continuous event is due)
+            await self._process_message(await self.rabbit.consume(self._get_wait_time()))
+
+            # execute continuous commands
+            if self.continuous_event_handler is not None:
+                await self._maybe_await(self.continuous_event_handler.poll(self))
+
+    async def _process_message(self, message: RabbitMessage):
+        if isinstance(message, RabbitMessageAction):
+            await self._process_action(message)
+        else:
+            super()._process_message(message)
+
+    async def _process_action(self, message: RabbitMessageAction):
+        if is_long_running(getattr(self, message.action, None)):
+            self._submit_action(message)  # reply is sent by _check_running_actions()
+            return
+
+        reply = await self._execute_action(message, message.action, message.kwargs)
+        self._send_reply(message, reply)
+
+    async def _execute_action(self, message: RabbitMessage, func_name: str, kwargs: dict | None):
+        try:
+            func = getattr(self, func_name)
+            if func.__code__.co_argcount == 1 or kwargs is None:  # the '1' is 'self'
+                reply = func()
+            else:
+                reply = func(**kwargs)
+            reply = await self._maybe_await(reply)
+
+            # we need the message to be added to continuous_event_handler but not sure where best to put it
+            if isinstance(message, RabbitMessageAction) and \
+                    message.action == self.write_continuous_event_handler.__name__:
+                self.continuous_event_handler.message = message
+
+            return reply
+
+        except Exception as e:
+            logger.exception(config.log_formatter(self, self.name, "ActionError" + message.to_str()))
+            self.rabbit.send(RabbitMessageError(self.name, f"ActionError: {message.to_str()}"), check=False)
+
+    @staticmethod
+    async def _maybe_await(value):
+        if inspect.isawaitable(value):
+            return await value
+        return value
+
+    async def _deactivate_(self):
+        self.state = self.states.SHUTTING_DOWN
+        if self._executor is not None:
+            self._cancel_actions()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        await self._unregister_equipment()
+        await self.rabbit.deactivate()
@@ -4,8 +4,12 @@ import types
 import inspect
 from typing import Iterable, Callable
 import functools
+import hashlib
 import logging
+import os
+import pickle
 
+import numpy as np
 from unitpy import Unit, Quantity
 
 from chembot.configuration import config
@@ -41,6 +45,11 @@ class ParameterRange(abc.ABC):
     def validate(self, value) -> bool:
         ...
 
+    def validate_array(self, values: np.ndarray):
+        """ validate all values at once (e.g. all steps of a profile) """
+        for value in values:
+            self.validate(value)
+
 
 class NumericalRangeContinuous(ParameterRange):
     def __init__(self, min_: float | int, max_: float | int):
@@ -54,6 +63,12 @@ class NumericalRangeContinuous(ParameterRange):
         if not (self.min_ < value < self.max_):
             raise ValueError(f"{type(self).__name__}: Outside Range: [{self.min_}:{self.max_}]")
 
+    def validate_array(self, values: np.ndarray):
+        invalid = ~((self.min_ < values) & (values < self.max_))
+        if np.any(invalid):
+            raise ValueError(f"{type(self).__name__}: Outside Range: [{self.min_}:{self.max_}] "
+                             f"(indexes: {np.flatnonzero(invalid)})")
+
 
 class NumericalRangeDiscretized(ParameterRange):
     def __init__(self, min_: float | int, max_: float | int, step: int | float | None = None):
@@ -71,6 +86,13 @@ class NumericalRangeDiscretized(ParameterRange):
         if not (self.min_ <= value <= self.max_) or (value % self.step) != (self.min_ % self.step):
             raise ValueError(f"{type(self).__name__}: Outside Range: [{self.min_}:{self.step}:{self.max_}]")
 
+    def validate_array(self, values: np.ndarray):
+        invalid = ~((self.min_ <= values) & (values <= self.max_)) | \
+            (np.mod(values, self.step) != (self.min_ % self.step))
+        if np.any(invalid):
+            raise ValueError(f"{type(self).__name__}: Outside Range: [{self.min_}:{self.step}:{self.max_}] "
+                             f"(indexes: {np.flatnonzero(invalid)})")
+
 
 class CategoricalRange(ParameterRange):
     def __init__(self, options: Iterable[int] | Iterable[float] | Iterable[str]):
@@ -83,9 +105,16 @@ class CategoricalRange(ParameterRange):
         if value not in self.options:
             raise ValueError(f"{type(self).__name__}: Invalid option. Expected: {self.options}")
 
+    def validate_array(self, values: np.ndarray):
+        invalid = ~np.isin(values, list(self.options))
+        if np.any(invalid):
+            raise ValueError(f"{type(self).__name__}: Invalid option. Expected: {self.options} "
+                             f"(indexes: {np.flatnonzero(invalid)})")
+
 
 class ActionParameter:
     empty = inspect.Parameter.empty
+    _validator: "ParameterValidator | None" = None
 
     def __init__(self,
                  name: str,
@@ -122,23 +151,137 @@ class ActionParameter:
             return False
         return True
 
+    @property
+    def validator(self) -> "ParameterValidator":
+        """ compiled on first use (not pickled) """
+        if self._validator is None:
+            self._validator = ParameterValidator(self)
+        return self._validator
+
     def validate(self, value):
-        validate_type(self.type_, value)
+        self.validator.validate(value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_validator", None)
+        return state
+
 
-        if self.unit is not self.empty:
+class ParameterValidator:
+    """ ActionParameter.validate with the type check, unit and range prepared once """
+    __slots__ = ("name", "check_type", "type_", "unit", "dimensionality", "range_", "array_kinds")
+
+    def __init__(self, parameter: ActionParameter):
+        self.name = parameter.name
+        self.type_ = parameter.type_
+        self.check_type = get_type_check(parameter.type_)
+        self.array_kinds = _array_kinds.get(parameter.type_)  # numpy dtype kinds accepted for the type
+        self.unit = None if parameter.unit is ActionParameter.empty else parameter.unit
+        self.dimensionality = Unit(self.unit).dimensionality if self.unit is not None else None
+        self.range_ = None if parameter.range_ is ActionParameter.empty else parameter.range_
+
+    def validate(self, value):
+        if not self.check_type(value):
+            raise TypeError(f"Expected type:{self.type_}\nReceived type: {type(value)} ({value})")
+
+        if self.unit is not None:
             if not isinstance(value, Quantity):
                 raise TypeError(f"Received: {type(value)} || Expected: Quantity")
-            if Unit(self.unit).dimensionality != value.dimensionality:
+            if self.dimensionality != value.dimensionality:
                 raise ValueError(f"Wrong unit dimensionality. "
-                                 f"\nReceived: {value.dimensionality} || Expected: {Unit(self.unit).dimensionality} "
+                                 f"\nReceived: {value.dimensionality} || Expected: {self.dimensionality} "
                                  f"({self.unit})")
             value = value.to(self.unit)
 
-        if self.range_ is not self.empty:
+        if self.range_ is not None:
             self.range_.validate(value)
 
+    def validate_array(self, values):
+        """ validate all values at once (e.g. all steps of a profile) """
+        array = np.asarray(values)
+        if self.unit is not None or self.array_kinds is None or array.dtype.kind not in self.array_kinds:
+            for value in values:  # Quantity, objects, ...
+                self.validate(value)
+            return
+
+        if self.range_ is not None:
+            self.range_.validate_array(array)
+
+
+class ActionValidator:
+    """ compiled version of an Action's inputs; see Action.validator """
+    __slots__ = ("parameters", "index", "required")
+
+    def __init__(self, action: "Action"):
+        self.parameters = [ParameterValidator(input_) for input_ in action.inputs]
+        self.index = {input_.name: i for i, input_ in enumerate(action.inputs)}
+        self.required = [input_.name for input_ in action.inputs if input_.required]
+
+    def validate(self, kwargs: dict | None) -> list[Exception]:
+        """ returns errors (empty list if valid) """
+        if not self.parameters:
+            if kwargs:
+                return [ValueError("No arguments for this action but some were given.")]
+            return []
+
+        errors = []
+        if kwargs:
+            for k, v in kwargs.items():
+                index = self.index.get(k)
+                if index is None:
+                    errors.append(ValueError(f"'{k}' is invalid parameter."))
+                    continue
+                try:
+                    self.parameters[index].validate(v)
+                except (ValueError, TypeError) as e:
+                    errors.append(type(e)(f"'{k}': {e}"))
+
+        errors += self._check_required(kwargs)
+        return errors
+
+    def validate_profile(self, names: list[str], values) -> list[Exception]:
+        """
+        Validate every step of a profile.
+
+        Parameters
+        ----------
+        names:
+            kwargs names
+        values:
+            1D (one name) or 2D [step, name] values
+        """
+        if len(names) == 1:
+            columns = [values]
+        else:
+            array = np.asarray(values)
+            columns = [array[:, i] for i in range(len(names))] if array.dtype.kind != "O" else \
+                [[step[i] for step in values] for i in range(len(names))]
+
+        errors = []
+        for name, column in zip(names, columns):
+            index = self.index.get(name)
+            if index is None:
+                errors.append(ValueError(f"'{name}' is invalid parameter."))
+                continue
+            try:
+                self.parameters[index].validate_array(column)
+            except (ValueError, TypeError) as e:
+                errors.append(type(e)(f"'{name}': {e}"))
+
+        errors += self._check_required(dict.fromkeys(names))
+        return errors
+
+    def _check_required(self, kwargs: dict | None) -> list[Exception]:
+        missing = [name for name in self.required if not kwargs or name not in kwargs]
+        if missing:
+            return [ValueError("the following are missing required parameters:\n" +
+                               "\n".join(f"\t{name}" for name in missing))]
+        return []
+
 
 class Action:
+    _validator: ActionValidator | None = None
+
     def __init__(self,
                  name: str,
                  description: str = "",
@@ -164,11 +307,26 @@ class Action:
     def required_inputs(self) -> list[ActionParameter]:
         return [action for action in self.inputs if action.required]
 
+    @property
+    def validator(self) -> ActionValidator:
+        """ compiled on first use (not pickled) """
+        if self._validator is None:
+            self._validator = ActionValidator(self)
+        return self._validator
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_validator", None)
+        return state
+
 
 class EquipmentInterface:
-    def __init__(self, class_, actions: list[Action]):
+    _action_index: dict[str, Action] | None = None
+
+    def __init__(self, class_, actions: list[Action], hash_: str = None):
         self.class_ = class_
         self.actions = actions
+        self.hash_ = hash_ if hash_ is not None else get_class_hash(class_)  # changes when the class source changes
 
     def __str__(self):
         return self.class_.__name__ + f"|| " + str(len(self.actions))
@@ -180,16 +338,26 @@ class EquipmentInterface:
     def class_name(self) -> str:
         return self.class_.__name__
 
+    @property
+    def action_index(self) -> dict[str, Action]:
+        if self._action_index is None:
+            self._action_index = {action.name: action for action in self.actions}
+        return self._action_index
+
     @property
     def action_names(self) -> set[str]:
-        return {action.name for action in self.actions}
+        return set(self.action_index)
 
     def get_action(self, name: str):
-        for action in self.actions:
-            if action.name == name:
-                return action
+        action = self.action_index.get(name)
+        if action is None:
+            raise ValueError(f"Action ({name}) not found in EquipmentInterface ({self.class_}).")
+        return action
 
-        raise ValueError(f"Action ({name}) not found in EquipmentInterface ({self.class_}).")
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_action_index", None)
+        return state
 
     # def data_row(self) -> dict:
     #     return {"class_name": self.class_name, "class": self.class_, "actions": len(self.actions)}
@@ -198,9 +366,29 @@ class EquipmentInterface:
 class EquipmentRegistry:
     def __init__(self):
         self.equipment: dict[str, EquipmentInterface] = dict()
+        self.interfaces: dict[str, EquipmentInterface] = dict()  # key: EquipmentInterface.hash_
 
     def register(self, name: str, equipment_interface: EquipmentInterface):
         self.equipment[name] = equipment_interface
+        self.interfaces[equipment_interface.hash_] = equipment_interface
+
+    def register_hash(self, name: str, hash_: str) -> bool:
+        """
+        Register equipment by interface hash (looked up in the registry, then the on-disk cache).
+
+        Returns
+        -------
+        registered:
+            False if the interface is unknown; the full EquipmentInterface needs to be registered
+        """
+        equipment_interface = self.interfaces.get(hash_)
+        if equipment_interface is None and config.equipment_interface_cache:
+            equipment_interface = load_equipment_interface(hash_)
+        if equipment_interface is None:
+            return False
+
+        self.register(name, equipment_interface)
+        return True
 
     def register_equipment(self, name: str, equipment):
         equipment_interface = get_equipment_interface(equipment)
@@ -218,7 +406,20 @@ class EquipmentRegistry:
 
 @functools.lru_cache
 def get_equipment_interface(class_: type) -> EquipmentInterface:
-    """ Given an Equipment create and equipment interface. """
+    """ Given an Equipment create and equipment interface (from the on-disk cache if the source is unchanged). """
+    hash_ = get_class_hash(class_)
+    if config.equipment_interface_cache:
+        equipment_interface = load_equipment_interface(hash_)
+        if equipment_interface is not None:
+            return equipment_interface
+
+    equipment_interface = parse_equipment_interface(class_, hash_)
+    if config.equipment_interface_cache:
+        save_equipment_interface(equipment_interface)
+    return equipment_interface
+
+
+def parse_equipment_interface(class_: type, hash_: str = None) -> EquipmentInterface:
     funcs = get_class_functions(class_)
     actions = []
     for func in funcs:
@@ -227,7 +428,65 @@ def get_equipment_interface(class_: type) -> EquipmentInterface:
         except Exception as e:
             raise ValueError(f"Exception raise while parsing: {class_.__name__}.{func}") from e
 
-    return EquipmentInterface(class_, actions)
+    return EquipmentInterface(class_, actions, hash_)
+
+
+@functools.lru_cache
+def _get_file_hash(file: str) -> bytes:
+    with open(file, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+# modules that build an EquipmentInterface; a change to them changes every interface
+_PARSER_FILES = (numpy_parser.__file__, __file__)
+
+
+def get_class_hash(class_: type) -> str:
+    """
+    hash of the class qualname, the source files of the class and its parents (actions can be inherited) and the
+    parser modules (_PARSER_FILES)
+    """
+    hash_ = hashlib.sha1(f"{class_.__module__}.{class_.__qualname__}".encode(config.encoding))
+    for file in _PARSER_FILES:
+        hash_.update(_get_file_hash(file))
+    for cls in class_.__mro__:
+        try:
+            file = inspect.getsourcefile(cls)
+        except TypeError:  # builtins
+            continue
+        if file is not None:
+            hash_.update(_get_file_hash(file))
+
+    return hash_.hexdigest()
+
+
+def _get_cache_path(hash_: str):
+    return config.cache_directory / f"equipment_interface_{hash_}.pickle"
+
+
+def load_equipment_interface(hash_: str) -> EquipmentInterface | None:
+    """ returns None if not in the on-disk cache """
+    try:
+        with open(_get_cache_path(hash_), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Invalid EquipmentInterface cache file ({hash_}); it will be re-parsed. {e}")
+        return None
+
+
+def save_equipment_interface(equipment_interface: EquipmentInterface):
+    path = _get_cache_path(equipment_interface.hash_)
+    path_temp = path.with_suffix(f".{os.getpid()}.tmp")  # several processes may start the same class at once
+    try:
+        with open(path_temp, "wb") as f:
+            pickle.dump(equipment_interface, f, protocol=config.pickle_protocol)
+        os.replace(path_temp, path)
+    except Exception as e:
+        logger.warning(f"EquipmentInterface of {equipment_interface.class_name} could not be cached. {e}")
+        if path_temp.exists():
+            path_temp.unlink()
 
 
 def get_class_functions(class_: type) -> list[str]:
@@ -371,6 +630,24 @@ def get_type(type_: str | type) -> type | types.UnionType:
     raise TypeError(f"Type not known: {type_}; it needs to be added.")
 
 
+_array_kinds = {int: "iu", float: "f", bool: "b", str: "U"}
+
+
+def get_type_check(type_: type | types.UnionType) -> Callable[[object], bool]:
+    """ same rules as validate_type() as a closure (no error is created unless needed) """
+    if type_ is ActionParameter.empty:
+        return lambda value: True
+
+    if hasattr(type_, "__origin__"):
+        outer_layer = type_.__origin__
+        inner_layer = type_.__args__
+        if outer_layer is list:
+            return lambda value: isinstance(value, list) and isinstance(value[0], inner_layer[0])
+        return lambda value: isinstance(value, outer_layer)
+
+    return lambda value: isinstance(value, type_)
+
+
 def validate_type(type_: type, value):
     error = TypeError(f"Expected type:{type_}\nReceived type: {type(value)} ({value})")
 
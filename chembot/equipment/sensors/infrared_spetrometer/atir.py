@@ -9,6 +9,7 @@ import numpy as np
 
 from chembot.configuration import config, create_folder
 from chembot.equipment.sensors.sensor import Sensor
+from chembot.utils.class_building import long_running
 
 logger = logging.getLogger(config.root_logger_name + ".atir")
 
@@ -120,8 +121,13 @@ class ATIRRunner:
 
 
 class ATIR(Sensor):
+    """
+    The DDE conversation is bound to the thread that created it, so it is created and used on the (single) worker
+    thread of the long-running actions.
+    """
     _method_name = "ATR_DI2"
     _method_path = str(pathlib.Path(__file__).parent)
+    max_workers = 1  # the worker thread owns the DDE conversation
 
     @property
     def _data_path(self):
@@ -131,10 +137,19 @@ class ATIR(Sensor):
 
     def __init__(self, name: str):
         super().__init__(name)
-        self._runner = ATIRRunner()
+        self._runner: ATIRRunner | None = None  # created on the worker thread; see _get_runner()
+        self._runner_thread: int | None = None
+
+    def _get_runner(self) -> ATIRRunner:
+        if self._runner is None:
+            self._runner = ATIRRunner()
+            self._runner_thread = threading.get_ident()
+        elif self._runner_thread != threading.get_ident():
+            raise RuntimeError("The DDE conversation can only be used from the thread that created it.")
+        return self._runner
 
     def _activate(self):
-        pass
+        self._get_executor().submit(self._get_runner).result()  # connect to OPUS now, so errors show at activation
 
     def _deactivate(self):
         pass
@@ -142,10 +157,19 @@ class ATIR(Sensor):
     def _stop(self):
         pass
 
+    @long_running
     def write_measure(self, data_name: str = None, scans: int = 16) -> np.ndarray:
-        rf = self._runner.measure_sample(self._method_path, self._method_name, scans)
+        # OPUS can't be interrupted during a scan; write_stop takes effect between the DDE requests
+        if self.action_cancelled:
+            return None
+        rf = self._get_runner().measure_sample(self._method_path, self._method_name, scans)
         logger.warning(rf)
-        return self._runner.get_results(rf)[:, 1]  # TODO: figure out what to do with the wavelength shape (1754,2)
+        if self.action_cancelled:
+            return None
+        return self._get_runner().get_results(rf)[:, 1]  # TODO: figure out what to do with the wavelength shape (1754,2)
 
+    @long_running
     def write_background(self, scans: int = 16):
-        self._runner.run_background_scans(self._method_path, self._method_name, scans)
+        if self.action_cancelled:
+            return
+        self._get_runner().run_background_scans(self._method_path, self._method_name, scans)
@@ -1,7 +1,6 @@
 import enum
 import socket
 import logging
-import time
 from datetime import datetime
 import xml.etree.cElementTree as xml
 import pathlib
@@ -11,8 +10,10 @@ from unitpy import Unit, Quantity
 import numpy as np
 
 from chembot.rabbitmq.messages import RabbitMessageAction
+from chembot.rabbitmq.rabbit_rpc import RabbitRPC
 from chembot.configuration import config, create_folder
 from chembot.equipment.sensors.sensor import Sensor
+from chembot.utils.class_building import long_running
 from chembot.utils.nmr_processing import nmr_check
 
 logger = logging.getLogger(config.root_logger_name + ".nmr")
@@ -345,6 +346,27 @@ class NMR(Sensor):
     def write_name(self, name: str):
         self._runner.set_sample(name)
 
+    def _process_action(self, message: RabbitMessageAction):
+        # write_measure runs on the worker pool, which must not consume messages; so the flow rate is read here
+        if message.action == self.write_measure.__name__ and (message.kwargs or {}).get("flow_rate") is None:
+            message.kwargs = {**(message.kwargs or {}), "flow_rate": self._read_total_flow_rate()}
+        super()._process_action(message)
+
+    def _read_total_flow_rate(self) -> Quantity:
+        """ sum of the pumps' flow rates (0.1 ml/min if they are all stopped) """
+        flow_rate = 0 * Unit("ml/min")
+        pumps = ["pump_one", "pump_two", "pump_three", "pump_four"]
+        flow_rates = RabbitRPC(self.rabbit).call(
+            [RabbitMessageAction(pump, self.name, "read_flow_rate") for pump in pumps], timeout=3
+        )
+        for flow_rate_ in flow_rates:
+            flow_rate += flow_rate_
+
+        if flow_rate.v == 0:
+            flow_rate = 0.1 * Unit("ml/min")
+        return flow_rate
+
+    @long_running
     def write_measure(self,
                       scans: NMRScans = NMRScans.EIGHT,
                       aqtime: NMRAqTime = NMRAqTime.THREEPOINTTWO,
@@ -352,32 +374,25 @@ class NMR(Sensor):
                       pulse_angle: NMRPulseAngle = NMRPulseAngle.SIXTY,
                       flow_rate: Quantity = None,
                       ) -> np.ndarray:
+        """ flow_rate: total flow rate to the reactor; default: read from the pumps (before the action starts) """
         # switch valve to reactor
         self.rabbit.send(
             RabbitMessageAction("valve_five", self.name, "write_move", kwargs={"position": "NMR"})
         )
-        time.sleep(2)
+        if self.wait_cancelled(2):
+            return None
 
         # wait for plug
         vol = 3.14 * (6 * Unit.cm) * (0.03 * Unit.inch / 2) ** 2
-        if flow_rate is None:
-            flow_rate = 0 * Unit("ml/min")
-            pumps = ["pump_one", "pump_two", "pump_three", "pump_four"]
-            for pump in pumps:
-                flow_rate += self.rabbit.send_and_consume(
-                    RabbitMessageAction(pump, self.name, "read_flow_rate"), timeout=3, error_out=True
-                ).value
-
-            if flow_rate.v == 0:
-                flow_rate = 0.1 * Unit("ml/min")
         time_ = vol / flow_rate
-        time.sleep(time_.to("s").v)
+        cancelled = self.wait_cancelled(time_.to("s").v)
 
-        # switch back
+        # switch back (also when cancelled)
         self.rabbit.send(
             RabbitMessageAction("valve_five", self.name, "write_move", kwargs={"position": "waste"})
         )
-        time.sleep(2)
+        if cancelled or self.wait_cancelled(2):
+            return None
 
         # # flow plug
         self.rabbit.send(
@@ -385,10 +400,13 @@ class NMR(Sensor):
                                 kwargs={"volume": 0.256 * Unit("ml"), "flow_rate": 0.263 * Unit("ml/min")}
                                 )
         )
-        time.sleep(60)
+        if self.wait_cancelled(60):
+            return None
 
         # take NMR
         for i in range(5):
+            if self.action_cancelled:
+                return None
             # take quick NMR to see if signal
             self.write_name("temp_")
             self._runner.take_protron(
@@ -401,7 +419,8 @@ class NMR(Sensor):
             if nmr_check(r"C:\Users\Robot2\Desktop\Dylan\NMR\Magritek\temp_"):
                 # take good nmr
                 self.write_name("DW2")
-                time.sleep(reptime.value - 1)
+                if self.wait_cancelled(reptime.value - 1):
+                    return None
                 self._runner.take_protron(scans, aqtime, reptime, pulse_angle)
                 break
             else:
@@ -410,7 +429,8 @@ class NMR(Sensor):
                     RabbitMessageAction("pump_five", self.name, "write_infuse",
                                         kwargs={"volume": 0.005 * Unit.ml, "flow_rate": 0.15 * Unit("ml/min")})
                 )
-                time.sleep(10)
+                if self.wait_cancelled(10):
+                    return None
         else:
             logger.warning("No NMR signal found after 5 tries")
 
@@ -301,7 +301,7 @@ class PolyRecirculatingBath(TempControl):
                  temp_limits: tuple[Quantity, Quantity] = (5 * Unit.degC, 60 * Unit.degC),
                  ):
         self.bath = PolyScienceBath(comport, temp_limits)
-        self.buffer = PingPongBuffer(pathlib.Path("bath_temp.csv"), capacity=1000)
+        self.buffer = PingPongBuffer(pathlib.Path("bath_temp.csv"), capacity=1000, owner=name)
         self._next_time = time.time()
         super().__init__(name=name)
 
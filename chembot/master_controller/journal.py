@@ -0,0 +1,221 @@
+"""
+Append-only journal of the MasterController's job queue, so the queue can be rebuilt after a crash or restart.
+
+Records (job added, moved, removed, event dispatched, job completed, schedule cleared) go into a SQLite database in
+WAL mode. They are written by a background thread: the MasterController only puts small tuples on a queue (jobs are
+pickled when submitted, not when their events are dispatched). Records of jobs that are finished are dropped by
+compaction.
+
+"""
+from __future__ import annotations
+
+import logging
+import pathlib
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from chembot.configuration import config
+from chembot.scheduler.job import Job
+
+logger = logging.getLogger(config.root_logger_name + ".journal")
+
+
+class JournalRecord:
+    ADD = "add"  # data: pickle((job, time_start))
+    MOVE = "move"  # data: pickle(time_start)
+    REMOVE = "remove"
+    DISPATCH = "dispatch"  # data: event id (str)
+    COMPLETE = "complete"
+    CLEAR = "clear"
+
+
+class JournalState:
+    """ jobs in queue or running, rebuilt from the journal """
+    __slots__ = ("jobs", "time_start", "dispatched", "records")
+
+    def __init__(self):
+        self.jobs: dict[int, Job] = {}  # insertion order = order added
+        self.time_start: dict[int, datetime] = {}
+        self.dispatched: set[int] = set()  # event ids
+        self.records = 0
+
+    def __str__(self):
+        return f"JournalState(jobs: {len(self.jobs)}, dispatched events: {len(self.dispatched)}, " \
+               f"records: {self.records})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class JobJournal:
+    flush_interval = 0.05  # max time (s) a record waits before it is written
+    compact_every = 10_000  # records written between compactions
+
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._queue: queue.SimpleQueue[tuple | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self.records_written = 0
+        self.compactions = 0
+        self._records_since_compaction = 0
+        self._create()
+
+    def __str__(self):
+        return f"JobJournal({self.path.name}, written: {self.records_written}, compactions: {self.compactions})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # WAL: durable at checkpoints, never corrupt
+        return connection
+
+    def _create(self):
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS journal ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, time REAL, kind TEXT, id_job TEXT, data BLOB)"
+            )
+        connection.close()
+
+    # writing (any thread; non-blocking)
+    def _put(self, kind: str, id_job: int | None = None, data: bytes | str | None = None):
+        self._queue.put((time.time(), kind, None if id_job is None else str(id_job), data))
+
+    def add_job(self, job: Job):
+        self._put(JournalRecord.ADD, job.id_, pickle.dumps((job, job.time_start), protocol=config.pickle_protocol))
+
+    def move_job(self, job: Job):
+        self._put(JournalRecord.MOVE, job.id_, pickle.dumps(job.time_start, protocol=config.pickle_protocol))
+
+    def remove_job(self, id_job: int):
+        self._put(JournalRecord.REMOVE, id_job)
+
+    def dispatch(self, id_job: int, id_event: int):
+        self._put(JournalRecord.DISPATCH, id_job, str(id_event))
+
+    def complete_job(self, id_job: int):
+        self._put(JournalRecord.COMPLETE, id_job)
+
+    def clear(self):
+        self._put(JournalRecord.CLEAR)
+
+    # writer thread
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="job_journal", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 5):
+        """ write everything queued and stop the writer thread """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(config.log_formatter(self, "journal", "Writer thread did not stop; records may be lost."))
+        self._thread = None
+
+    def _run(self):
+        connection = self._connect()
+        try:
+            running = True
+            while running:
+                records = [self._queue.get()]  # blocks till there is something to write
+                deadline = time.monotonic() + self.flush_interval
+                while records[-1] is not None:  # batch what arrives within flush_interval
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        records.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+
+                if records[-1] is None:
+                    records.pop()
+                    running = False
+                self._write(connection, records)
+                if self._records_since_compaction >= self.compact_every:
+                    self._compact(connection)
+        except Exception as e:
+            logger.exception(config.log_formatter(self, "journal", "Writer thread failed."))
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, records: list[tuple]):
+        if not records:
+            return
+        with connection:
+            connection.executemany("INSERT INTO journal (time, kind, id_job, data) VALUES (?, ?, ?, ?)", records)
+        self.records_written += len(records)
+        self._records_since_compaction += len(records)
+
+    def _compact(self, connection: sqlite3.Connection):
+        """ drop records before the last clear, of jobs removed or completed, and moves but the last of a job """
+        with connection:
+            connection.execute(
+                "DELETE FROM journal WHERE seq < (SELECT COALESCE(MAX(seq), 0) FROM journal WHERE kind = ?)",
+                (JournalRecord.CLEAR,)
+            )
+            connection.execute(
+                "DELETE FROM journal WHERE id_job IN (SELECT id_job FROM journal WHERE kind IN (?, ?))",
+                (JournalRecord.REMOVE, JournalRecord.COMPLETE)
+            )
+            connection.execute(
+                "DELETE FROM journal WHERE kind = ? AND seq NOT IN "
+                "(SELECT MAX(seq) FROM journal WHERE kind = ? GROUP BY id_job)",
+                (JournalRecord.MOVE, JournalRecord.MOVE)
+            )
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._records_since_compaction = 0
+        self.compactions += 1
+
+    def compact(self):
+        """ compact now (only call when the writer thread is not running) """
+        connection = self._connect()
+        try:
+            self._compact(connection)
+        finally:
+            connection.close()
+
+    # reading
+    def replay(self) -> JournalState:
+        """ jobs in queue or running when the journal was last written """
+        state = JournalState()
+        connection = self._connect()
+        try:
+            for kind, id_job, data in connection.execute("SELECT kind, id_job, data FROM journal ORDER BY seq"):
+                state.records += 1
+                if kind == JournalRecord.CLEAR:
+                    state.jobs.clear()
+                    state.time_start.clear()
+                    state.dispatched.clear()
+                    continue
+
+                id_job = int(id_job)
+                if kind == JournalRecord.ADD:
+                    job, time_start = pickle.loads(data)
+                    state.jobs[id_job] = job
+                    state.time_start[id_job] = time_start
+                elif id_job not in state.jobs:
+                    continue
+                elif kind == JournalRecord.MOVE:
+                    state.time_start[id_job] = pickle.loads(data)
+                elif kind == JournalRecord.DISPATCH:
+                    state.dispatched.add(int(data))
+                elif kind in (JournalRecord.REMOVE, JournalRecord.COMPLETE):
+                    job = state.jobs.pop(id_job)
+                    del state.time_start[id_job]
+                    state.dispatched.difference_update(event.id_ for event in job.iter_events())
+        finally:
+            connection.close()
+
+        return state
@@ -10,11 +10,14 @@ from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageAction, Rabbit
 from chembot.rabbitmq.rabbit_core import RabbitMQConnection
 from chembot.rabbitmq.watchdog import RabbitWatchdog
 from chembot.equipment.equipment_interface import EquipmentRegistry
+from chembot.master_controller.journal import JobJournal
 from chembot.scheduler.schedule import Schedule
 from chembot.scheduler.schedular import Schedular
+from chembot.scheduler.schedule_delta import ScheduleDelta
 from chembot.scheduler.submit_result import JobSubmitResult
-from chembot.scheduler.validate import validate_schedule
+from chembot.scheduler.validate import validate_schedule, check_job_against_schedule
 from chembot.scheduler.job import Job
+from chembot.scheduler.job_template import JobSweep
 
 logger = logging.getLogger(config.root_logger_name + ".master_controller")
 
@@ -24,16 +27,31 @@ class MasterController:
     name = "master_controller"
     pulse = 0.01  # time of each loop in seconds
     status_update_time = timedelta(seconds=1)  # update all equipment status every 1 seconds
-
-    def __init__(self):
+    journal_file = "master_controller_journal.sqlite"
+
+    def __init__(self, pack_jobs: bool = False, journal: bool = None):
+        """
+
+        Parameters
+        ----------
+        pack_jobs:
+            True: jobs on different equipment can run in parallel (see Schedular)
+        journal:
+            True: job queue is journaled to disk and restored on the next activate(); default:
+            config.master_controller_journal
+        """
         self.actions = get_actions_list(self)
         self.rabbit = RabbitMQConnection(self.name)
         self.watchdog = RabbitWatchdog(self)
         self.registry = EquipmentRegistry()
-        self.scheduler = Schedular()
+        self.scheduler = Schedular(pack_jobs=pack_jobs)
         self._deactivate_event = True  # False to deactivate
         self._next_update = datetime.now()
 
+        if journal is None:
+            journal = config.master_controller_journal
+        self.journal = JobJournal(config.cache_directory / self.journal_file) if journal else None
+
     def _deactivate(self):
         for equip in reversed(self.registry.equipment):
             # loop backwards to ensure equipment can send stop signals over serial before serial shuts down
@@ -42,6 +60,8 @@ class MasterController:
             time.sleep(0.1)
 
         self.rabbit.deactivate()
+        if self.journal is not None:
+            self.journal.close()
         logger.info(config.log_formatter(self, self.name, "Deactivated"))
         self._deactivate_event = False
 
@@ -49,6 +69,9 @@ class MasterController:
         logger.info(config.log_formatter(self, self.name, "Activated\n" + "#" * 80 + "\n\n"))
         error_ = None
         try:
+            if self.journal is not None:
+                self._restore_from_journal()
+                self.journal.start()
             self._run()
         except Exception as e:
             logger.critical(str(e))
@@ -63,35 +86,58 @@ class MasterController:
         if error_ is not None:
             raise error_
 
+    def _restore_from_journal(self):
+        """ put the jobs in queue or running at the last shutdown/crash back in the schedule """
+        state = self.journal.replay()
+        for id_job, job in state.jobs.items():
+            self.scheduler.add_job(job, state.time_start[id_job])
+        self.scheduler.restore_dispatched(state.dispatched)
+        self.journal.compact()
+
+        logger.info(config.log_formatter(self, self.name, f"Restored from journal: {state}"))
+        time_to_next_event = self.scheduler.time_to_next_event
+        if time_to_next_event is not None and time_to_next_event < 0:
+            logger.warning(config.log_formatter(self, self.name, "Restored jobs have overdue events; they are sent "
+                                                                 "now."))
+
     def _run(self):
         # infinite loop
         while self._deactivate_event:
             self.watchdog.check_watchdogs()
-            self._read_message()  # blocking with timeout
+            self._read_message()  # blocking till message arrives or next event is due
             self._run_event()
             self._status_update()
 
     def _run_event(self):
-        event = self.scheduler.get_event_to_run()
-        if event is None:
-            return
-
-        self.rabbit.send(
-            RabbitMessageAction(
-                destination=event.resource,
-                source=self.name,
-                action=event.callable_,
-                kwargs=event.kwargs,
-                id_job=event.id_job
+        # all due events are sent in the same tick
+        for event in self.scheduler.get_events_to_run():
+            self.rabbit.send(
+                RabbitMessageAction(
+                    destination=event.resource,
+                    source=self.name,
+                    action=event.callable_,
+                    kwargs=event.kwargs,
+                    id_job=event.id_job
+                )
             )
-        )
-        # TODO: if ValueError: Queue does not exist; stop schedule and reset everything
+            if self.journal is not None:
+                self.journal.dispatch(event.id_job, event.id_)
+                if event.root.completed:
+                    self.journal.complete_job(event.id_job)
+            # TODO: if ValueError: Queue does not exist; stop schedule and reset everything
 
     def _read_message(self):
-        message = self.rabbit.consume(self.pulse)
+        message = self.rabbit.consume(self._get_wait_time())
         if message:
             self._process_message(message)
 
+    def _get_wait_time(self) -> float:
+        """ time till the next scheduled event is due; never longer than pulse (watchdogs need checking) """
+        time_to_next_event = self.scheduler.time_to_next_event
+        if time_to_next_event is None:
+            return self.pulse
+        return min(max(time_to_next_event, 0), self.pulse)
+
     def _process_message(self, message: RabbitMessage):
         if isinstance(message, RabbitMessageCritical):
             self._error_handling()
@@ -100,8 +146,12 @@ class MasterController:
             self._error_handling()
             self._deactivate_event = False
         elif isinstance(message, RabbitMessageRegister):
-            self.registry.register(message.source, message.equipment_interface)
-            self.rabbit.send(RabbitMessageReply.create_reply(message, None))
+            if message.equipment_interface is not None:
+                self.registry.register(message.source, message.equipment_interface)
+                registered = True
+            else:
+                registered = self.registry.register_hash(message.source, message.interface_hash)
+            self.rabbit.send(RabbitMessageReply.create_reply(message, registered))
         elif isinstance(message, RabbitMessageUnRegister):
             self.registry.unregister(message.source)
         elif isinstance(message, RabbitMessageAction):
@@ -157,31 +207,115 @@ class MasterController:
     def read_schedule(self) -> Schedular:
         return self.scheduler
 
-    def write_add_job(self, job: Job) -> JobSubmitResult:
-        result = self.write_validate_job(job)
-        if not result.validation_success:
-            return result
+    def read_schedule_version(self) -> int:
+        """ bumped on every change of the events in the schedule """
+        return self.scheduler.version
 
-        # find next best time in schedule
-        self.scheduler.add_job(job)
-        result.time_start = self.scheduler.jobs_in_queue[-1].time_start
-        result.position_in_queue = len(self.scheduler.jobs_in_queue)
-        result.length_of_queue = len(self.scheduler.jobs_in_queue)
-        result.success = True
+    def read_schedule_delta(self, since_version: int = -1) -> ScheduleDelta:
+        """ events added, changed or removed since since_version as columns (full snapshot if too old, or -1) """
+        return self.scheduler.get_schedule_delta(since_version)
 
-        return result
+    def read_dispatch_lateness(self) -> dict:
+        """ histogram of time events were sent after their scheduled time """
+        return self.scheduler.lateness.as_dict()
+
+    def write_add_job(self, job: Job) -> JobSubmitResult:
+        return self.write_add_jobs([job])[0]
+
+    def write_add_jobs(self, jobs: list[Job]) -> list[JobSubmitResult]:
+        """
+        validate and place several jobs; jobs that fail validation are skipped
+        Order and priority (also against queued jobs with pack_jobs): see Schedular.add_jobs.
+        """
+        results: dict[int, JobSubmitResult] = {}
+
+        def add_job(job: Job) -> bool:
+            result = results[job.id_] = self.write_validate_job(job)
+            if not result.validation_success:
+                return False
+
+            # time found (and checked against the schedule) in validation
+            self.scheduler.add_job(job, job.time_start)
+            if self.journal is not None:
+                self.journal.add_job(job)
+            return True
+
+        moved = self.scheduler.add_jobs(jobs, add_job)
+        if self.journal is not None:
+            for job in moved:
+                self.journal.move_job(job)
+
+        for job in jobs:
+            result = results[job.id_]
+            if result.validation_success:
+                result.time_start = job.time_start
+                result.position_in_queue = self.scheduler.jobs_in_queue.index(job) + 1
+                result.length_of_queue = len(self.scheduler.jobs_in_queue)
+                result.success = True
+        return [results[job.id_] for job in jobs]
+
+    def write_add_sweep(self, sweep: JobSweep) -> list[JobSubmitResult]:
+        """ expand sweep into jobs, then write_add_jobs """
+        return self.write_add_jobs(sweep.expand())
 
     def write_validate_job(self, job: Job) -> JobSubmitResult:
         result = JobSubmitResult(job.id_)
-        job.time_start = datetime.now()  # add temporarily
+        job.time_start = self.scheduler.get_start_time(job)  # where it would be placed now
         schedule = Schedule.from_job(job)
 
-        # validate schedule
-        validate_schedule(schedule, self.registry, result)
+        # validate job and check it against the events already scheduled
+        validate_schedule(schedule, self.registry, result, self.scheduler.schedule)
+        result.time_start = job.time_start
+        return result
+
+    def write_delete_job(self, id_job: int) -> bool:
+        """ cancel job in queue or running; False if not found """
+        try:
+            self.scheduler.remove_job(id_job)
+        except ValueError as e:
+            logger.error(config.log_formatter(self, self.name, str(e)))
+            return False
+        if self.journal is not None:
+            self.journal.remove_job(id_job)
+        return True
+
+    def write_move_job(self, id_job: int, time_start: datetime = None) -> JobSubmitResult:
+        """
+        move job in queue to time_start (default: earliest start it can get now); not moved if it conflicts or is
+        running (events already sent)
+        """
+        result = JobSubmitResult(id_job)
+        try:
+            job = self.scheduler.get_job(id_job)
+        except ValueError as e:
+            result.register_error(e)
+            return result
+        if self.scheduler.is_running(job):
+            result.register_error(ValueError(f"Job ({id_job}) is running and can't be moved."))
+            return result
+
+        time_start_old = job.time_start
+        self.scheduler.remove_job(job)
+        job.time_start = time_start if time_start is not None else self.scheduler.get_start_time(job)
+        check_job_against_schedule(job, self.scheduler.schedule, result)
+        if result.conflicts:
+            self.scheduler.add_job(job, time_start_old)
+            return result
+
+        self.scheduler.add_job(job, job.time_start)
+        if self.journal is not None:
+            self.journal.move_job(job)
+        result.validation_success = True
+        result.success = True
+        result.time_start = job.time_start
+        result.position_in_queue = self.scheduler.jobs_in_queue.index(job) + 1
+        result.length_of_queue = len(self.scheduler.jobs_in_queue)
         return result
 
     def write_stop(self):
         self.scheduler.clear_all_jobs()
+        if self.journal is not None:
+            self.journal.clear()
         for equip in self.registry.equipment:
             self.rabbit.send(RabbitMessageAction(equip, self.name, Equipment.write_stop))
 
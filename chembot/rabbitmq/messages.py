@@ -1,6 +1,20 @@
+from __future__ import annotations
+
+import abc
+import collections
+import copy
+import functools
+import os
+import pickle
+import struct
+import threading
+import time
 import uuid
+from multiprocessing import shared_memory, resource_tracker
 from typing import Callable
-import pickle
+
+import numpy as np
+from unitpy import Quantity, Unit
 
 from chembot.configuration import config
 
@@ -20,7 +34,11 @@ class RabbitMessage:
         return self.__str__()
 
     def to_bytes(self) -> bytes:
-        return pickle.dumps(self, protocol=config.pickle_protocol)
+        return get_codec(config.rabbit_codec).encode(self)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> RabbitMessage:
+        return decode_message(data)
 
     def to_str(self) -> str:
         return f"\n\t{type(self).__name__}" \
@@ -102,11 +120,466 @@ class RabbitMessageReply(RabbitMessage):
 
 
 class RabbitMessageRegister(RabbitMessage):
-    def __init__(self, source: str, equipment_interface):
+    """
+    equipment_interface is only sent if the master controller replied False to the hash (interface unknown to it);
+    see EquipmentRegistry.register_hash
+    """
+    __slots__ = ("interface_hash", "equipment_interface")
+
+    def __init__(self, source: str, interface_hash: str, equipment_interface=None):
         super().__init__("master_controller", source)
+        self.interface_hash = interface_hash
         self.equipment_interface = equipment_interface
 
 
 class RabbitMessageUnRegister(RabbitMessage):
+    __slots__ = ()
+
     def __init__(self, source: str):
         super().__init__("master_controller", source)
+
+
+#######################################################################################################################
+# Codecs (wire format)
+# The first byte of every encoded message identifies the codec, so the receiver can always decode the message
+# regardless of which codec the sender has in config.rabbit_codec.
+# Pickle output always starts with the PROTO opcode (0x80), so pickle messages need no extra header byte.
+
+class MessageCodec(abc.ABC):
+    name: str
+    id_: int  # first byte on the wire
+
+    @abc.abstractmethod
+    def encode(self, message: RabbitMessage) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def decode(self, data: bytes) -> RabbitMessage:
+        ...
+
+
+class PickleCodec(MessageCodec):
+    """
+    Full object pickle. Works for any message, but larger and slower for common payloads.
+    Replies with large numpy arrays are sent with the PickleBufferCodec (so their arrays are read-only when decoded).
+    """
+    name = "pickle"
+    id_ = pickle.PROTO[0]
+
+    def encode(self, message: RabbitMessage) -> bytes:
+        if isinstance(message, RabbitMessageReply) and isinstance(message.value, np.ndarray) \
+                and message.value.nbytes >= config.rabbit_out_of_band_size:
+            return _codecs_by_name[PickleBufferCodec.name].encode(message)
+        return pickle.dumps(message, protocol=config.pickle_protocol)
+
+    def decode(self, data: bytes) -> RabbitMessage:
+        if data[0] != self.id_:
+            return decode_message(data)  # e.g. a large reply encode() framed with the PickleBufferCodec
+        return pickle.loads(data)
+
+
+_FRAME_HEADER = struct.Struct("<BII")  # codec id, number of buffers, pickle length
+
+
+class PickleBufferCodec(MessageCodec):
+    """
+    Pickle protocol 5 with numpy arrays sent out-of-band (PickleBuffer).
+    frame: [codec id: u8][number of buffers: u32][pickle length: u32][buffer length: u64, ...][pickle][buffer, ...]
+
+    Arrays on the receiving side are views into the received message (no copies), so they are read-only; copy one
+    (array.copy()) before changing it.
+    """
+    name = "pickle_buffer"
+    id_ = 2
+
+    def encode(self, message: RabbitMessage) -> bytes:
+        buffers: list[pickle.PickleBuffer] = []
+        data = pickle.dumps(message, protocol=5, buffer_callback=buffers.append)
+        raws = [buffer.raw() for buffer in buffers]
+        return b"".join((
+            _FRAME_HEADER.pack(self.id_, len(raws), len(data)),
+            struct.pack(f"<{len(raws)}Q", *(raw.nbytes for raw in raws)),
+            data,
+            *raws
+        ))
+
+    def decode(self, data: bytes) -> RabbitMessage:
+        _, number_of_buffers, length = _FRAME_HEADER.unpack_from(data)
+        index = _FRAME_HEADER.size
+        sizes = struct.unpack_from(f"<{number_of_buffers}Q", data, index)
+        index += 8 * number_of_buffers
+
+        data = memoryview(data)
+        header = data[index:index + length]
+        index += length
+        buffers = []
+        for size in sizes:
+            buffers.append(data[index:index + size])
+            index += size
+
+        return pickle.loads(header, buffers=buffers)  # numpy rebuilds the arrays with np.frombuffer
+
+
+class SharedArray:
+    """ Reference to a numpy array placed in shared memory by the SharedMemoryCodec. """
+    __slots__ = ("name", "dtype", "shape")
+
+    def __init__(self, name: str, dtype: str, shape: tuple[int, ...]):
+        self.name = name
+        self.dtype = dtype
+        self.shape = shape
+
+    def __repr__(self):
+        return f"SharedArray({self.name}, {self.dtype}, {self.shape})"
+
+
+class SharedMemoryCodec(MessageCodec):
+    """
+    For processes on the same host. numpy arrays in replies are placed in shared memory and only a reference is sent
+    through RabbitMQ; all other messages are pickled.
+    The sender owns the shared memory blocks and releases them after config.rabbit_shared_memory_lifetime; the
+    receiver needs to decode the message before then.
+    """
+    name = "shared_memory"
+    id_ = 3
+
+    def __init__(self):
+        self._blocks: collections.deque[tuple[float, shared_memory.SharedMemory]] = collections.deque()
+        self._lock = threading.Lock()  # codec is shared by all equipment threads
+
+    def encode(self, message: RabbitMessage) -> bytes:
+        if not (isinstance(message, RabbitMessageReply) and isinstance(message.value, np.ndarray)) \
+                or message.value.dtype.hasobject:
+            return _codecs_by_name[PickleCodec.name].encode(message)
+
+        self.release_blocks()
+        array = message.value
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        with self._lock:
+            self._blocks.append((time.monotonic() + config.rabbit_shared_memory_lifetime, block))
+
+        message = copy.copy(message)
+        message.value = SharedArray(block.name, array.dtype.str, array.shape)
+        return bytes((self.id_,)) + pickle.dumps(message, protocol=config.pickle_protocol)
+
+    def decode(self, data: bytes) -> RabbitMessage:
+        if data[0] != self.id_:
+            return decode_message(data)  # encode() pickled it
+        message = pickle.loads(memoryview(data)[1:])
+        if isinstance(message.value, SharedArray):
+            message.value = self._load(message.value)
+        return message
+
+    def _load(self, shared_array: SharedArray) -> np.ndarray:
+        block = shared_memory.SharedMemory(name=shared_array.name)
+        with self._lock:
+            own_block = any(block_.name == block.name for _, block_ in self._blocks)
+        if os.name == "posix" and not own_block:
+            # the sender owns the block; stop this process's resource tracker from unlinking it at exit
+            resource_tracker.unregister(block._name, "shared_memory")  # noqa
+
+        view = np.ndarray(shared_array.shape, np.dtype(shared_array.dtype), buffer=block.buf)
+        array = view.copy()
+        del view  # release buffer so the block can close
+        block.close()
+        return array
+
+    def release_blocks(self, all_: bool = False):
+        """ release blocks past their lifetime """
+        now = time.monotonic()
+        with self._lock:
+            while self._blocks and (all_ or self._blocks[0][0] < now):
+                _, block = self._blocks.popleft()
+                block.close()
+                block.unlink()
+
+
+_codecs_by_name: dict[str, MessageCodec] = {}
+_codecs_by_id: dict[int, MessageCodec] = {}
+
+
+def register_codec(codec: MessageCodec):
+    if codec.id_ in _codecs_by_id and _codecs_by_id[codec.id_].name != codec.name:
+        raise ValueError(f"Codec id ({codec.id_}) already used by codec '{_codecs_by_id[codec.id_].name}'.")
+    _codecs_by_name[codec.name] = codec
+    _codecs_by_id[codec.id_] = codec
+
+
+def get_codec(name: str) -> MessageCodec:
+    try:
+        return _codecs_by_name[name]
+    except KeyError:
+        raise ValueError(f"Codec '{name}' not registered. Registered codecs: {list(_codecs_by_name)}")
+
+
+def decode_message(data: bytes) -> RabbitMessage:
+    try:
+        codec = _codecs_by_id[data[0]]
+    except KeyError:
+        raise ValueError(f"Unknown codec id ({data[0]}) for message.")
+    return codec.decode(data)
+
+
+#######################################################################################################################
+# Compact codec
+# layout: [codec id: u8][message type: u8][value per slot of the message class, in slot order]
+# values are typed: [tag: u8][payload]
+
+_message_types: list[type[RabbitMessage]] = [
+    RabbitMessage,
+    RabbitMessageError,
+    RabbitMessageCritical,
+    RabbitMessageAction,
+    RabbitMessageReply,
+    RabbitMessageRegister,
+    RabbitMessageUnRegister,
+]
+
+
+@functools.lru_cache
+def _get_slots(class_: type) -> tuple[str, ...]:
+    slots = []
+    for class__ in reversed(class_.__mro__):
+        slots += getattr(class__, "__slots__", ())
+    return tuple(slots)
+
+
+@functools.lru_cache
+def _get_unit(unit: str) -> Unit:
+    return Unit(unit)
+
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+_TAG_NONE = 0
+_TAG_TRUE = 1
+_TAG_FALSE = 2
+_TAG_INT = 3  # fits in int64
+_TAG_BIG_INT = 4  # e.g. uuid4().int
+_TAG_FLOAT = 5
+_TAG_STR = 6
+_TAG_BYTES = 7
+_TAG_LIST = 8
+_TAG_TUPLE = 9
+_TAG_DICT = 10
+_TAG_ARRAY = 11
+_TAG_QUANTITY = 12
+_TAG_PICKLE = 13  # fallback for everything else
+
+
+def _encode_int(buffer: bytearray, value: int):
+    if -2**63 <= value < 2**63:
+        buffer.append(_TAG_INT)
+        buffer += _I64.pack(value)
+    else:
+        length = (value.bit_length() + 8) // 8  # +8 for sign bit
+        buffer.append(_TAG_BIG_INT)
+        buffer.append(length)
+        buffer += value.to_bytes(length, "little", signed=True)
+
+
+def _encode_float(buffer: bytearray, value: float):
+    buffer.append(_TAG_FLOAT)
+    buffer += _F64.pack(value)
+
+
+def _encode_str(buffer: bytearray, value: str):
+    value = value.encode(config.encoding)
+    buffer.append(_TAG_STR)
+    buffer += _U32.pack(len(value))
+    buffer += value
+
+
+def _encode_bytes(buffer: bytearray, value: bytes):
+    buffer.append(_TAG_BYTES)
+    buffer += _U32.pack(len(value))
+    buffer += value
+
+
+def _encode_sequence(buffer: bytearray, value: list | tuple):
+    buffer.append(_TAG_LIST if isinstance(value, list) else _TAG_TUPLE)
+    buffer += _U32.pack(len(value))
+    for v in value:
+        _encode_value(buffer, v)
+
+
+def _encode_dict(buffer: bytearray, value: dict):
+    buffer.append(_TAG_DICT)
+    buffer += _U32.pack(len(value))
+    for k, v in value.items():
+        _encode_value(buffer, k)
+        _encode_value(buffer, v)
+
+
+def _encode_array(buffer: bytearray, value: np.ndarray):
+    if value.dtype.hasobject:
+        _encode_pickle(buffer, value)
+        return
+
+    dtype = value.dtype.str.encode("ascii")
+    buffer.append(_TAG_ARRAY)
+    buffer.append(len(dtype))
+    buffer += dtype
+    buffer.append(value.ndim)
+    for dim in value.shape:
+        buffer += _I64.pack(dim)
+    buffer += np.ascontiguousarray(value).data
+
+
+def _encode_quantity(buffer: bytearray, value: Quantity):
+    buffer.append(_TAG_QUANTITY)
+    _encode_value(buffer, value.v)
+    _encode_str(buffer, str(value.unit))
+
+
+def _encode_pickle(buffer: bytearray, value):
+    value = pickle.dumps(value, protocol=config.pickle_protocol)
+    buffer.append(_TAG_PICKLE)
+    buffer += _U32.pack(len(value))
+    buffer += value
+
+
+_encoders = {
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    list: _encode_sequence,
+    tuple: _encode_sequence,
+    dict: _encode_dict,
+    np.ndarray: _encode_array,
+    Quantity: _encode_quantity,
+}
+
+
+def _encode_value(buffer: bytearray, value):
+    if value is None:
+        buffer.append(_TAG_NONE)
+    elif value is True:
+        buffer.append(_TAG_TRUE)
+    elif value is False:
+        buffer.append(_TAG_FALSE)
+    else:
+        encoder = _encoders.get(type(value))  # exact type only; subclasses (enums, etc.) are pickled
+        if encoder is None:
+            _encode_pickle(buffer, value)
+        else:
+            encoder(buffer, value)
+
+
+def _decode_value(data: memoryview, index: int) -> tuple[object, int]:
+    """ returns value, index of next value """
+    tag = data[index]
+    index += 1
+
+    if tag == _TAG_NONE:
+        return None, index
+    if tag == _TAG_TRUE:
+        return True, index
+    if tag == _TAG_FALSE:
+        return False, index
+    if tag == _TAG_INT:
+        return _I64.unpack_from(data, index)[0], index + 8
+    if tag == _TAG_BIG_INT:
+        length = data[index]
+        index += 1
+        return int.from_bytes(data[index:index + length], "little", signed=True), index + length
+    if tag == _TAG_FLOAT:
+        return _F64.unpack_from(data, index)[0], index + 8
+    if tag == _TAG_STR or tag == _TAG_BYTES or tag == _TAG_PICKLE:
+        length = _U32.unpack_from(data, index)[0]
+        index += 4
+        value = data[index:index + length]
+        if tag == _TAG_STR:
+            value = str(value, config.encoding)
+        elif tag == _TAG_BYTES:
+            value = bytes(value)
+        else:
+            value = pickle.loads(value)
+        return value, index + length
+    if tag == _TAG_LIST or tag == _TAG_TUPLE:
+        length = _U32.unpack_from(data, index)[0]
+        index += 4
+        value = []
+        for _ in range(length):
+            v, index = _decode_value(data, index)
+            value.append(v)
+        if tag == _TAG_TUPLE:
+            value = tuple(value)
+        return value, index
+    if tag == _TAG_DICT:
+        length = _U32.unpack_from(data, index)[0]
+        index += 4
+        value = {}
+        for _ in range(length):
+            k, index = _decode_value(data, index)
+            value[k], index = _decode_value(data, index)
+        return value, index
+    if tag == _TAG_ARRAY:
+        length = data[index]
+        index += 1
+        dtype = np.dtype(str(data[index:index + length], "ascii"))
+        index += length
+        ndim = data[index]
+        index += 1
+        shape = struct.unpack_from(f"<{ndim}q", data, index)
+        index += 8 * ndim
+        count = 1
+        for dim in shape:
+            count *= dim
+        value = np.frombuffer(data, dtype=dtype, count=count, offset=index).reshape(shape).copy()
+        return value, index + count * dtype.itemsize
+    if tag == _TAG_QUANTITY:
+        value, index = _decode_value(data, index)
+        unit, index = _decode_value(data, index)
+        return Quantity(value, _get_unit(unit)), index
+
+    raise ValueError(f"Invalid tag ({tag}) in message.")
+
+
+class CompactCodec(MessageCodec):
+    """
+    Schema based encoding. The message class gives the schema (its __slots__), and each value is written with a
+    type tag. numpy arrays are written as raw bytes and Quantity as value + unit string. Anything else is pickled.
+    """
+    name = "compact"
+    id_ = 1
+
+    def __init__(self, message_types: list[type[RabbitMessage]] = None):
+        self.message_types = message_types if message_types is not None else _message_types
+        self._type_ids = {class_: i for i, class_ in enumerate(self.message_types)}
+
+    def encode(self, message: RabbitMessage) -> bytes:
+        try:
+            type_id = self._type_ids[type(message)]
+        except KeyError:
+            # message type not part of the schema
+            return _codecs_by_name[PickleCodec.name].encode(message)
+
+        buffer = bytearray((self.id_, type_id))
+        for slot in _get_slots(type(message)):
+            _encode_value(buffer, getattr(message, slot))
+        return bytes(buffer)
+
+    def decode(self, data: bytes) -> RabbitMessage:
+        if data[0] != self.id_:
+            return decode_message(data)  # encode() pickled it
+        class_ = self.message_types[data[1]]
+        message = class_.__new__(class_)
+
+        data = memoryview(data)
+        index = 2
+        for slot in _get_slots(class_):
+            value, index = _decode_value(data, index)
+            setattr(message, slot, value)
+
+        return message
+
+
+register_codec(PickleCodec())
+register_codec(PickleBufferCodec())
+register_codec(CompactCodec())
+register_codec(SharedMemoryCodec())
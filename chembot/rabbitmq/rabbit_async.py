@@ -0,0 +1,276 @@
+"""
+asyncio version of rabbit_core.py
+
+All AsyncRabbitMQConnection of a process (event loop) share one AMQP connection (AsyncRabbitMQ), and the broker pushes
+messages to them through basic_consume callbacks.
+
+"""
+import asyncio
+import collections
+import logging
+from typing import Callable, Iterable
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from chembot.configuration import config
+from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageReply, RabbitMessageRegister, \
+    RabbitMessageUnRegister
+from chembot.rabbitmq.rabbit_core import QueueCache, ReplyCollector
+
+logger = logging.getLogger(config.root_logger_name + ".rabbitmq")
+
+
+class AsyncRabbitMQ:
+    """ One AMQP connection + channel shared by all AsyncRabbitMQConnection in an event loop. """
+    _instances: dict[asyncio.AbstractEventLoop, "AsyncRabbitMQ"] = {}
+    _locks: dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}  # an asyncio.Lock belongs to one event loop
+
+    def __init__(self):
+        self.connection: AsyncioConnection | None = None
+        self.channel = None
+
+    @classmethod
+    async def get(cls) -> "AsyncRabbitMQ":
+        """ shared instance for the running event loop (connects on first call) """
+        loop = asyncio.get_running_loop()
+        lock = cls._locks.setdefault(loop, asyncio.Lock())
+
+        async with lock:
+            if loop not in cls._instances:
+                rabbit = cls()
+                await rabbit.connect()
+                cls._instances[loop] = rabbit
+
+        return cls._instances[loop]
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection is not None and self.connection.is_open
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        credentials = pika.PlainCredentials(config.rabbit_username, config.rabbit_password)
+        parameters = pika.ConnectionParameters(config.rabbit_host, config.rabbit_port, '/', credentials, heartbeat=600)
+        self.connection = AsyncioConnection(
+            parameters,
+            on_open_callback=lambda connection: future.set_result(connection),
+            on_open_error_callback=lambda connection, error: future.set_exception(ConnectionError(str(error))),
+            custom_ioloop=loop
+        )
+        await future
+
+        self.channel = await self.open_channel()
+        await self.call(self.channel.exchange_declare, exchange=config.rabbit_exchange, exchange_type='topic')
+
+    async def open_channel(self):
+        future = asyncio.get_running_loop().create_future()
+        self.connection.channel(on_open_callback=future.set_result)
+        return await future
+
+    @staticmethod
+    async def call(method: Callable, **kwargs):
+        """ await a pika method that takes a 'callback' """
+        future = asyncio.get_running_loop().create_future()
+        method(callback=lambda frame: future.done() or future.set_result(frame), **kwargs)
+        return await future
+
+    async def close(self):
+        if self.is_open:
+            self.connection.close()
+        for loop, rabbit in list(self._instances.items()):
+            if rabbit is self:
+                del self._instances[loop]
+                self._locks.pop(loop, None)
+
+
+class AsyncRabbitMQConnection:
+    def __init__(self, topic: str):
+        """
+
+        Parameters
+        ----------
+        topic:
+            name of the queue messages are consumed from
+        """
+        self.topic = topic
+        self.rabbit: AsyncRabbitMQ | None = None  # set by open()
+        self.queue_cache = QueueCache()
+        self._messages: asyncio.Queue[bytes | None] = asyncio.Queue()  # None: a message was returned
+        # messages received while waiting for specific replies; returned first by consume()
+        self._stash: collections.deque[RabbitMessage] = collections.deque()
+        self._waiting: set[int] = set()  # ids consume_replies() waits for replies to
+        self._returned: dict[int, str] = {}  # key: id of a waited for message the broker returned, value: destination
+
+    @property
+    def channel(self):
+        return self.rabbit.channel
+
+    @property
+    def messages_waiting(self) -> int:
+        """ number of messages delivered by the broker but not consumed yet """
+        return self._messages.qsize() + len(self._stash)
+
+    async def open(self, rabbit: AsyncRabbitMQ = None):
+        self.rabbit = rabbit if rabbit is not None else await AsyncRabbitMQ.get()
+        call = self.rabbit.call
+        await call(self.channel.queue_declare, queue=self.topic, auto_delete=True)
+        await call(self.channel.queue_purge, queue=self.topic)
+        await call(self.channel.queue_bind, queue=self.topic, exchange=config.rabbit_exchange,
+                   routing_key=config.rabbit_exchange + "." + self.topic)
+        self.channel.add_on_return_callback(self._on_return)
+        await call(self.channel.basic_consume, queue=self.topic, on_message_callback=self._on_message,
+                   auto_ack=True, consumer_tag=self.topic)
+        logger.debug(config.log_formatter(self, self.topic, "Rabbit connection established."))
+
+    def _on_message(self, channel, method, properties, body: bytes):
+        self._messages.put_nowait(body)
+
+    def _on_return(self, channel, method, properties, body: bytes):
+        """ message sent with check=True could not be routed (destination queue does not exist) """
+        message = RabbitMessage.from_bytes(body)
+        if message.source != self.topic:
+            return  # the channel is shared, so every connection gets the callback
+        logger.error(config.log_formatter(self, self.topic, "Queue does not exist yet:" + message.destination))
+        self.queue_cache.remove(message.destination)
+        if message.id_ in self._waiting:
+            self._returned[message.id_] = message.destination
+            self._messages.put_nowait(None)  # wake consume_replies()
+
+    async def queue_exists(self, queue_name: str) -> bool:
+        if queue_name in self.queue_cache:
+            return True
+
+        # separate channel as the broker closes the channel on a failed passive declare
+        channel = await self.rabbit.open_channel()
+        future = asyncio.get_running_loop().create_future()
+        channel.add_on_close_callback(lambda channel_, reason: future.done() or future.set_result(False))
+        channel.queue_declare(queue=queue_name, passive=True,
+                              callback=lambda frame: future.done() or future.set_result(True))
+        exists = await future
+        if channel.is_open:
+            channel.close()
+
+        if exists:
+            self.queue_cache.add(queue_name)
+        return exists
+
+    async def consume(self, timeout: int | float = 0, error_out: bool = False) -> RabbitMessage | None:
+        """
+        Get the next message. Waits till a message arrives or timeout is reached.
+
+        Parameters
+        ----------
+        timeout:
+            max time to wait for a message (seconds); 0 is non-blocking
+        error_out:
+            True: raise ValueError if no message was received
+
+        Returns
+        -------
+        message:
+            None if no message was received
+        """
+        if self._stash:
+            return self._stash.popleft()
+
+        message = await self._consume(timeout)
+        if message is None and error_out:
+            raise ValueError("No message to consume.")
+        return message
+
+    async def _consume(self, timeout: int | float) -> RabbitMessage | None:
+        """ next message from the broker (skips the stash) """
+        try:
+            if timeout <= 0:
+                body = self._messages.get_nowait()
+            else:
+                body = await asyncio.wait_for(self._messages.get(), timeout)
+        except (asyncio.QueueEmpty, asyncio.TimeoutError):
+            return None
+
+        if body is None:
+            return None
+        return self._process_message(body)
+
+    def _process_message(self, body: bytes) -> RabbitMessage | None:
+        try:
+            message = RabbitMessage.from_bytes(body)
+            logger.debug(config.log_formatter(self, self.topic, "Message received:" + message.to_str()))
+            if isinstance(message, RabbitMessageRegister):
+                self.queue_cache.add(message.source)
+            elif isinstance(message, RabbitMessageUnRegister):
+                self.queue_cache.remove(message.source)
+            return message
+        except Exception as e:
+            logger.exception(config.log_formatter(self, self.topic, "Received message caused Exception."))
+
+    async def consume_replies(self, ids: Iterable[int], timeout: int | float) -> dict[int, RabbitMessageReply]:
+        """
+        see RabbitMQConnection.consume_replies
+        Raises ValueError if the broker returned one of the messages (sent with check=True to a queue that does not
+        exist), as no reply will come.
+        """
+        collector = ReplyCollector(ids)
+        self._stash = collector.take_from(self._stash)  # replies stashed by earlier calls
+
+        waiting = set(collector.ids)
+        self._waiting.update(waiting)
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while not collector.done:
+                self._raise_returned(collector.ids)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                message = await self._consume(remaining)
+                if message is not None and not collector.add(message):
+                    self._stash.append(message)
+        finally:
+            self._waiting.difference_update(waiting)
+            for id_ in waiting:
+                self._returned.pop(id_, None)
+
+        return collector.replies
+
+    def _raise_returned(self, ids: set[int]):
+        returned = self._returned.keys() & ids
+        if returned:
+            raise ValueError("Queue does not exist yet:" + self._returned[returned.pop()])
+
+    def send(self, message: RabbitMessage, check: bool = True):
+        """
+        Publish message. Does not block.
+
+        check=True publishes the message as 'mandatory'. If the destination queue doesn't exist the broker returns the
+        message; the return arrives later, so it is raised (ValueError) by consume_replies()/send_and_consume() waiting
+        for a reply to the message, and otherwise only logged as an error.
+        """
+        try:
+            self.channel.basic_publish(
+                exchange=config.rabbit_exchange,
+                routing_key=config.rabbit_exchange + "." + message.destination,
+                body=message.to_bytes(),
+                properties=pika.BasicProperties(delivery_mode=2),
+                mandatory=check
+            )
+            logger.debug(config.log_formatter(self, self.topic, "Message sent:" + message.to_str()))
+        except Exception as e:
+            logger.error(config.log_formatter(self, self.topic, "Message not sent:" + message.to_str()))
+            raise e
+
+    async def send_and_consume(self, message: RabbitMessage, timeout: int | float = 0.3, error_out: bool = False) \
+            -> RabbitMessageReply | None:
+        self.send(message)
+        reply = (await self.consume_replies((message.id_,), timeout)).get(message.id_)
+        if reply is None and error_out:
+            raise ValueError(f"No reply received from message: {message.id_}")
+        return reply
+
+    async def deactivate(self):
+        if self.rabbit is not None and self.rabbit.is_open and self.channel.is_open:
+            await self.rabbit.call(self.channel.basic_cancel, consumer_tag=self.topic)
+        logger.debug(config.log_formatter(self, self.topic, "Rabbit connection closed."))
@@ -1,12 +1,17 @@
+import collections
+import functools
 import logging
-import pickle
+import threading
+import time
+from typing import Iterable
 
 import pika
 import pika.exceptions
 logging.getLogger("pika").setLevel(logging.WARNING)
 
 from chembot.configuration import config
-from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageReply
+from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageReply, RabbitMessageRegister, \
+    RabbitMessageUnRegister
 from chembot.rabbitmq.rabbit_http import get_list_queues, purge_queue
 
 logger = logging.getLogger(config.root_logger_name + ".rabbitmq")
@@ -41,12 +46,98 @@ def queue_exists(queue_name: str) -> bool:
     return False
 
 
+class QueueCache:
+    """
+    Queue names known to exist on the server.
+    Entries expire after 'timeout' seconds; after which the server needs to be asked again.
+    """
+    def __init__(self, timeout: int | float = None):
+        self.timeout = timeout if timeout is not None else config.rabbit_queue_cache_timeout
+        self._queues: dict[str, float] = {}  # key: queue name, value: expire time (time.monotonic)
+
+    def __contains__(self, queue_name: str) -> bool:
+        expire_time = self._queues.get(queue_name)
+        if expire_time is None:
+            return False
+        if time.monotonic() > expire_time:
+            del self._queues[queue_name]
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def add(self, queue_name: str):
+        self._queues[queue_name] = time.monotonic() + self.timeout
+
+    def remove(self, queue_name: str):
+        self._queues.pop(queue_name, None)
+
+    def clear(self):
+        self._queues.clear()
+
+
+class ReplyCollector:
+    """
+    Matches received messages to the replies expected (RabbitMessageReply.id_reply); shared by the consume_replies()
+    of RabbitMQConnection and AsyncRabbitMQConnection.
+    """
+    def __init__(self, ids: Iterable[int]):
+        self.ids = set(ids)  # replies still missing
+        self.replies: dict[int, RabbitMessageReply] = {}
+
+    @property
+    def done(self) -> bool:
+        return not self.ids
+
+    def add(self, message: RabbitMessage) -> bool:
+        """ True if message is one of the replies expected """
+        if isinstance(message, RabbitMessageReply) and message.id_reply in self.ids:
+            self.replies[message.id_reply] = message
+            self.ids.discard(message.id_reply)
+            return True
+        return False
+
+    def take_from(self, stash: collections.deque[RabbitMessage]) -> collections.deque[RabbitMessage]:
+        """ take the expected replies out of stash; returns the rest of it """
+        if not stash:
+            return stash
+        rest = collections.deque()
+        for message in stash:
+            if not self.add(message):
+                rest.append(message)
+        return rest
+
+
 class RabbitMQConnection:
-    def __init__(self, topic: str):
+    def __init__(self, topic: str, queue_cache: bool = None):
+        """
+
+        Parameters
+        ----------
+        topic:
+            name of the queue messages are consumed from
+        queue_cache:
+            True: cache queue existence checks (default from config.rabbit_queue_cache)
+        """
         self.topic = topic
         self.channel = get_rabbit_channel()
         create_queue(self.channel, self.topic)
         self.queue = self.channel.queue_declare(queue=topic, passive=True)
+
+        if queue_cache is None:
+            queue_cache = config.rabbit_queue_cache
+        self.queue_cache = QueueCache() if queue_cache else None
+        self._check_channel = None  # separate channel as the broker closes the channel on a failed passive declare
+        self._thread_id: int | None = None  # thread running the consume loop (see bind_thread)
+
+        # push-based consumer: broker delivers messages to the callback while process_data_events() is running
+        self._messages: collections.deque[bytes] = collections.deque()
+        # messages received while waiting for specific replies; returned first by consume()
+        self._stash: collections.deque[RabbitMessage] = collections.deque()
+        self.channel.basic_consume(
+            queue=self.topic, on_message_callback=self._on_message, auto_ack=True, consumer_tag=self.topic
+        )
         logger.debug(config.log_formatter(self, self.topic, "Rabbit connection established."))
 
     # don't think it works
@@ -55,31 +146,110 @@ class RabbitMQConnection:
     #     return self.queue.method.message_count
     #     # return self.channel.get_waiting_message_count()
 
-    @staticmethod
-    def queue_exists(queue_name: str) -> bool:
-        return queue_exists(queue_name)
+    def queue_exists(self, queue_name: str) -> bool:
+        if self.queue_cache is None:
+            return self._queue_declare_passive(queue_name)
+
+        if queue_name in self.queue_cache:
+            return True
+
+        if self._queue_declare_passive(queue_name):
+            self.queue_cache.add(queue_name)
+            return True
+        return False
+
+    def _queue_declare_passive(self, queue_name: str) -> bool:
+        """ check if queue exists over AMQP (much faster than the http api) """
+        if self._check_channel is None or self._check_channel.is_closed:
+            self._check_channel = self.channel.connection.channel()
+
+        try:
+            self._check_channel.queue_declare(queue=queue_name, passive=True)
+            return True
+        except pika.exceptions.ChannelClosedByBroker:
+            # 404: queue not found; broker closed the channel
+            self._check_channel = None
+            return False
+
+    @property
+    def messages_waiting(self) -> int:
+        """ number of messages delivered by the broker but not consumed yet """
+        return len(self._messages) + len(self._stash)
+
+    def _on_message(self, channel, method, properties, body: bytes):
+        self._messages.append(body)
+
+    def consume(self, timeout: int | float = 0, error_out: bool = False) -> RabbitMessage | None:
+        """
+        Get the next message. Blocks till a message arrives or timeout is reached; returns immediately on message
+        arrival.
+
+        Parameters
+        ----------
+        timeout:
+            max time to wait for a message (seconds); 0 is non-blocking
+        error_out:
+            True: raise ValueError if no message was received
 
-    def consume(self, timeout: int | float = 0.000_001, error_out: bool = False) -> RabbitMessage | None:
-        for method, properties, body in self.channel.consume(
-                queue=self.topic, auto_ack=True, inactivity_timeout=timeout):
-            if body is None:
-                if error_out:
-                    raise ValueError("No message to consume.")
+        Returns
+        -------
+        message:
+            None if no message was received
+        """
+        if self._stash:
+            return self._stash.popleft()
 
-                return None
+        message = self._consume(timeout)
+        if message is None and error_out:
+            raise ValueError("No message to consume.")
+        return message
 
-            return self._process_message(body)
+    def _consume(self, timeout: int | float) -> RabbitMessage | None:
+        """ next message from the broker (skips the stash) """
+        if not self._messages:
+            deadline = time.monotonic() + timeout
+            while True:
+                self.channel.connection.process_data_events(time_limit=max(deadline - time.monotonic(), 0))
+                if self._messages or time.monotonic() >= deadline:
+                    break
+
+        if not self._messages:
+            return None
+
+        return self._process_message(self._messages.popleft())
 
     def _process_message(self, body: bytes) -> RabbitMessage | None:
         try:
-            message = pickle.loads(body)
+            message = RabbitMessage.from_bytes(body)
             logger.debug(config.log_formatter(self, self.topic, "Message received:" + message.to_str()))
+            self._update_queue_cache(message)
             return message
         except Exception as e:
             logger.exception(config.log_formatter(self, self.topic, "Received message caused Exception."))
 
+    def _update_queue_cache(self, message: RabbitMessage):
+        if self.queue_cache is None:
+            return
+
+        if isinstance(message, RabbitMessageRegister):
+            self.queue_cache.add(message.source)
+        elif isinstance(message, RabbitMessageUnRegister):
+            self.queue_cache.remove(message.source)
+
+    def bind_thread(self):
+        """
+        Set the calling thread as the owner of the connection (the one running consume()). send() from any other
+        thread is then handed over to the owner thread, as pika connections are not thread safe.
+        """
+        self._thread_id = threading.get_ident()
+
     def send(self, message: RabbitMessage, check: bool = True):
-        if check and not queue_exists(message.destination):
+        if self._thread_id is not None and threading.get_ident() != self._thread_id:
+            # published by the owner thread on its next consume()
+            self.channel.connection.add_callback_threadsafe(functools.partial(self._send_threadsafe, message, check))
+            return
+
+        if check and not self.queue_exists(message.destination):
             logger.error(config.log_formatter(self, self.topic, "Queue does not exist yet:" + message.destination))
             raise ValueError("Queue does not exist yet:" + message.destination)
 
@@ -95,14 +265,55 @@ class RabbitMQConnection:
             logger.error(config.log_formatter(self, self.topic, "Message not sent:" + message.to_str()))
             raise e
 
+    def _send_threadsafe(self, message: RabbitMessage, check: bool):
+        # runs inside process_data_events(); errors can't be raised back to the sending thread
+        try:
+            self.send(message, check)
+        except Exception:
+            logger.exception(config.log_formatter(self, self.topic, "Message not sent:" + message.to_str()))
+
+    def consume_replies(self, ids: Iterable[int], timeout: int | float) -> dict[int, RabbitMessageReply]:
+        """
+        Gather the replies to the given message ids (matched on RabbitMessageReply.id_reply) with one overall
+        timeout. Any other message received while waiting is stashed and returned by later consume() calls.
+
+        Parameters
+        ----------
+        ids:
+            ids of the messages replies are expected for
+        timeout:
+            max time to wait for all replies (seconds)
+
+        Returns
+        -------
+        replies:
+            key: message id, value: reply; replies not received within timeout are missing
+        """
+        collector = ReplyCollector(ids)
+        self._stash = collector.take_from(self._stash)  # replies stashed by earlier calls
+
+        deadline = time.monotonic() + timeout
+        while not collector.done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            message = self._consume(remaining)
+            if message is not None and not collector.add(message):
+                self._stash.append(message)
+
+        return collector.replies
+
     def send_and_consume(self, message: RabbitMessage, timeout: int | float = 0.3, error_out: bool = False) \
             -> RabbitMessageReply | None:
         self.send(message)
-        try:
-            return self.consume(timeout, error_out)
-        except ValueError:
+        reply = self.consume_replies((message.id_,), timeout).get(message.id_)
+        if reply is None and error_out:
             raise ValueError(f"No reply received from message: {message.id_}")
+        return reply
 
     def deactivate(self):
+        if self._check_channel is not None and self._check_channel.is_open:
+            self._check_channel.close()
         self.channel.basic_cancel(self.topic)
         logger.debug(config.log_formatter(self, self.topic, "Rabbit connection closed."))
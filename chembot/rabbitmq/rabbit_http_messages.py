@@ -7,7 +7,6 @@ Extension to rabbit_http.py to handle send/receiving RabbitMessages.
 import json
 import time
 import logging
-import pickle
 
 from chembot.configuration import config
 from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageReply
@@ -39,9 +38,9 @@ def read_message(queue: str, time_out: float = 1) -> str | bytes:
 
 def re_create_message(message: str | bytes) -> RabbitMessageReply:
     # str -> json
-    # bytes -> pickled python object
+    # bytes -> encoded RabbitMessage (see config.rabbit_codec)
     if isinstance(message, bytes):
-        return pickle.loads(message)
+        return RabbitMessage.from_bytes(message)
     return json.loads(message)
 
 
@@ -0,0 +1,121 @@
+"""
+Request/reply (RPC) layer on top of RabbitMQConnection.
+
+Messages are sent all at once and replies are gathered by correlation id (RabbitMessageReply.id_reply == message.id_)
+with a single overall timeout. Messages that don't match are stashed on the connection for later pickup.
+
+"""
+import logging
+from typing import Iterable
+
+from chembot.configuration import config
+from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageReply
+from chembot.rabbitmq.rabbit_core import RabbitMQConnection
+
+logger = logging.getLogger(config.root_logger_name + ".rabbitmq")
+
+
+class RabbitFuture:
+    """ Placeholder for the reply to a sent message. """
+    __slots__ = ("message", "reply")
+
+    def __init__(self, message: RabbitMessage):
+        self.message = message
+        self.reply: RabbitMessageReply | None = None
+
+    def __str__(self):
+        return f"RabbitFuture({self.message.destination}, id: {self.id_}, done: {self.done})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def id_(self) -> int:
+        return self.message.id_
+
+    @property
+    def done(self) -> bool:
+        return self.reply is not None
+
+    def result(self):
+        """ reply value; raises ValueError if no reply was received """
+        if self.reply is None:
+            raise ValueError(f"No reply received from message: {self.id_}")
+        return self.reply.value
+
+
+class RabbitRPC:
+    def __init__(self, rabbit: RabbitMQConnection):
+        self.rabbit = rabbit
+        self._futures: dict[int, RabbitFuture] = {}  # futures still waiting for a reply
+
+    @property
+    def number_of_pending(self) -> int:
+        return len(self._futures)
+
+    def submit(self, messages: RabbitMessage | Iterable[RabbitMessage]) -> dict[int, RabbitFuture]:
+        """ send all messages; returns futures keyed by message id """
+        if isinstance(messages, RabbitMessage):
+            messages = [messages]
+
+        futures = {}
+        for message in messages:
+            self.rabbit.send(message)
+            futures[message.id_] = RabbitFuture(message)
+
+        self._futures.update(futures)
+        return futures
+
+    def gather(self,
+               futures: dict[int, RabbitFuture] = None,
+               timeout: int | float = None,
+               error_out: bool = False
+               ) -> dict[int, RabbitFuture]:
+        """
+        Wait for replies to the futures.
+
+        Parameters
+        ----------
+        futures:
+            futures to wait on; default is all pending futures
+        timeout:
+            max time to wait for all replies (seconds); default config.rabbit_queue_timeout
+        error_out:
+            True: raise ValueError if any reply is missing after timeout
+
+        Returns
+        -------
+        futures:
+            same futures with replies filled in
+        """
+        if futures is None:
+            futures = dict(self._futures)
+        if timeout is None:
+            timeout = config.rabbit_queue_timeout
+
+        ids = [id_ for id_, future in futures.items() if not future.done]
+        for id_, reply in self.rabbit.consume_replies(ids, timeout).items():
+            futures[id_].reply = reply
+
+        for id_, future in futures.items():
+            if future.done:
+                self._futures.pop(id_, None)
+
+        if error_out:
+            missing = [future for future in futures.values() if not future.done]
+            if missing:
+                raise ValueError(f"No reply received from messages: {missing}")
+
+        return futures
+
+    def call(self,
+             messages: Iterable[RabbitMessage],
+             timeout: int | float = None,
+             error_out: bool = True
+             ) -> list:
+        """
+        send all messages, wait for all replies and return reply values in the order of messages
+        (timeout: default config.rabbit_queue_timeout)
+        """
+        futures = self.gather(self.submit(messages), timeout, error_out)
+        return [future.reply.value if future.done else None for future in futures.values()]
@@ -1,3 +1,4 @@
+import heapq
 import time
 import logging
 from typing import Protocol
@@ -21,16 +22,23 @@ class WatchdogEvent:
         self.expect_reply = expect_reply
         self.reply_callback = reply_callback
 
-        self.warn_time = time.time() + delay
+        self.warn_time = time.monotonic() + delay
 
     def __str__(self):
         return f"{self.id_}: {self.warn_time}"
 
 
 class RabbitWatchdog:
+    """
+    Watchdogs are kept in a min-heap ordered by warn_time, so checking is O(1) when nothing has expired.
+    Deactivated watchdogs are removed from the dict right away, but only lazily from the heap.
+    """
+    _COMPACT_MIN_SIZE = 1000  # don't bother compacting small heaps
+
     def __init__(self, parent: ParentInterfaceWatchdog):
         self.parent = parent
         self.watchdogs: dict[int, WatchdogEvent] = {}
+        self._heap: list[tuple[float, int]] = []  # (warn_time, id_)
 
     def __contains__(self, item: int) -> bool:
         return item in self.watchdogs.keys()
@@ -51,7 +59,9 @@ class RabbitWatchdog:
             function to call upon receiving the reply.
 
         """
-        self.watchdogs[message.id_] = WatchdogEvent(message.id_, delay, expected_reply, reply_callback)
+        watchdog = WatchdogEvent(message.id_, delay, expected_reply, reply_callback)
+        self.watchdogs[message.id_] = watchdog
+        heapq.heappush(self._heap, (watchdog.warn_time, watchdog.id_))
 
     def deactivate_watchdog(self, message: RabbitMessageReply):
         if message.id_reply not in self.watchdogs:
@@ -68,18 +78,28 @@ class RabbitWatchdog:
             watchdog.reply_callback(message)
 
         del self.watchdogs[message.id_reply]
+        self._compact()
 
     def check_watchdogs(self):
-        now = time.time()
-        del_watchdog = []
-        for id_, watchdog in self.watchdogs.items():
-            if now > watchdog.warn_time:
-                # trigger watchdog
-                del_watchdog.append(id_)
-                self.parent.rabbit.send(
-                    RabbitMessageError(self.parent.name, f"Watchdog triggered for message {watchdog}")
-                )
-
-        # delete triggered watchdogs
-        for id_ in del_watchdog:
+        heap = self._heap
+        if not heap:
+            return
+
+        now = time.monotonic()
+        while heap and now > heap[0][0]:
+            warn_time, id_ = heapq.heappop(heap)
+            watchdog = self.watchdogs.get(id_)
+            if watchdog is None or watchdog.warn_time != warn_time:
+                continue  # deactivated (or re-set) watchdog
+
+            # trigger watchdog
             del self.watchdogs[id_]
+            self.parent.rabbit.send(
+                RabbitMessageError(self.parent.name, f"Watchdog triggered for message {watchdog}")
+            )
+
+    def _compact(self):
+        """ remove deactivated watchdogs from heap once they make up most of it """
+        if len(self._heap) > self._COMPACT_MIN_SIZE and len(self._heap) > 2 * len(self.watchdogs):
+            self._heap = [(watchdog.warn_time, id_) for id_, watchdog in self.watchdogs.items()]
+            heapq.heapify(self._heap)
@@ -1,4 +1,5 @@
 from chembot.scheduler.event import Event
 from chembot.scheduler.job import Job, JobSequence, JobConcurrent
+from chembot.scheduler.job_template import JobTemplate, JobSweep, Parameter
 from chembot.scheduler.schedule import Schedule
 from chembot.scheduler.submit_result import JobSubmitResult
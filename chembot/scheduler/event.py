@@ -1,10 +1,32 @@
 from __future__ import annotations
 
+import itertools
+import os
 import uuid
 from typing import Protocol, Callable
 from datetime import datetime, timedelta
 
 
+# ids of events/jobs: random 64-bit per process prefix + counter (unique like uuid4, without a syscall per id)
+_id_prefix = uuid.uuid4().int >> 64 << 64
+_id_counter = itertools.count()
+
+
+def _reset_id_prefix():
+    global _id_prefix, _id_counter
+    _id_prefix = uuid.uuid4().int >> 64 << 64
+    _id_counter = itertools.count()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows (no fork; processes re-import this module)
+    os.register_at_fork(after_in_child=_reset_id_prefix)
+
+
+def new_id() -> int:
+    """ 128-bit id (same range as uuid.uuid4().int) """
+    return _id_prefix | next(_id_counter)
+
+
 class Parent(Protocol):
     """ Protocol which mirrors Job """
     time_start: datetime
@@ -15,6 +37,9 @@ class Parent(Protocol):
     def _get_time_start(self, obj) -> datetime:
         ...
 
+    def _invalidate(self):
+        ...
+
 
 class Event:
     def __init__(self,
@@ -28,7 +53,7 @@ class Event:
                  name: str = None,
                  parent: Parent = None
                  ):
-        if isinstance(callable_, Callable):
+        if callable(callable_):
             callable_ = callable_.__name__
         if name is None:
             name = f"{resource}.{callable_}"
@@ -38,10 +63,10 @@ class Event:
         self._duration = duration
         self.priority = priority
         self.kwargs = kwargs
-        self.delay = delay
+        self._delay = delay
         self.parent = parent
 
-        self.id_ = uuid.uuid4().int
+        self.id_ = new_id()
         self.completed = False
 
     def __str__(self):
@@ -58,6 +83,16 @@ class Event:
     def id_job(self) -> int:
         return self.parent.id_job
 
+    @property
+    def delay(self) -> timedelta | None:
+        return self._delay
+
+    @delay.setter
+    def delay(self, delay: timedelta | None):
+        self._delay = delay
+        if self.parent is not None:
+            self.parent._invalidate()  # cached job timing
+
     @property
     def time_start(self) -> datetime:
         """ not includes delay """
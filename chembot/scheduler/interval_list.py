@@ -0,0 +1,267 @@
+"""
+Sorted list of intervals (start, end, item) for the Resource timeline.
+
+Rows are kept sorted by start in buckets of at most 2 * load rows (split in half when full). A tree over the buckets
+holds the number of rows and the latest end of each subtree, so
+* insert / remove: O(log n + load) (bisect, shift inside one bucket, tree update)
+* row by index: O(log n)
+* overlapping(): only visits buckets with a row ending after the query start, and in each only the rows starting
+  within the bucket's longest interval of the query; a long interval only slows down queries of its own bucket
+
+"""
+from __future__ import annotations
+
+import bisect
+from typing import Iterator
+
+
+class IntervalList:
+    load = 256
+
+    def __init__(self):
+        self._starts: list[list] = []  # per bucket; sorted
+        self._ends: list[list] = []
+        self._items: list[list] = []
+        self._firsts: list = []  # first start of every bucket
+        self._lengths: list = []  # longest end - start of every bucket
+        self._length_counts: list[dict] = []  # per bucket; key: end - start, value: number of rows
+        # tree over the buckets (leaf of bucket b: _size + b)
+        self._size = 1
+        self._counts: list[int] = [0, 0]
+        self._max_ends: list = [None, None]  # None: no rows
+
+    def __len__(self):
+        return self._counts[1]
+
+    def __iter__(self) -> Iterator:
+        for items in self._items:
+            yield from items
+
+    def __getitem__(self, index: int):
+        bucket, i = self._locate(index)
+        return self._items[bucket][i]
+
+    @property
+    def max_end(self):
+        """ latest end of all rows (None if empty) """
+        return self._max_ends[1]
+
+    def row(self, index: int) -> tuple:
+        """ (start, end, item) """
+        bucket, i = self._locate(index)
+        return self._starts[bucket][i], self._ends[bucket][i], self._items[bucket][i]
+
+    def rows(self, index: int = 0) -> Iterator[tuple]:
+        """ (start, end, item) from index on """
+        if index >= len(self):
+            return
+        bucket, i = self._locate(index)
+        yield from self._rows(bucket, i)
+
+    def rows_from(self, start) -> Iterator[tuple]:
+        """ (start, end, item) from the last row starting at or before start (from the first row if there is none) """
+        if not self._firsts:
+            return
+        bucket = max(bisect.bisect_right(self._firsts, start) - 1, 0)
+        i = max(bisect.bisect_right(self._starts[bucket], start) - 1, 0)
+        yield from self._rows(bucket, i)
+
+    def _rows(self, bucket: int, i: int) -> Iterator[tuple]:
+        for bucket in range(bucket, len(self._items)):
+            starts = self._starts[bucket]
+            ends = self._ends[bucket]
+            items = self._items[bucket]
+            for i in range(i, len(starts)):
+                yield starts[i], ends[i], items[i]
+            i = 0
+
+    def bisect_left(self, start) -> int:
+        if not self._firsts:
+            return 0
+        bucket = max(bisect.bisect_left(self._firsts, start) - 1, 0)
+        return self._offset(bucket) + bisect.bisect_left(self._starts[bucket], start)
+
+    def bisect_right(self, start) -> int:
+        if not self._firsts:
+            return 0
+        bucket = max(bisect.bisect_right(self._firsts, start) - 1, 0)
+        return self._offset(bucket) + bisect.bisect_right(self._starts[bucket], start)
+
+    def insert(self, start, end, item) -> int:
+        """ insert after rows with the same start; returns index """
+        if not self._firsts:
+            self._starts.append([start])
+            self._ends.append([end])
+            self._items.append([item])
+            self._firsts.append(start)
+            self._lengths.append(end - start)
+            self._length_counts.append({end - start: 1})
+            self._rebuild()
+            return 0
+
+        bucket = max(bisect.bisect_right(self._firsts, start) - 1, 0)
+        i = bisect.bisect_right(self._starts[bucket], start)
+        self._starts[bucket].insert(i, start)
+        self._ends[bucket].insert(i, end)
+        self._items[bucket].insert(i, item)
+        self._firsts[bucket] = self._starts[bucket][0]
+        length = end - start
+        length_counts = self._length_counts[bucket]
+        length_counts[length] = length_counts.get(length, 0) + 1
+        if length > self._lengths[bucket]:
+            self._lengths[bucket] = length
+        index = self._offset(bucket) + i
+
+        if len(self._starts[bucket]) > 2 * self.load:
+            self._split(bucket)
+        else:
+            counts = self._counts
+            max_ends = self._max_ends
+            node = self._size + bucket
+            while node:
+                counts[node] += 1
+                if max_ends[node] is None or end > max_ends[node]:
+                    max_ends[node] = end
+                node //= 2
+        return index
+
+    def pop(self, index: int) -> tuple:
+        """ remove row; returns (start, end, item) """
+        bucket, i = self._locate(index)
+        row = self._starts[bucket].pop(i), self._ends[bucket].pop(i), self._items[bucket].pop(i)
+
+        if not self._starts[bucket]:
+            del self._starts[bucket]
+            del self._ends[bucket]
+            del self._items[bucket]
+            del self._firsts[bucket]
+            del self._lengths[bucket]
+            del self._length_counts[bucket]
+            self._rebuild()
+            return row
+
+        self._firsts[bucket] = self._starts[bucket][0]
+        length = row[1] - row[0]
+        length_counts = self._length_counts[bucket]
+        length_counts[length] -= 1
+        if not length_counts[length]:
+            del length_counts[length]
+            if length == self._lengths[bucket]:
+                self._lengths[bucket] = max(length_counts)  # few distinct lengths
+        node = self._size + bucket
+        self._counts[node] -= 1
+        update_max = row[1] == self._max_ends[node]
+        if update_max:
+            self._max_ends[node] = max(self._ends[bucket])
+        node //= 2
+        while node:
+            if update_max and self._max_ends[node] == row[1]:
+                self._pull(node)
+            else:
+                update_max = False  # later end in this subtree, so in all above
+                self._counts[node] -= 1
+            node //= 2
+        return row
+
+    def index(self, item, start) -> int:
+        """ index of item (identity) with the given start; ValueError if not found """
+        index = self.bisect_left(start)
+        for start_, _, item_ in self.rows(index):
+            if start_ != start:
+                break
+            if item_ is item:
+                return index
+            index += 1
+
+        raise ValueError(f"{item} not in list (with start {start}).")
+
+    def overlapping(self, time_start, time_end) -> Iterator[tuple]:
+        """ rows (start, end, item) with start < time_end and end > time_start; in start order """
+        if not self._firsts:
+            return
+        last = bisect.bisect_left(self._firsts, time_end) - 1  # buckets after it start at or after time_end
+        for bucket in self._buckets_ending_after(time_start, last):
+            starts = self._starts[bucket]
+            ends = self._ends[bucket]
+            # rows starting earlier end at or before time_start
+            i = bisect.bisect_right(starts, time_start - self._lengths[bucket])
+            ii = bisect.bisect_left(starts, time_end)
+            for i in range(i, ii):
+                if ends[i] > time_start:
+                    yield starts[i], ends[i], self._items[bucket][i]
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """ (bucket, index in bucket) of row index """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IntervalList index out of range")
+
+        node = 1
+        while node < self._size:
+            node *= 2
+            if index >= self._counts[node]:
+                index -= self._counts[node]
+                node += 1
+        return node - self._size, index
+
+    def _offset(self, bucket: int) -> int:
+        """ number of rows in the buckets before bucket """
+        offset = 0
+        node = self._size + bucket
+        while node > 1:
+            if node & 1:
+                offset += self._counts[node - 1]
+            node //= 2
+        return offset
+
+    def _buckets_ending_after(self, time_, last: int) -> Iterator[int]:
+        """ buckets <= last with a row ending after time_, in order """
+        stack = [(1, 0, self._size)]  # node, first bucket, number of buckets
+        while stack:
+            node, first, width = stack.pop()
+            max_end = self._max_ends[node]
+            if first > last or max_end is None or max_end <= time_:
+                continue
+            if width == 1:
+                yield first
+                continue
+            width //= 2
+            stack.append((2 * node + 1, first + width, width))
+            stack.append((2 * node, first, width))
+
+    def _split(self, bucket: int):
+        for list_ in (self._starts, self._ends, self._items):
+            rows = list_[bucket]
+            list_[bucket:bucket + 1] = [rows[:self.load], rows[self.load:]]
+        self._firsts.insert(bucket + 1, self._starts[bucket + 1][0])
+        counts = [self._count_lengths(bucket), self._count_lengths(bucket + 1)]
+        self._length_counts[bucket:bucket + 1] = counts
+        self._lengths[bucket:bucket + 1] = [max(counts_) for counts_ in counts]
+        self._rebuild()
+
+    def _count_lengths(self, bucket: int) -> dict:
+        counts = {}
+        for start, end in zip(self._starts[bucket], self._ends[bucket]):
+            counts[end - start] = counts.get(end - start, 0) + 1
+        return counts
+
+    def _rebuild(self):
+        """ tree from the buckets; after buckets are added or removed (every ~load inserts or removals) """
+        size = 1
+        while size < len(self._starts):
+            size *= 2
+        self._size = size
+        self._counts = [0] * (2 * size)
+        self._max_ends = [None] * (2 * size)
+        for bucket, ends in enumerate(self._ends):
+            self._counts[size + bucket] = len(ends)
+            self._max_ends[size + bucket] = max(ends)
+        for node in range(size - 1, 0, -1):
+            self._pull(node)
+
+    def _pull(self, node: int):
+        left = self._max_ends[2 * node]
+        right = self._max_ends[2 * node + 1]
+        self._counts[node] = self._counts[2 * node] + self._counts[2 * node + 1]
+        self._max_ends[node] = left if right is None or (left is not None and left >= right) else right
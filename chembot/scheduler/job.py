@@ -2,10 +2,9 @@ from __future__ import annotations
 
 import abc
 from datetime import timedelta, datetime
-from typing import Collection
-import uuid
+from typing import Collection, Iterator
 
-from chembot.scheduler.event import Event
+from chembot.scheduler.event import Event, new_id
 
 
 class Job(abc.ABC):
@@ -14,20 +13,26 @@ class Job(abc.ABC):
                  delay: timedelta = None,
                  name: str = None,
                  parent: Job = None,
-                 time_start: datetime = None
+                 time_start: datetime = None,
+                 priority: int = 0
                  ):
-        self.id_ = uuid.uuid4().int
+        self.id_ = new_id()
         self.name = name
-        self.delay = delay
-        self._ids: set[int] = set()
+        self.priority = priority  # higher first; see Schedular.add_jobs
+        self._delay = delay
         self._events: list[Event] = []
-        if events is not None:
-            self.add_event(events)
-
         self.parent = parent
         self.completed = False
         self._time_start = time_start
 
+        # caches; cleared by _invalidate()
+        self._len: int | None = None
+        self._duration: timedelta | None = None
+        self._timing: dict[int, datetime] | None = None  # root only; key: id_ of every job/event in tree, value: start
+
+        if events is not None:
+            self.add_event(events)
+
     def __str__(self):
         text = type(self).__name__
         if self.name is not None:
@@ -40,14 +45,25 @@ class Job(abc.ABC):
         return self.__str__()
 
     def __len__(self) -> int:
-        count = 0
-        for ev in self.events:
-            if isinstance(ev, Job):
-                count += len(ev)
-            else:
-                count += 1
+        if self._len is None:
+            count = 0
+            for ev in self.events:
+                if isinstance(ev, Job):
+                    count += len(ev)
+                else:
+                    count += 1
+            self._len = count
+
+        return self._len
+
+    @property
+    def delay(self) -> timedelta | None:
+        return self._delay
 
-        return count
+    @delay.setter
+    def delay(self, delay: timedelta | None):
+        self._delay = delay
+        self._invalidate()
 
     @property
     def id_job(self) -> int:
@@ -78,10 +94,16 @@ class Job(abc.ABC):
             raise ValueError("Start time can not be set if there is a parent")
 
         self._time_start = time_start
+        self._invalidate()
 
     @property
-    @abc.abstractmethod
     def duration(self) -> timedelta:
+        if self._duration is None:
+            self._duration = self._get_duration()
+        return self._duration
+
+    @abc.abstractmethod
+    def _get_duration(self) -> timedelta:
         ...
 
     @property
@@ -100,6 +122,14 @@ class Job(abc.ABC):
             return self
         return self.parent.root
 
+    def iter_events(self) -> Iterator[Event]:
+        """ all events in the tree (depth-first) """
+        for event in self.events:
+            if isinstance(event, Job):
+                yield from event.iter_events()
+            else:
+                yield event
+
     def add_event(self, event: Collection[Event | Job, ...] | Event | Job):
         if isinstance(event, Job) or isinstance(event, Event):
             event = [event]
@@ -108,32 +138,69 @@ class Job(abc.ABC):
         self._events += event
         for event_ in event:
             event_.parent = self
+        self._invalidate()
 
     def _id_check(self, events: Collection[Event | Job, ...]):
+        """
+        O(len(events)): an event/job can only be in one tree once (its parent is set when added). Copies (same id_,
+        different object) are found by get_duplicate_ids() when the job is validated.
+        """
+        added = set()
         for event in events:
-            if event.id_ in self._ids:
+            if event.parent is not None or id(event) in added or event is self:
                 raise ValueError(
                     "Duplicate event not allowed. Events must be re-made from scratch to be performed twice.\n"
                     f"Duplicate event:{event.name} (id: {event.id_})"
                 )
-            self._ids.add(event.id_)
+            added.add(id(event))
 
+    def iter_tree(self) -> Iterator[Event | Job]:
+        """ self and all jobs and events below it (depth-first) """
+        yield self
+        for event in self.events:
             if isinstance(event, Job):
-                if len(self._ids.intersection(event._ids)) != 0:
-                    raise ValueError(
-                        "Duplicate event not allowed. Events must be re-made from scratch to be performed twice.\n"
-                        f"Duplicate event:{event.name} (id: {event.id_})"
-                    )
-                self._ids = self._ids.union(event._ids)
+                yield from event.iter_tree()
+            else:
+                yield event
+
+    def get_duplicate_ids(self) -> list[int]:
+        """ ids found more than once in the tree (one pass) """
+        ids = set()
+        duplicates = []
+        for obj in self.iter_tree():
+            if obj.id_ in ids:
+                duplicates.append(obj.id_)
+            ids.add(obj.id_)
+        return duplicates
+
+    def _invalidate(self):
+        """ clear cached length, duration and timing up the tree (events, delays or start time changed) """
+        job = self
+        while job is not None:
+            job._len = None
+            job._duration = None
+            job._timing = None
+            job = job.parent
+
+    def _get_time_start(self, obj) -> datetime | None:
+        """ start time (no delay) of a job/event in the tree """
+        root = self.root
+        if root._time_start is None:
+            return None
+        if root._timing is None:
+            # one pass over the whole tree; cached till something changes
+            root._timing = {}
+            root._set_timing(root._time_start, root._timing)
+        return root._timing[obj.id_]
 
     @abc.abstractmethod
-    def _get_time_start(self, obj) -> datetime:
+    def _set_timing(self, time_start: datetime, timing: dict[int, datetime]):
+        """ add start time (no delay) of self and all children to timing """
         ...
 
 
 class JobSequence(Job):
-    @property
-    def duration(self) -> timedelta:
+    def _get_duration(self) -> timedelta:
         sum_ = timedelta(0)
         for event_ in self.events:
             if event_.delay:
@@ -144,17 +211,21 @@ class JobSequence(Job):
 
         return sum_
 
-    def _get_time_start(self, obj) -> datetime:
-        index = self.events.index(obj)
-        if index == 0:
-            return self.time_start_with_delay
-
-        return self.events[index-1].time_end
+    def _set_timing(self, time_start: datetime, timing: dict[int, datetime]):
+        timing[self.id_] = time_start
+        time_ = time_start + self.delay if self.delay is not None else time_start
+        for event_ in self.events:
+            # next one starts at the time_end of the previous
+            if isinstance(event_, Job):
+                event_._set_timing(time_, timing)
+                time_ += event_.duration
+            else:
+                timing[event_.id_] = time_
+                time_ += event_.duration + event_.delay if event_.delay is not None else event_.duration
 
 
 class JobConcurrent(Job):
-    @property
-    def duration(self) -> timedelta:
+    def _get_duration(self) -> timedelta:
         max_ = timedelta(0)
         for event_ in self.events:
             if event_.delay:
@@ -166,5 +237,11 @@ class JobConcurrent(Job):
                 max_ = event_duration
         return max_
 
-    def _get_time_start(self, obj) -> datetime:
-        return self.time_start_with_delay
+    def _set_timing(self, time_start: datetime, timing: dict[int, datetime]):
+        timing[self.id_] = time_start
+        time_ = time_start + self.delay if self.delay is not None else time_start
+        for event_ in self.events:
+            if isinstance(event_, Job):
+                event_._set_timing(time_, timing)
+            else:
+                timing[event_.id_] = time_
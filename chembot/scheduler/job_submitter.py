@@ -1,9 +1,12 @@
+from datetime import datetime
 
 from chembot.rabbitmq.messages import RabbitMessageAction
 from chembot.rabbitmq.rabbit_core import RabbitMQConnection
 from chembot.master_controller.master_controller import MasterController
 from chembot.scheduler.job import Job
+from chembot.scheduler.job_template import JobSweep
 from chembot.scheduler.schedular import Schedular
+from chembot.scheduler.schedule_delta import ScheduleDelta, ScheduleTable
 from chembot.equipment.equipment_interface import EquipmentRegistry
 from chembot.scheduler.submit_result import JobSubmitResult
 
@@ -13,6 +16,7 @@ class JobSubmitter:
 
     def __init__(self):
         self.rabbit = RabbitMQConnection(self.name)
+        self.schedule_table = ScheduleTable()  # kept up to date by update_schedule()
 
     def validate(self, job: Job) -> JobSubmitResult:
         message = RabbitMessageAction(
@@ -36,10 +40,67 @@ class JobSubmitter:
 
         return reply
 
-    def delete(self, job: Job):
-        raise NotImplementedError
+    def submit_jobs(self, jobs: list[Job], timeout: float = 10) -> list[JobSubmitResult]:
+        """
+        submit several jobs in one message; raises ValueError if any failed (the others are still added)
+        Jobs are placed in priority order (Job.priority, higher first). With pack_jobs a job also goes ahead of
+        queued jobs with lower priority that haven't started; otherwise it is placed after the jobs already queued.
+        """
+        message = RabbitMessageAction(
+            destination=MasterController.name,
+            source=self.name,
+            action=MasterController.write_add_jobs,
+            kwargs={"jobs": jobs}
+        )
+        return self._check_results(self.rabbit.send_and_consume(message, timeout=timeout, error_out=True).value)
+
+    def submit_sweep(self, sweep: JobSweep, timeout: float = 10) -> list[JobSubmitResult]:
+        """
+        submit a sweep in one message; jobs are made, validated and placed by the MasterController
+        raises ValueError if any failed (the others are still added). Priority as for submit_jobs().
+        """
+        message = RabbitMessageAction(
+            destination=MasterController.name,
+            source=self.name,
+            action=MasterController.write_add_sweep,
+            kwargs={"sweep": sweep}
+        )
+        return self._check_results(self.rabbit.send_and_consume(message, timeout=timeout, error_out=True).value)
+
+    @staticmethod
+    def _check_results(results: list[JobSubmitResult]) -> list[JobSubmitResult]:
+        failed = [result for result in results if not result.success]
+        if failed:
+            raise ValueError(f"{len(failed)} of {len(results)} jobs not added:\n" +
+                             "\n".join(str(result) for result in failed))
+        return results
+
+    def delete(self, job: Job | int) -> bool:
+        """ cancel job (or job id) in queue or running; False if the master controller doesn't have it """
+        message = RabbitMessageAction(
+            destination=MasterController.name,
+            source=self.name,
+            action=MasterController.write_delete_job,
+            kwargs={"id_job": job if isinstance(job, int) else job.id_}
+        )
+        return self.rabbit.send_and_consume(message, timeout=1, error_out=True).value
+
+    def move(self, job: Job | int, time_start: datetime = None) -> JobSubmitResult:
+        """ move job (or job id) in queue to time_start (default: earliest start it can get now) """
+        message = RabbitMessageAction(
+            destination=MasterController.name,
+            source=self.name,
+            action=MasterController.write_move_job,
+            kwargs={"id_job": job if isinstance(job, int) else job.id_, "time_start": time_start}
+        )
+        reply: JobSubmitResult = self.rabbit.send_and_consume(message, timeout=1, error_out=True).value
+        if not reply.success:
+            raise ValueError(str(reply))
+
+        return reply
 
     def get_schedule(self) -> Schedular:
+        """ full Schedular (all jobs, events and kwargs); use update_schedule() for large schedules """
         message = RabbitMessageAction(
             destination=MasterController.name,
             source=self.name,
@@ -47,6 +108,20 @@ class JobSubmitter:
         )
         return self.rabbit.send_and_consume(message, timeout=1, error_out=True).value
 
+    def get_schedule_delta(self, since_version: int = -1) -> ScheduleDelta:
+        message = RabbitMessageAction(
+            destination=MasterController.name,
+            source=self.name,
+            action=MasterController.read_schedule_delta,
+            kwargs={"since_version": since_version}
+        )
+        return self.rabbit.send_and_consume(message, timeout=1, error_out=True).value
+
+    def update_schedule(self) -> ScheduleTable:
+        """ update schedule_table (events of queued and running jobs) with the events changed since the last update """
+        self.schedule_table.apply(self.get_schedule_delta(self.schedule_table.version))
+        return self.schedule_table
+
     def get_equipment_registry(self) -> EquipmentRegistry:
         message = RabbitMessageAction(
             destination=MasterController.name,
@@ -0,0 +1,174 @@
+"""
+Job templates and sweeps
+
+A JobTemplate is a job tree defined once with Parameter placeholders (in event kwargs, durations and delays, and job
+delays). A JobSweep is a template plus one array per parameter; it is expanded into one job per index (on the
+MasterController when submitted with JobSubmitter.submit_sweep(), so only the template and arrays are sent).
+
+Examples
+--------
+    template = JobTemplate(
+        JobSequence([
+            Event("pump", Pump.write_infuse, Parameter("time"), kwargs={"volume": Parameter("volume")}),
+            Event("valve", Valve.write_move, timedelta(seconds=1), kwargs={"position": 2}),
+        ])
+    )
+    sweep = JobSweep(template, volume=np.linspace(1, 10, 100), time=np.full(100, 30))
+    sweep = JobSweep.grid(template, volume=[1, 2, 5], time=[10, 30])  # all combinations
+
+"""
+from __future__ import annotations
+
+import itertools
+from datetime import timedelta
+from typing import Sequence, Iterator
+
+import numpy as np
+
+from chembot.scheduler.event import Event
+from chembot.scheduler.job import Job
+
+
+class Parameter:
+    """ placeholder in a JobTemplate; filled in by JobTemplate.build() """
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self):
+        return f"Parameter({self.name})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def _fill(value, values: dict[str, object]):
+    if isinstance(value, Parameter):
+        value = values[value.name]
+        if isinstance(value, np.generic):
+            return value.item()  # numpy scalar -> python (type checks in validation)
+    return value
+
+
+def _fill_time(value, values: dict[str, object]) -> timedelta | None:
+    """ numbers are seconds """
+    value = _fill(value, values)
+    if value is None or isinstance(value, timedelta):
+        return value
+    return timedelta(seconds=float(value))
+
+
+class JobTemplate:
+    def __init__(self, job: Job):
+        """
+
+        Parameters
+        ----------
+        job:
+            skeleton; Parameter placeholders can be used in event kwargs (values), event duration and delay, and job
+            delay. It is never submitted itself (build() makes new jobs).
+        """
+        self.job = job
+        self.parameters = self._get_parameters()
+
+    def __str__(self):
+        return f"JobTemplate({self.job}, parameters: {self.parameters})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _get_parameters(self) -> list[str]:
+        parameters = {}
+        for obj in self.job.iter_tree():
+            values = [obj.delay]
+            if isinstance(obj, Event):
+                values.append(obj.duration)
+                if obj.kwargs is not None:
+                    values += obj.kwargs.values()
+            for value in values:
+                if isinstance(value, Parameter):
+                    parameters[value.name] = None
+        return list(parameters)
+
+    def build(self, **values) -> Job:
+        """ new job (new ids) with the parameters filled in """
+        missing = set(self.parameters).difference(values)
+        if missing:
+            raise ValueError(f"Values missing for template parameters: {missing}")
+        return self._build(self.job, values)
+
+    def _build(self, job: Job, values: dict[str, object]) -> Job:
+        events = []
+        for event in job.events:
+            if isinstance(event, Job):
+                events.append(self._build(event, values))
+                continue
+            events.append(
+                Event(
+                    resource=event.resource,
+                    callable_=event.callable_,
+                    duration=_fill_time(event.duration, values),
+                    delay=_fill_time(event.delay, values),
+                    kwargs=None if event.kwargs is None else {k: _fill(v, values) for k, v in event.kwargs.items()},
+                    priority=event.priority,
+                    name=event.name
+                )
+            )
+
+        return type(job)(events, delay=_fill_time(job.delay, values), name=job.name, priority=job.priority)
+
+
+class JobSweep:
+    def __init__(self, template: JobTemplate, priority: int = 0, **parameters: Sequence | np.ndarray):
+        """
+
+        Parameters
+        ----------
+        template:
+        priority:
+            priority of every job (see Job)
+        parameters:
+            one array per template parameter, all the same length; job i gets element i of each
+        """
+        self.template = template
+        self.priority = priority
+        self.parameters = {name: np.asarray(values) if not isinstance(values, np.ndarray) else values
+                           for name, values in parameters.items()}
+
+        missing = set(template.parameters).difference(self.parameters)
+        if missing:
+            raise ValueError(f"Values missing for template parameters: {missing}")
+        lengths = {len(values) for values in self.parameters.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Parameter arrays must all be the same length (lengths: {lengths}).")
+
+    def __str__(self):
+        return f"JobSweep(# jobs: {len(self)}, parameters: {list(self.parameters)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        if not self.parameters:
+            return 0
+        return len(next(iter(self.parameters.values())))
+
+    def __iter__(self) -> Iterator[Job]:
+        names = list(self.parameters)
+        columns = [values.tolist() for values in self.parameters.values()]  # python scalars; faster to iterate
+        for row in zip(*columns):
+            job = self.template.build(**dict(zip(names, row)))
+            job.priority = self.priority
+            yield job
+
+    @classmethod
+    def grid(cls, template: JobTemplate, priority: int = 0, **parameters: Sequence | np.ndarray) -> JobSweep:
+        """ one job for every combination of parameter values (first parameter varies slowest) """
+        names = list(parameters)
+        rows = list(itertools.product(*parameters.values()))
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+        return cls(template, priority, **columns)
+
+    def expand(self) -> list[Job]:
+        return list(self)
@@ -1,14 +1,23 @@
+from datetime import datetime, timedelta
 
 from chembot.scheduler.event import Event
+from chembot.scheduler.interval_list import IntervalList
 
 
 class Resource:
     """
     A resource is something which can processes event
+
+    Events are kept sorted by start time (with delay) in an IntervalList, so adding or removing an event anywhere in
+    the timeline (new jobs, jobs packed into gaps, moved jobs) is O(log n), and overlap queries only visit the events
+    near the query window. Free time queries use the busy blocks (union of touching/overlapping events; also an
+    IntervalList), so a fully packed stretch is skipped in one step. Call refresh() if the times of events already
+    added change.
     """
     def __init__(self, name: str):
         self.name = name
-        self._events: list[Event] = []
+        self._events = IntervalList()  # (time_start_with_delay, time_end, event)
+        self._blocks = IntervalList()  # busy blocks (start, end, None); sorted and not touching
         self.next_event_index: int = 0
 
     def __str__(self):
@@ -17,6 +26,9 @@ class Resource:
     def __repr__(self):
         return self.__str__()
 
+    def __len__(self):
+        return len(self._events)
+
     @property
     def next_event(self) -> Event | None:
         if self.next_event_index == len(self._events):
@@ -25,20 +37,139 @@ class Resource:
 
     @property
     def events(self) -> list[Event]:
-        return self._events
-
-    def add_event(self, event: Event):
-        # insert events in temporal order by start at the end and loop forward.
-        # most insertions should just be at the end.
-        for i, event_ in enumerate(reversed(self._events)):
-            if event.time_start > event_.time_start:
-                if i == 0:
-                    self._events.append(event)
-                else:
-                    self._events.insert(-i, event)
-                return
-
-        self._events.insert(0, event)
+        """ events sorted by start time (a copy) """
+        return list(self._events)
+
+    @property
+    def time_start(self) -> datetime | None:
+        if not len(self._events):
+            return None
+        return self._events.row(0)[0]
+
+    @property
+    def time_end(self) -> datetime | None:
+        return self._events.max_end
+
+    def add_event(self, event: Event) -> int:
+        """ insert event in temporal order; returns index """
+        start = event.time_start_with_delay
+        end = event.time_end
+        index = self._events.insert(start, end, event)
+        self._add_block(start, end)
+
+        if index < self.next_event_index:
+            self.next_event_index += 1  # keep pointing at the same event
+        return index
+
+    def remove_event(self, event: Event) -> int:
+        """ remove event (its times must not have changed since it was added); returns index it had """
+        try:
+            index = self._events.index(event, event.time_start_with_delay)
+        except ValueError:
+            # times changed since added; raises ValueError if not in resource
+            index = next((i for i, event_ in enumerate(self._events) if event_ is event), None)
+            if index is None:
+                raise ValueError(f"Event ({event.id_}) not in resource '{self.name}'.")
+
+        start, end, _ = self._events.pop(index)
+        self._remove_block(start, end)
+
+        if index < self.next_event_index:
+            self.next_event_index -= 1  # keep pointing at the same event
+        return index
+
+    def refresh(self):
+        """ re-read event times and re-sort (needed when the time of a job already added changes) """
+        next_event = self.next_event
+        events = sorted(self._events, key=lambda event_: event_.time_start_with_delay)
+        self._events = IntervalList()
+        self._blocks = IntervalList()
+        for event in events:
+            self._events.insert(event.time_start_with_delay, event.time_end, event)
+            self._add_block(event.time_start_with_delay, event.time_end)
+        self.next_event_index = len(self._events) if next_event is None else \
+            self._events.index(next_event, next_event.time_start_with_delay)
+
+    def _first_block_touching(self, time_: datetime) -> int:
+        """ index of first block ending at or after time_ """
+        index = self._blocks.bisect_right(time_) - 1  # last block starting at or before time_
+        if index < 0:
+            return 0
+        return index if self._blocks.row(index)[1] >= time_ else index + 1
+
+    def _add_block(self, start: datetime, end: datetime):
+        """ merge interval into busy blocks """
+        if self._blocks.max_end is None or start > self._blocks.max_end:
+            self._blocks.insert(start, end, None)  # after the last block (blocks don't overlap: max_end is its end)
+            return
+
+        i = self._first_block_touching(start)
+        ii = self._blocks.bisect_right(end)  # blocks after ii start after end
+        if i < ii:
+            start = min(start, self._blocks.row(i)[0])
+            end = max(end, self._blocks.row(ii - 1)[1])
+            for _ in range(ii - i):
+                self._blocks.pop(i)
+        self._blocks.insert(start, end, None)
+
+    def _remove_block(self, start: datetime, end: datetime):
+        """ free the parts of [start, end) not covered by other events from the busy blocks """
+        holes = []
+        time_ = start
+        for start_, end_, _ in self._events.overlapping(start, end):
+            if start_ > time_:
+                holes.append((time_, start_))
+            time_ = max(time_, min(end_, end))
+        if time_ < end:
+            holes.append((time_, end))
+
+        for hole_start, hole_end in holes:
+            # split the block containing the hole
+            block_start, block_end, _ = self._blocks.pop(self._blocks.bisect_right(hole_start) - 1)
+            if block_start < hole_start:
+                self._blocks.insert(block_start, hole_start, None)
+            if hole_end < block_end:
+                self._blocks.insert(hole_end, block_end, None)
+
+    def overlaps(self, time_start: datetime, time_end: datetime) -> list[Event]:
+        """ events that overlap [time_start, time_end) """
+        return [event for _, _, event in self._events.overlapping(time_start, time_end)]
+
+    def is_free(self, time_start: datetime, time_end: datetime) -> bool:
+        for block_start, block_end, _ in self._blocks.rows_from(time_start):
+            if block_end > time_start:  # first block ending after time_start
+                return block_start >= time_end
+        return True
+
+    def next_free_slot(self, time_start: datetime, duration: timedelta) -> datetime:
+        """ earliest time >= time_start where the resource is free for 'duration' """
+        time_ = time_start
+        for block_start, block_end, _ in self._blocks.rows_from(time_start):
+            if block_end <= time_start:
+                continue  # block before time_start
+            if block_start >= time_ + duration:
+                break
+            time_ = block_end
+
+        return time_
+
+    def get_overlapping_events(self) -> list[tuple[int, int]]:
+        """ index pairs of all overlapping events """
+        starts = []
+        ends = []
+        for start, end, _ in self._events.rows():
+            starts.append(start)
+            ends.append(end)
+
+        conflicts = []
+        for i in range(len(starts)):
+            end = ends[i]
+            ii = i + 1
+            while ii < len(starts) and starts[ii] < end:
+                conflicts.append((i, ii))
+                ii += 1
+
+        return conflicts
 
     def validate_event(self, event: Event):
         pass
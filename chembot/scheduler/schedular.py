@@ -1,31 +1,98 @@
 from __future__ import annotations
 
+import bisect
+import heapq
 import time
 from datetime import timedelta, datetime
 import logging
+from typing import Callable, Iterable
 
 from chembot.configuration import config
 from chembot.scheduler.event import Event
 from chembot.scheduler.job import Job
 from chembot.scheduler.schedule import Schedule
+from chembot.scheduler.schedule_delta import ScheduleChangeLog, ScheduleDelta
+from chembot.scheduler.resource import Resource
 
 
 logger = logging.getLogger(config.root_logger_name + ".schedular")
 
 
+class LatenessHistogram:
+    """ histogram of dispatch lateness (time event was sent - time it was scheduled for) """
+    bins = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1)  # upper edges in seconds; last bin: > 1 s
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bins) + 1)
+        self.count = 0
+        self.total = 0
+        self.max_ = 0
+
+    def __str__(self):
+        return f"LatenessHistogram(count: {self.count}, mean: {self.mean * 1000:.3f} ms, max: {self.max_ * 1000:.3f} ms)"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0
+        return self.total / self.count
+
+    def add(self, lateness: float):
+        self.counts[bisect.bisect_left(self.bins, lateness)] += 1
+        self.count += 1
+        self.total += lateness
+        if lateness > self.max_:
+            self.max_ = lateness
+
+    def as_dict(self) -> dict:
+        labels = [f"<= {bin_ * 1000:g} ms" for bin_ in self.bins] + [f"> {self.bins[-1] * 1000:g} ms"]
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max_,
+            "histogram": dict(zip(labels, self.counts))
+        }
+
+
 class Schedular:
     delay = timedelta(seconds=2)  # delay if no jobs are in queue
 
-    def __init__(self, timer: callable = None):
-        self.timer = timer if timer is None else time.monotonic
+    def __init__(self, timer: callable = None, pack_jobs: bool = False):
+        """
+
+        Parameters
+        ----------
+        timer:
+        pack_jobs:
+            False: a job starts after the end of the last job in the schedule
+            True: a job starts at the earliest time all resources it uses are free (jobs on different resources run
+            in parallel)
+        """
+        self.timer = timer if timer is not None else time.monotonic
+        self._clock_offset = time.time() - self.timer()  # datetime -> timer
+        self.pack_jobs = pack_jobs
         self.schedule = Schedule()
-        self._job_running: Job | None = None
+        self._jobs_running: list[Job] = []
         self._jobs_completed: list[Job] = []
-        self._jobs_in_queue: list[Job] = []
+        self._jobs_in_queue: list[Job] = []  # ordered by time_start
+        self._events_dispatched: dict[int, int] = {}  # key: id_ of running job, value: number of events sent
+        self._jobs_by_id: dict[int, Job] = {}  # jobs in queue or running
+
+        # next event of every resource: (due (timer), -priority, counter, resource, event id_)
+        # entries are not removed when the resource's next event changes (or is moved); every change pushes a new
+        # entry, so only the latest entry of a resource is valid and older ones are skipped when popped
+        self._heap: list[tuple[float, int, int, Resource, int]] = []
+        self._counter = 0  # tie-breaker; keeps push order
+        self._heap_latest: dict[str, int] = {}  # key: resource name, value: counter of its valid entry
+        self.lateness = LatenessHistogram()
+        self.changes = ScheduleChangeLog()
 
     def __str__(self):
         return "Schedular:" \
-               f"\n\tRunning: {self._job_running}" \
+               f"\n\tRunning: {self._jobs_running}" \
                f"\n\tCompleted: {self._jobs_completed}" \
                f"\n\tIn queue (# jobs: {len(self._jobs_in_queue)}):  {self._jobs_in_queue}"
 
@@ -35,7 +102,14 @@ class Schedular:
 
     @property
     def job_running(self) -> Job | None:
-        return self._job_running
+        """ last job started """
+        if self._jobs_running:
+            return self._jobs_running[-1]
+        return None
+
+    @property
+    def jobs_running(self) -> list[Job]:
+        return self._jobs_running
 
     @property
     def jobs_in_queue(self) -> list[Job]:
@@ -43,49 +117,307 @@ class Schedular:
 
     @property
     def time_end(self) -> datetime | None:
-        if self._jobs_in_queue:
-            return self._jobs_in_queue[-1].time_end
-        if self._job_running:
-            return self._job_running.time_end
+        """ end of the last event in the schedule """
+        time_end = None
+        for resource in self.schedule.resources:
+            time_ = resource.time_end
+            if time_ is not None and (time_end is None or time_ > time_end):
+                time_end = time_
+
+        return time_end
+
+    @property
+    def time_next_event(self) -> datetime | None:
+        """ start time (with delay) of the next event to run """
+        entry = self._peek()
+        if entry is None:
+            return None
+        return entry[3].next_event.time_start_with_delay
+
+    @property
+    def time_to_next_event(self) -> float | None:
+        """ seconds till the next event is due (negative if overdue) """
+        entry = self._peek()
+        if entry is None:
+            return None
+        return entry[0] - self.timer()
+
+    @property
+    def version(self) -> int:
+        """ bumped on every change of the events in the schedule """
+        return self.changes.version
+
+    def get_schedule_delta(self, since_version: int = 0) -> ScheduleDelta:
+        """ events added, changed or removed since since_version (full snapshot if it is too old) """
+        return self.changes.get_delta(since_version)
+
+    def _to_timer(self, time_: datetime) -> float:
+        return time_.timestamp() - self._clock_offset
+
+    def _push(self, resource: Resource):
+        """ add resource's next event to the heap """
+        event = resource.next_event
+        if event is not None:
+            self._counter += 1
+            self._heap_latest[resource.name] = self._counter
+            heapq.heappush(
+                self._heap,
+                (self._to_timer(event.time_start_with_delay), -event.priority, self._counter, resource, event.id_)
+            )
+
+    def _peek(self) -> tuple | None:
+        """ first heap entry that is still the next event of its resource, at its current time """
+        while self._heap:
+            entry = self._heap[0]
+            event = entry[3].next_event
+            if event is not None and event.id_ == entry[4] and self._heap_latest.get(entry[3].name) == entry[2]:
+                return entry
+            heapq.heappop(self._heap)
 
         return None
 
     def get_event_to_run(self) -> Event | None:
-        now = datetime.now()
-        for resource in self.schedule.resources:
-            if resource.next_event is None:
-                continue
+        """ next due event (or None) """
+        entry = self._peek()
+        if entry is None:
+            return None
 
-            if now > resource.next_event.time_start_with_delay:
-                next_event = resource.next_event
-                self._update_job_lists(next_event.root)
-                resource.next_event_index += 1
-                return next_event
-
-    def _update_job_lists(self, job):
-        if job is not self._job_running:
-            if self._job_running is not None:
-                self._jobs_completed.append(self._job_running)
-            self._job_running = self._jobs_in_queue.pop(0)
-
-    def add_job(self, job: Job):
-        # determine available time
-        # TODO: not robust to deletions or moving event/jobs; should pass reference
-        time_start = self.get_possible_start_time_for_schedule()
-        job.time_start = time_start
+        now = self.timer()
+        if now < entry[0]:
+            return None
+
+        heapq.heappop(self._heap)
+        resource = entry[3]
+        event = resource.next_event
+        self.lateness.add(now - entry[0])
+        event.completed = True
+        self.changes.change_events((event,))
+        self._update_job_lists(event.root)
+        resource.next_event_index += 1
+        self._push(resource)
+        return event
+
+    def get_events_to_run(self) -> list[Event]:
+        """ all due events, in due order """
+        events = []
+        while True:
+            event = self.get_event_to_run()
+            if event is None:
+                return events
+            events.append(event)
+
+    def _update_job_lists(self, job: Job):
+        """ called for every event sent; job goes: queue -> running -> completed (all its events sent) """
+        if job.id_ not in self._events_dispatched:
+            self._remove_from_queue(job)
+            self._jobs_running.append(job)
+            self._events_dispatched[job.id_] = 0
+
+        self._events_dispatched[job.id_] += 1
+        if self._events_dispatched[job.id_] == len(job):
+            del self._events_dispatched[job.id_]
+            del self._jobs_by_id[job.id_]
+            self._jobs_running.remove(job)
+            job.completed = True
+            self._jobs_completed.append(job)
+            self.changes.remove_events(job.iter_events())  # clients drop completed jobs; keeps the log bounded
+
+    def _remove_from_queue(self, job: Job):
+        """ binary search on time_start (queue is ordered by it) """
+        index = bisect.bisect_left(self._jobs_in_queue, job.time_start, key=lambda job_: job_.time_start)
+        while self._jobs_in_queue[index] is not job:
+            index += 1
+        del self._jobs_in_queue[index]
+
+    def add_job(self, job: Job, time_start: datetime = None):
+        """
+
+        Parameters
+        ----------
+        job:
+        time_start:
+            start time of the job; default: get_start_time(job)
+        """
+        job.time_start = time_start if time_start is not None else self.get_start_time(job)
 
         # add to queue
-        self._jobs_in_queue.append(job)
+        bisect.insort(self._jobs_in_queue, job, key=lambda job_: job_.time_start)
+        self._jobs_by_id[job.id_] = job
         self.schedule.add_job(job)
+        self.changes.add_events(job.iter_events())
+        for resource in {event.resource for event in job.iter_events()}:
+            self._push(self.schedule.get_resources(resource))
+
+    def add_jobs(self, jobs: Iterable[Job], add_job: Callable[[Job], bool] = None) -> list[Job]:
+        """
+        add several jobs; placed in priority order (higher first), then submission order
+
+        With pack_jobs, priority also counts against the jobs in the queue (not running yet): queued jobs with lower
+        priority that start on one of the job's resources before the job could start are taken out, the job is
+        placed, and they are placed again after it (not earlier than they were). Without pack_jobs jobs are added at
+        the end of the schedule, so priority only orders the jobs of this call.
+
+        Parameters
+        ----------
+        jobs:
+            jobs to add
+        add_job:
+            places one job and returns False if it was not added (e.g. MasterController validates it first);
+            default: add_job(job)
+
+        Returns
+        -------
+        moved:
+            queued jobs placed again at a new time_start
+        """
+        moved = {}
+        for job in sorted(jobs, key=lambda job_: -job_.priority):
+            displaced = self._remove_lower_priority(job) if self.pack_jobs else []
+            if add_job is None:
+                self.add_job(job)
+            else:
+                add_job(job)
+
+            for job_ in displaced:
+                time_start = job_.time_start
+                self.add_job(job_, self.get_earliest_start_time(job_, time_start))
+                if job_.time_start != time_start:
+                    moved[job_.id_] = job_
+
+        return list(moved.values())
+
+    def _remove_lower_priority(self, job: Job) -> list[Job]:
+        """ remove queued jobs with lower priority that start on one of job's resources before job could start """
+        lower = [job_ for job_ in self._jobs_in_queue if job_.priority < job.priority]
+        if not lower:
+            return []
+
+        time_start = self.get_earliest_start_time(job)
+        resources = {event.resource for event in job.iter_events()}
+        displaced = [
+            job_ for job_ in lower
+            if job_.time_start < time_start and not resources.isdisjoint(event.resource for event in job_.iter_events())
+        ]
+        for job_ in displaced:
+            self.remove_job(job_)
+        return sorted(displaced, key=lambda job_: -job_.priority)  # stable: queue (time_start) order within priority
+
+    def restore_dispatched(self, event_ids: set[int]):
+        """ mark events as already sent (e.g. before a restart; see JobJournal), so they are not sent again """
+        events = []
+        for resource in self.schedule.resources:
+            # resource sends its events in order (events added before its next event are skipped), so it continues
+            # after the last one sent
+            index = [i for i, event in enumerate(resource.events) if event.id_ in event_ids]
+            if not index:
+                continue
+            for i in index:
+                event = resource.events[i]
+                event.completed = True
+                events.append(event)
+                self._update_job_lists(event.root)
+            resource.next_event_index = index[-1] + 1
+            self._push(resource)
+
+        if len(events) != len(event_ids):
+            logger.warning(f"{len(event_ids) - len(events)} sent events not found in the schedule.")
+        self.changes.change_events(events)
+
+    def get_job(self, id_job: int) -> Job:
+        """ job in queue or running """
+        try:
+            return self._jobs_by_id[id_job]
+        except KeyError:
+            raise ValueError(f"Job ({id_job}) not in queue or running.")
+
+    def is_running(self, job: Job) -> bool:
+        """ True if some of the job's events were sent """
+        return job.id_ in self._events_dispatched
+
+    def remove_job(self, job: Job | int) -> Job:
+        """
+        Cancel a job in queue or running (events of it not sent yet won't be sent). Only the job's events are removed
+        from the resource timelines.
+        """
+        if isinstance(job, int):
+            job = self.get_job(job)
+
+        for resource in self.schedule.remove_job(job):
+            self._push(resource)  # its next event may have changed
+        self.changes.remove_events(job.iter_events())
+
+        if job.id_ in self._events_dispatched:
+            del self._events_dispatched[job.id_]
+            self._jobs_running.remove(job)
+        else:
+            self._remove_from_queue(job)
+        del self._jobs_by_id[job.id_]
+        return job
+
+    def move_job(self, job: Job | int, time_start: datetime = None) -> Job:
+        """ move a job in queue to time_start (default: start it would get if added now) """
+        if isinstance(job, int):
+            job = self.get_job(job)
+        if self.is_running(job):
+            raise ValueError(f"Job ({job.id_}) is running and can't be moved.")
+
+        self.remove_job(job)
+        self.add_job(job, time_start)
+        return job
+
+    def get_start_time(self, job: Job) -> datetime:
+        """ start time the job would get if added now """
+        if self.pack_jobs:
+            return self.get_earliest_start_time(job)
+        return self.get_possible_start_time_for_schedule()
 
     def get_possible_start_time_for_schedule(self) -> datetime:
         end_time = self.time_end
         if end_time is None or end_time < datetime.now():
             end_time = datetime.now()
 
-        return end_time + self.delay  # TODO: could be improved.
+        return end_time + self.delay
+
+    def get_earliest_start_time(self, job: Job, time_start: datetime = None) -> datetime:
+        """
+        earliest start time (>= now + delay, and >= time_start if given) where every event of the job fits in its
+        resource's timeline
+        """
+        time_start = datetime.now() + self.delay if time_start is None else max(time_start, datetime.now() + self.delay)
+        intervals = self._get_job_intervals(job, time_start)
+
+        # move start to the end of whatever blocks an event till all fit; start only moves forward, so this ends
+        moved = True
+        while moved:
+            moved = False
+            for resource, offset, duration in intervals:
+                time_ = resource.next_free_slot(time_start + offset, duration)
+                if time_ > time_start + offset:
+                    time_start = time_ - offset
+                    moved = True
+
+        return time_start
+
+    def _get_job_intervals(self, job: Job, time_start: datetime) -> list[tuple[Resource, timedelta, timedelta]]:
+        """ (resource, event start relative to job start, event duration) for events on resources in the schedule """
+        job.time_start = time_start
+        intervals = []
+        for event in job.iter_events():
+            if not self.schedule.has_resource(event.resource):
+                continue  # nothing scheduled on it yet
+            event_start = event.time_start_with_delay
+            intervals.append(
+                (self.schedule.get_resources(event.resource), event_start - time_start, event.time_end - event_start)
+            )
+
+        return intervals
 
     def clear_all_jobs(self):
-        self._job_running = None
+        self._jobs_running = []
         self._jobs_in_queue = []
+        self._events_dispatched = {}
+        self._jobs_by_id = {}
+        self._heap = []
+        self._heap_latest = {}
         self.schedule = Schedule()
+        self.changes.clear()
@@ -24,8 +24,8 @@ class Schedule:
     def __init__(self, id_: int = None):
         self.id_ = id_ if id_ is not None else uuid.uuid4().int
         self._resources: list[Resource] = []
-        self._resources_labels = []
-        self._jobs = []
+        self._resources_by_name: dict[str, Resource] = {}
+        self._jobs: dict[int, Job] = {}  # key: id_; insertion ordered
 
     def __str__(self):
         return f"jobs: {len(self._jobs)} | resources: {len(self._resources)}"
@@ -39,7 +39,7 @@ class Schedule:
 
     @property
     def jobs(self) -> list[Job]:
-        return self._jobs
+        return list(self._jobs.values())
 
     @property
     def number_of_resources(self) -> int:
@@ -50,35 +50,56 @@ class Schedule:
         return [resources.name for resources in self.resources]
 
     def get_resources(self, name: str) -> Resource:
-        index = self.resources_labels.index(name)
-        return self._resources[index]
+        try:
+            return self._resources_by_name[name]
+        except KeyError:
+            raise ValueError(f"'{name}' is not a resource in schedule.")
+
+    def has_resource(self, name: str) -> bool:
+        return name in self._resources_by_name
 
     def add_resource(self, resource: Resource | Iterator[Resource]):
         if isinstance(resource, Resource):
             resource = [resource]
         self._resources += resource
+        for resource_ in resource:
+            self._resources_by_name[resource_.name] = resource_
 
-    def get_job(self, job: str) -> Job:
-        pass
+    def get_job(self, id_: int) -> Job:
+        try:
+            return self._jobs[id_]
+        except KeyError:
+            raise ValueError(f"Job ({id_}) not in schedule.")
 
     def add_job(self, job: Job):
-        self._jobs.append(job)
+        self._jobs[job.id_] = job
         # determine job time
 
         loop_through_jobs(self, job)
 
+    def remove_job(self, job: Job) -> set[Resource]:
+        """ remove job's events from the resources (before changing the job's times); returns resources changed """
+        del self._jobs[job.id_]
+        resources = set()
+        for event in job.iter_events():
+            resource = self._resources_by_name[event.resource]
+            resource.remove_event(event)
+            resources.add(resource)
+
+        return resources
+
     def get_event(self, event: str | int) -> Event:
         raise NotImplementedError
 
     def add_event(self, resource: str | Resource, event: Event):
         if isinstance(resource, str):
-            if resource in self.resources_labels:
-                resource = self.get_resources(resource)
+            if resource in self._resources_by_name:
+                resource = self._resources_by_name[resource]
             else:
                 resource = Resource(resource)
                 self.add_resource(resource)
         elif isinstance(resource, Resource):
-            if resource in self.resources:
+            if self._resources_by_name.get(resource.name) is resource:
                 pass
             else:
                 self.add_resource(resource)
@@ -87,22 +108,6 @@ class Schedule:
 
         resource.add_event(event)
 
-    # def delete_job(self, job: Job | Iterator[Job]):
-    #     self._up_to_date = False
-    #
-    #     if isinstance(row, int):
-    #         del self._rows[row]
-    #     elif isinstance(row, Row):
-    #         self._rows.remove(row)
-    #     elif isinstance(row, Iterator):
-    #         for row_ in row:
-    #             self._rows.remove(row_)
-    #     else:
-    #         raise ValueError("Invalid argument provided.")
-    #
-    # def delete_event(self, event: Event, Iterator[Event]):
-    #     pass
-
     @classmethod
     def from_job(cls, job: Job) -> Schedule:
         schedule = cls(job.id_)
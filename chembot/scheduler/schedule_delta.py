@@ -0,0 +1,259 @@
+"""
+Versioned changes of a schedule, so clients (JobSubmitter, GUI) can keep a copy of it up to date by only receiving
+the events that changed since the version they have.
+
+Every change to the events of the schedule (jobs added, removed, moved, events sent) bumps the version. Events get a
+small integer key (stable while the event is in the log), and deltas are sent as columnar numpy arrays.
+Events of completed jobs are removed from the log (clients drop them), so it only holds queued and running jobs.
+
+"""
+from __future__ import annotations
+
+import bisect
+from typing import Iterable
+
+import numpy as np
+
+from chembot.scheduler.event import Event
+
+
+class ScheduleChange:
+    ADDED = 0
+    REMOVED = 1
+    CHANGED = 2
+
+
+class ScheduleDelta:
+    """
+    Events added, changed or removed between since_version and version.
+
+    Rows (key, change, time_start, ...) are the events added or changed; they replace any row with the same key.
+    Times are POSIX timestamps (seconds). resource/name/job are indexes into resources/names/jobs.
+    If full is True the rows are the whole schedule, and the client should drop what it has before applying it.
+    """
+    __slots__ = ("version", "since_version", "full", "key", "change", "time_start", "time_end", "resource",
+                 "resources", "name", "names", "job", "jobs", "sent", "removed")
+
+    def __init__(self, version: int, since_version: int, full: bool, events: dict[int, Event],
+                 changes: dict[int, int] = None, removed: Iterable[int] = ()):
+        """
+
+        Parameters
+        ----------
+        version:
+            version of the schedule
+        since_version:
+            version the delta is relative to
+        full:
+            True: delta is a full snapshot
+        events:
+            key: event key, value: event added or changed
+        changes:
+            key: event key, value: ScheduleChange; default: all ScheduleChange.ADDED
+        removed:
+            keys of removed events
+        """
+        self.version = version
+        self.since_version = since_version
+        self.full = full
+
+        number_of_events = len(events)
+        self.key = np.fromiter(events.keys(), dtype=np.uint32, count=number_of_events)
+        if changes is None:
+            self.change = np.full(number_of_events, ScheduleChange.ADDED, dtype=np.uint8)
+        else:
+            self.change = np.fromiter((changes[key] for key in events), dtype=np.uint8, count=number_of_events)
+        self.time_start = np.empty(number_of_events, dtype=np.float64)
+        self.time_end = np.empty(number_of_events, dtype=np.float64)
+        self.sent = np.empty(number_of_events, dtype=np.bool_)
+
+        # categorical columns: index into list of unique values
+        resources: dict[str, int] = {}
+        names: dict[str, int] = {}
+        jobs: dict[int, int] = {}
+        resource = []
+        name = []
+        job = []
+        for i, event in enumerate(events.values()):
+            time_start = event.time_start_with_delay
+            self.time_start[i] = time_start.timestamp()
+            self.time_end[i] = (time_start + event.duration).timestamp()
+            self.sent[i] = event.completed
+            resource.append(resources.setdefault(event.resource, len(resources)))
+            name.append(names.setdefault(event.name, len(names)))
+            job.append(jobs.setdefault(event.id_job, len(jobs)))
+
+        self.resource = np.array(resource, dtype=np.uint16)
+        self.resources = list(resources)
+        self.name = np.array(name, dtype=np.uint32)
+        self.names = list(names)
+        self.job = np.array(job, dtype=np.uint32)
+        self.jobs = list(jobs)
+        self.removed = np.fromiter(removed, dtype=np.uint32)
+
+    def __str__(self):
+        return f"ScheduleDelta(version: {self.since_version} -> {self.version}, full: {self.full}, " \
+               f"rows: {len(self)}, removed: {len(self.removed)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self.key)
+
+    @property
+    def empty(self) -> bool:
+        return not self.full and len(self.key) == 0 and len(self.removed) == 0
+
+
+class ScheduleChangeLog:
+    """ changes of the events in a schedule, numbered by version (owned by Schedular) """
+    max_changes = 100_000  # oldest half is dropped when reached; older versions then get a full snapshot
+
+    def __init__(self):
+        self.version = 0
+        self.version_min = 0  # deltas since older versions need a full snapshot
+        self._changes: list[tuple[int, int, int]] = []  # (version, key, ScheduleChange); ordered by version
+        self._events: dict[int, Event] = {}  # key: event key, value: events of queued and running jobs
+        self._keys: dict[int, int] = {}  # key: event.id_, value: event key; same events as _events
+        self._next_key = 0
+
+    def __str__(self):
+        return f"ScheduleChangeLog(version: {self.version}, events: {len(self._events)}, " \
+               f"changes: {len(self._changes)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self._changes)
+
+    def get_key(self, event: Event) -> int:
+        if event.id_ not in self._keys:
+            self._keys[event.id_] = self._next_key
+            self._next_key += 1
+        return self._keys[event.id_]
+
+    def add_events(self, events: Iterable[Event]):
+        self.version += 1
+        for event in events:
+            key = self.get_key(event)
+            self._events[key] = event
+            self._changes.append((self.version, key, ScheduleChange.ADDED))
+        self._trim()
+
+    def remove_events(self, events: Iterable[Event]):
+        self.version += 1
+        for event in events:
+            key = self._keys.pop(event.id_)
+            del self._events[key]
+            self._changes.append((self.version, key, ScheduleChange.REMOVED))
+        self._trim()
+
+    def change_events(self, events: Iterable[Event]):
+        self.version += 1
+        for event in events:
+            if event.id_ not in self._keys:
+                continue  # no longer in the log (job completed)
+            self._changes.append((self.version, self._keys[event.id_], ScheduleChange.CHANGED))
+        self._trim()
+
+    def clear(self):
+        """ all events removed; clients get a full snapshot next """
+        self.version += 1
+        self.version_min = self.version
+        self._changes = []
+        self._events = {}
+        self._keys = {}
+
+    def _trim(self):
+        if len(self._changes) < self.max_changes:
+            return
+        index = len(self._changes) // 2
+        self.version_min = self._changes[index - 1][0]
+        del self._changes[:index]
+
+    def get_snapshot(self) -> ScheduleDelta:
+        return ScheduleDelta(self.version, 0, True, self._events)
+
+    def get_delta(self, since_version: int) -> ScheduleDelta:
+        """ events added, changed or removed since since_version (a full snapshot if it is too old or unknown) """
+        if since_version < self.version_min or since_version > self.version:
+            return self.get_snapshot()
+
+        # first and last change of every event since since_version
+        first: dict[int, int] = {}
+        last: dict[int, int] = {}
+        for _, key, change in self._changes[bisect.bisect_right(self._changes, since_version, key=lambda c: c[0]):]:
+            first.setdefault(key, change)
+            last[key] = change
+
+        events = {}
+        changes = {}
+        removed = []
+        for key, change in last.items():
+            is_new = first[key] == ScheduleChange.ADDED  # wasn't in the schedule at since_version
+            if change == ScheduleChange.REMOVED:
+                if not is_new:
+                    removed.append(key)
+            else:
+                events[key] = self._events[key]
+                changes[key] = ScheduleChange.ADDED if is_new else ScheduleChange.CHANGED
+
+        return ScheduleDelta(self.version, since_version, False, events, changes, removed)
+
+
+class ScheduleTable:
+    """ client side copy of the schedule built from ScheduleDelta (columns are numpy arrays, one row per event) """
+
+    def __init__(self):
+        self.version = -1  # nothing received yet
+        self.key = np.empty(0, dtype=np.uint32)
+        self.time_start = np.empty(0, dtype=np.float64)
+        self.time_end = np.empty(0, dtype=np.float64)
+        self.resource = np.empty(0, dtype=object)
+        self.name = np.empty(0, dtype=object)
+        self.id_job = np.empty(0, dtype=object)
+        self.sent = np.empty(0, dtype=np.bool_)
+
+    def __str__(self):
+        return f"ScheduleTable(version: {self.version}, events: {len(self)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self.key)
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        return "key", "time_start", "time_end", "resource", "name", "id_job", "sent"
+
+    def apply(self, delta: ScheduleDelta):
+        if delta.full:
+            self.__init__()
+        elif delta.since_version != self.version:
+            raise ValueError(f"Delta is since version {delta.since_version}, but table is at version {self.version}.")
+
+        # drop rows replaced or removed
+        keep = ~np.isin(self.key, np.concatenate((delta.key, delta.removed)))
+        rows = {
+            "key": delta.key,
+            "time_start": delta.time_start,
+            "time_end": delta.time_end,
+            "resource": np.array(delta.resources, dtype=object)[delta.resource] if delta.resources else
+            np.empty(0, dtype=object),
+            "name": np.array(delta.names, dtype=object)[delta.name] if delta.names else np.empty(0, dtype=object),
+            "id_job": np.array(delta.jobs, dtype=object)[delta.job] if delta.jobs else np.empty(0, dtype=object),
+            "sent": delta.sent
+        }
+        for column, values in rows.items():
+            setattr(self, column, np.concatenate((getattr(self, column)[keep], values)))
+
+        self.version = delta.version
+
+    def sort(self):
+        """ sort rows by time_start """
+        order = np.argsort(self.time_start, kind="stable")
+        for column in self.columns:
+            setattr(self, column, getattr(self, column)[order])
@@ -1,6 +1,23 @@
 from datetime import datetime
 
 
+class ScheduleConflict:
+    """ event of a submitted job overlapping an event already in the schedule """
+    __slots__ = ("resource", "event", "event_existing", "id_job_existing")
+
+    def __init__(self, resource: str, event: str, event_existing: str, id_job_existing: int):
+        self.resource = resource
+        self.event = event
+        self.event_existing = event_existing
+        self.id_job_existing = id_job_existing
+
+    def __str__(self):
+        return f"{self.resource}: {self.event} overlaps {self.event_existing} (job: {self.id_job_existing})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
 class JobSubmitResult:
 
     def __init__(self, job_id: int):
@@ -11,6 +28,7 @@ class JobSubmitResult:
         self.position_in_queue: int | None = None
         self.length_of_queue: int | None = None
         self.errors: list[Exception] = []
+        self.conflicts: list[ScheduleConflict] = []
 
     def __str__(self):
         if self.success:
@@ -25,3 +43,7 @@ class JobSubmitResult:
     def register_error(self, error: Exception):
         self.success = False
         self.errors.append(error)
+
+    def register_conflict(self, conflict: ScheduleConflict):
+        self.conflicts.append(conflict)
+        self.register_error(ValueError(f"Conflict with schedule. {conflict}"))
@@ -1,22 +1,38 @@
 import logging
-import traceback
 from typing import Any
 
 from chembot.configuration import config
-from chembot.equipment.equipment_interface import EquipmentRegistry, EquipmentInterface, ActionParameter
-from chembot.equipment.continuous_event_handler import ContinuousEventHandler
+from chembot.equipment.equipment_interface import EquipmentRegistry, EquipmentInterface, ActionValidator
+from chembot.equipment.continuous_event_handler import ContinuousEventHandlerProfile
 from chembot.scheduler.event import Event
+from chembot.scheduler.job import Job
 from chembot.scheduler.schedule import Schedule
 from chembot.scheduler.resource import Resource
-from chembot.scheduler.submit_result import JobSubmitResult
+from chembot.scheduler.submit_result import JobSubmitResult, ScheduleConflict
 
 logger = logging.getLogger(config.root_logger_name + ".master_controller")
 
 
-def validate_schedule(schedule: Schedule, registry: EquipmentRegistry, result: JobSubmitResult):
+def validate_schedule(schedule: Schedule, registry: EquipmentRegistry, result: JobSubmitResult,
+                      schedule_existing: Schedule = None):
+    """
+
+    Parameters
+    ----------
+    schedule:
+        schedule of the job(s) being submitted
+    registry:
+    result:
+    schedule_existing:
+        schedule the job will be added to; the job's events are checked for overlaps with it
+    """
     try:
+        check_duplicate_ids(schedule, result)
         check_job(schedule, registry, result)
         check_schedule_for_overlapping_events(schedule, result)
+        if schedule_existing is not None:
+            for job in schedule.jobs:
+                check_job_against_schedule(job, schedule_existing, result)
     except Exception as e:
         logger.exception(e)  # + traceback.format_exc()
         return
@@ -25,6 +41,16 @@ def validate_schedule(schedule: Schedule, registry: EquipmentRegistry, result: J
         result.validation_success = True
 
 
+def check_duplicate_ids(schedule: Schedule, result: JobSubmitResult):
+    for job in schedule.jobs:
+        duplicates = job.get_duplicate_ids()
+        if duplicates:
+            result.register_error(
+                ValueError(f"Duplicate events/jobs in job {job.id_} (ids: {duplicates}). Events must be re-made from "
+                           "scratch to be performed twice.")
+            )
+
+
 def check_job(schedule: Schedule, registry: EquipmentRegistry, result: JobSubmitResult):
     for resource in schedule.resources:  # loop over resources
         if resource.name not in registry.equipment:
@@ -39,73 +65,43 @@ def check_job(schedule: Schedule, registry: EquipmentRegistry, result: JobSubmit
 
 def check_event(event: Event, equipment_interface: EquipmentInterface, result: JobSubmitResult):
     action = event.callable_
-    if action not in equipment_interface.action_names:
+    action_index = equipment_interface.action_index
+    if action not in action_index:
         result.register_error(
             ValueError(f"{event.resource}.{action} not valid action.")
         )
         return
 
-    validate_event_arguments(f"{event.resource}.{action}", event.kwargs,
-                             equipment_interface.get_action(action).inputs, result)
+    validate_event_arguments(f"{event.resource}.{action}", event.kwargs, action_index[action].validator, result)
 
-    if event.kwargs is not None and "profile" in event.kwargs:
-        profile_: ContinuousEventHandler = event.kwargs["profile"]
-        validate_event_arguments(
-            profile_.callable_,
-            profile_.step_as_dict(0, with_time=False),
-            equipment_interface.get_action(profile_.callable_).inputs,
-            result
-        )
-        validate_event_arguments(
-            profile_.callable_,
-            profile_.step_as_dict(-1, with_time=False),
-            equipment_interface.get_action(profile_.callable_).inputs,
-            result
+    if event.kwargs is None:
+        return
+    for profile_ in event.kwargs.values():
+        if isinstance(profile_, ContinuousEventHandlerProfile):
+            check_profile(event, profile_, action_index, result)
+
+
+def check_profile(event: Event, profile_: ContinuousEventHandlerProfile, action_index: dict, result: JobSubmitResult):
+    if profile_.callable_ not in action_index:
+        result.register_error(
+            ValueError(f"{event.resource}.{profile_.callable_} not valid action.")
         )
-        # TODO: only checking first and last values in profile
+        return
+
+    # all steps are checked at once
+    validator = action_index[profile_.callable_].validator
+    for error in validator.validate_profile(profile_.kwargs_names, profile_.kwargs_values):
+        result.register_error(type(error)(f"{event.resource}.{profile_.callable_} (profile): {error}"))
 
 
 def validate_event_arguments(
         event_label: str,
         kwargs: dict[str, Any],
-        inputs: list[ActionParameter],
+        validator: ActionValidator,
         result: JobSubmitResult
 ):
-    if len(inputs) == 0:
-        if kwargs is None:
-            return
-        raise ValueError("No arguments for this action but some were given.")
-
-    required_actions = [arg.required for arg in inputs]  # true for required, will be changed to false if provided
-    input_names = [input_.name for input_ in inputs]
-
-    if not kwargs:
-        if not any(required_actions):
-            return
-
-        for k, v in kwargs.items():
-            if k not in input_names:
-                result.register_error(
-                    ValueError(f"{event_label}: '{k}' is invalid parameter.")
-                )
-                continue
-
-            index = input_names.index(k)
-            required_actions[index] = False
-
-            try:
-                inputs[index].validate(v)
-            except (ValueError, TypeError) as e:
-                result.register_error(
-                    type(e)(f"{event_label}: " + traceback.format_exc())
-                )
-
-    # check if any required parameters are missing
-    if any(required_actions):
-        result.register_error(
-            ValueError(f"{event_label}: the following are missing required parameters:\n" +
-                       "\n".join(f"\t{kwarg.name}" for v, kwarg in zip(required_actions, inputs) if v))
-        )
+    for error in validator.validate(kwargs):
+        result.register_error(type(error)(f"{event_label}: {error}"))
 
 
 #######################################################################################################################
@@ -123,15 +119,18 @@ def check_schedule_for_overlapping_events(schedule: Schedule, result: JobSubmitR
                 )
 
 
-def check_resource_for_overlapping_events(resource: Resource, window: int = 2) -> list:
-    conflicts = []
-    # it assumes the events are ordered
-    length = len(resource.events)
-    for i in range(length):
-        for ii in range(i + 1, i + 1 + window):
-            if ii > length - 1:
-                continue
-            if resource.events[i].time_end > resource.events[ii].time_start:
-                conflicts.append((i, ii))
+def check_resource_for_overlapping_events(resource: Resource) -> list[tuple[int, int]]:
+    return resource.get_overlapping_events()
+
+
+def check_job_against_schedule(job: Job, schedule: Schedule, result: JobSubmitResult):
+    """
+    Check the events of a job (with time_start set) against the resource timelines of a schedule. Only the intervals
+    the job touches are looked up, so the cost scales with the job and not the schedule.
+    """
+    for event in job.iter_events():
+        if not schedule.has_resource(event.resource):
+            continue
 
-    return conflicts
+        for event_ in schedule.get_resources(event.resource).overlaps(event.time_start_with_delay, event.time_end):
+            result.register_conflict(ScheduleConflict(event.resource, event.name, event_.name, event_.id_job))
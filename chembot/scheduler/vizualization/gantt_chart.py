@@ -4,6 +4,8 @@ import typing
 from typing import Sequence, Iterator
 from datetime import datetime, timedelta
 
+import numpy as np
+
 
 class TimeBlockInterface(typing.Protocol):
     time_start: datetime
@@ -18,7 +20,7 @@ class TimeBlock:
     def __init__(self, time_start: datetime, time_end: datetime = None, name: str = None, hover_text: str = None):
         self.time_start = time_start
         self.time_end = time_end
-        self.name = name if name is None else f"time_block_{self.counter}"
+        self.name = name if name is not None else f"time_block_{self.counter}"
         self.hover_text = hover_text
 
         TimeBlock.counter += 1
@@ -30,21 +32,163 @@ class TimeBlock:
         return self.time_start == other.time_start
 
 
+def datetime_to_ms(times: Sequence[datetime | None] | np.ndarray) -> np.ndarray:
+    """ wall clock time as milliseconds since epoch (what plotly date axes take as numbers); None -> NaN """
+    times = np.asarray(times, dtype="datetime64[ms]")
+    ms = times.astype(np.int64).astype(np.float64)
+    ms[np.isnat(times)] = np.nan
+    return ms
+
+
+def ms_to_datetime(ms: float) -> datetime | None:
+    if np.isnan(ms):
+        return None
+    return datetime(1970, 1, 1) + timedelta(milliseconds=float(ms))
+
+
 class Row:
+    """
+    Time blocks of a row as columns (sorted by time_start): time_start, time_end (ms since epoch; time_end is NaN for
+    blocks without an end), names and hover_text. Blocks added one at a time are sorted in once when next read.
+    """
     def __init__(self, name: str, time_blocks: list[TimeBlockInterface] = None):
         self.name = name
-        self.time_blocks = time_blocks if time_blocks is not None else []  # sorted by time
+        self._time_start = np.empty(0, dtype=np.float64)
+        self._time_end = np.empty(0, dtype=np.float64)
+        self._names = np.empty(0, dtype=object)
+        self._hover_text = np.empty(0, dtype=object)
+        self._max_duration = 0
+        self._pending: list[TimeBlockInterface] = list(time_blocks) if time_blocks is not None else []
 
     def __len__(self) -> int:
-        return len(self.time_blocks)
+        return len(self._time_start) + len(self._pending)
+
+    @classmethod
+    def from_arrays(cls,
+                    name: str,
+                    time_start: Sequence[datetime] | np.ndarray,
+                    time_end: Sequence[datetime | None] | np.ndarray,
+                    names: Sequence[str] = None,
+                    hover_text: Sequence[str] = None,
+                    is_sorted: bool = False
+                    ) -> Row:
+        """ time_start/time_end as datetime or ms since epoch (float array) """
+        row = cls(name)
+        row._add_columns(time_start, time_end, names, hover_text, is_sorted)
+        return row
+
+    @property
+    def time_start(self) -> np.ndarray:
+        self._update()
+        return self._time_start
+
+    @property
+    def time_end(self) -> np.ndarray:
+        self._update()
+        return self._time_end
+
+    @property
+    def names(self) -> np.ndarray:
+        self._update()
+        return self._names
+
+    @property
+    def hover_text(self) -> np.ndarray:
+        self._update()
+        return self._hover_text
+
+    @property
+    def time_blocks(self) -> list[TimeBlock]:
+        self._update()
+        return [
+            TimeBlock(ms_to_datetime(time_start), ms_to_datetime(time_end), name, hover_text)
+            for time_start, time_end, name, hover_text in
+            zip(self._time_start, self._time_end, self._names, self._hover_text)
+        ]
 
     @property
     def time_block_names(self) -> list[str]:
-        return [time_block.name for time_block in self.time_blocks]
+        return list(self.names)
 
     def add_time_block(self, time_block: TimeBlockInterface):
-        self.time_blocks.append(time_block)
-        self.time_blocks.sort()
+        self._pending.append(time_block)
+
+    def _update(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._add_columns(
+            [time_block.time_start for time_block in pending],
+            [time_block.time_end for time_block in pending],
+            [time_block.name for time_block in pending],
+            [time_block.hover_text for time_block in pending]
+        )
+
+    def _add_columns(self, time_start, time_end, names, hover_text, is_sorted: bool = False):
+        time_start = _to_ms(time_start)
+        time_end = _to_ms(time_end)
+        number_of_blocks = len(time_start)
+        names = np.array(names, dtype=object) if names is not None else np.full(number_of_blocks, None, dtype=object)
+        hover_text = np.array(hover_text, dtype=object) if hover_text is not None else \
+            np.full(number_of_blocks, None, dtype=object)
+        if number_of_blocks:
+            self._max_duration = max(self._max_duration, np.nanmax(time_end - time_start, initial=0))
+
+        if len(self._time_start) != 0:
+            time_start = np.concatenate((self._time_start, time_start))
+            time_end = np.concatenate((self._time_end, time_end))
+            names = np.concatenate((self._names, names))
+            hover_text = np.concatenate((self._hover_text, hover_text))
+            is_sorted = False
+
+        if not is_sorted:
+            order = np.argsort(time_start, kind="stable")  # one sort for all blocks added
+            time_start, time_end, names, hover_text = time_start[order], time_end[order], names[order], \
+                hover_text[order]
+
+        self._time_start, self._time_end, self._names, self._hover_text = time_start, time_end, names, hover_text
+
+    def get_visible(self, time_min: float = None, time_max: float = None) -> slice:
+        """ blocks that overlap [time_min, time_max] (ms since epoch) are in the returned slice """
+        time_start = self.time_start
+        start = 0
+        if time_min is not None:
+            # blocks starting before time_min - longest block can't reach time_min
+            start = int(np.searchsorted(time_start, time_min - self._max_duration, side="left"))
+        stop = len(time_start) if time_max is None else int(np.searchsorted(time_start, time_max, side="right"))
+        return slice(start, stop)
+
+
+def _to_ms(times) -> np.ndarray:
+    if isinstance(times, np.ndarray) and times.dtype.kind == "f":
+        return times
+    return datetime_to_ms(times)
+
+
+def merge_blocks(time_start: np.ndarray, time_end: np.ndarray, resolution: float) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge blocks that are closer than resolution (less than a pixel apart); blocks must be sorted by time_start.
+    Blocks without end (NaN) are treated as zero length.
+
+    Returns
+    -------
+    time_start, time_end:
+        of merged blocks
+    counts:
+        number of blocks merged into each
+    """
+    if len(time_start) == 0:
+        return time_start, time_end, np.empty(0, dtype=np.int64)
+
+    time_end = np.maximum.accumulate(np.where(np.isnan(time_end), time_start, time_end))
+    new_block = np.empty(len(time_start), dtype=np.bool_)
+    new_block[0] = True
+    new_block[1:] = time_start[1:] - time_end[:-1] > resolution
+    index = np.flatnonzero(new_block)
+    ends = np.append(index[1:], len(time_start)) - 1
+    return time_start[index], time_end[ends], ends - index + 1
 
 
 class GanttChart:
@@ -71,6 +215,10 @@ class GanttChart:
     def number_of_rows(self) -> int:
         return len(self._rows)
 
+    @property
+    def number_of_time_blocks(self) -> int:
+        return sum(len(row) for row in self._rows)
+
     @property
     def row_labels(self) -> list[str]:
         if not self._up_to_date:
@@ -132,20 +280,13 @@ class GanttChart:
 
 
 def get_min_max_time(data: Sequence[Row]) -> tuple[datetime | None, datetime | None]:
-    if len(data) == 0 or len(data[0].time_blocks) == 0:
+    rows = [row for row in data if len(row) != 0]
+    if not rows:
         return None, None
 
-    min_time = data[0].time_blocks[0].time_start
-    max_time = min_time
-    for row in data:
-        for time_block in row.time_blocks:
-            if time_block.time_start < min_time:
-                min_time = time_block.time_start
-                continue
-            if time_block.time_end is not None and time_block.time_end > max_time:
-                max_time = time_block.time_end
-
-    return min_time, max_time
+    min_time = min(row.time_start[0] for row in rows)
+    max_time = max(max(np.nanmax(row.time_end, initial=-np.inf), row.time_start[-1]) for row in rows)
+    return ms_to_datetime(min_time), ms_to_datetime(max_time)
 
 
 def get_time_delta_label(time_delta: timedelta) -> str:
@@ -1,9 +1,11 @@
 
+from datetime import datetime
+
 import dash
 from dash import dcc, html, Input, Output, State
 import plotly.graph_objects as go
 
-from scheduler.vizualization.gantt_chart import GanttChart
+from chembot.scheduler.vizualization.gantt_chart import GanttChart
 from chembot.scheduler.vizualization.gantt_chart_plot import ConfigPlot, create_gantt_chart
 
 
@@ -26,9 +28,37 @@ def gantt_chart_component(
         ], style={'margin-left': '60px'})
     ])
 
+    @app.callback(
+        Output('scatter-plot', 'figure', allow_duplicate=True),
+        Input('scatter-plot', 'relayoutData'),
+        State('scatter-plot', 'figure'),
+        prevent_initial_call=True
+    )
+    def update_viewport(relayout_data: dict, fig: go.Figure):
+        # re-draw only the blocks in the zoomed range
+        x_range = get_x_range(relayout_data)
+        if x_range is None and "xaxis.autorange" not in (relayout_data or {}):
+            return dash.no_update
+        new_fig = create_gantt_chart(data, config, x_range)
+        new_fig.update_yaxes(range=fig['layout']['yaxis']['range'])
+        return new_fig
+
     return layout
 
 
+def get_x_range(relayout_data: dict | None) -> tuple[datetime, datetime] | None:
+    """ x range from plotly relayoutData (None if not zoomed) """
+    if not relayout_data:
+        return None
+    if "xaxis.range[0]" in relayout_data:
+        x_range = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    elif "xaxis.range" in relayout_data:
+        x_range = relayout_data["xaxis.range"]
+    else:
+        return None
+    return datetime.fromisoformat(x_range[0]), datetime.fromisoformat(x_range[1])
+
+
 def create_slider(app: dash.Dash, data: GanttChart, config: ConfigPlot):
     if data.number_of_rows <= config.max_rows:
         return []
@@ -40,7 +70,7 @@ def create_slider(app: dash.Dash, data: GanttChart, config: ConfigPlot):
                 max=max(config.get_y_values(data.number_of_rows)),
                 step=config.step,
                 value=1,
-                marks={y_: row.class_name for y_, row in zip(range(1, data.number_of_rows), data)},
+                marks={y_: row.name for y_, row in zip(range(1, data.number_of_rows), data)},
                 vertical=True
             )
 
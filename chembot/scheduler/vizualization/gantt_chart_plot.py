@@ -1,9 +1,10 @@
 from typing import Iterator
-from datetime import datetime, timedelta
+from datetime import datetime
 
+import numpy as np
 import plotly.graph_objs as go
 
-from scheduler.vizualization.gantt_chart import GanttChart, TimeBlock
+from chembot.scheduler.vizualization.gantt_chart import GanttChart, Row, datetime_to_ms, merge_blocks
 
 
 class ConfigPlot:
@@ -38,6 +39,9 @@ class ConfigPlot:
         self.box_line_width = 30
         self.box_width = self.step/3
 
+        # decimation
+        self.max_blocks_per_row = 2000  # more visible blocks than this are merged when less than a pixel apart
+
     def get_y_values(self, num_rows: int) -> Iterator[int | float]:
         return range(1, num_rows + 1, self.step)
 
@@ -153,55 +157,92 @@ class ConfigPlot:
         }
 
 
-def create_bar(fig: go.Figure, time_block: TimeBlock, y: float, config: ConfigPlot):
+def _interleave(columns: list[np.ndarray | float], number_of_blocks: int, fill=np.nan, dtype=np.float64) \
+        -> np.ndarray:
+    """ [c0[0], c1[0], ..., fill, c0[1], c1[1], ..., fill, ...]; fill separates the blocks of a single trace """
+    values = np.empty((number_of_blocks, len(columns) + 1), dtype=dtype)
+    for i, column in enumerate(columns):
+        values[:, i] = column
+    values[:, -1] = fill
+    return values.ravel()
+
+
+def _trace_kwargs(config: ConfigPlot, hover_text: np.ndarray | None, points_per_block: int) -> dict:
+    """ hover text is repeated for every point of a block """
+    if hover_text is None:
+        return config.scatter_kwargs()
+    return config.scatter_kwargs(_interleave([hover_text] * points_per_block, len(hover_text), None, object))
+
+
+def create_bar(fig: go.Figure, time_start: np.ndarray, time_end: np.ndarray, hover_text: np.ndarray | None, y: float,
+               config: ConfigPlot):
+    """ one trace for all blocks of a row: |----| """
+    y_low = y - config.bar_vertical_span
+    y_high = y + config.bar_vertical_span
     fig.add_trace(
         go.Scatter(
-            x=[time_block.time_start, time_block.time_start, time_block.time_start,
-               time_block.time_end, time_block.time_end, time_block.time_end],
-            y=[y - config.bar_vertical_span, y + config.bar_vertical_span, y, y,
-               y - config.bar_vertical_span, y + config.bar_vertical_span],
+            x=_interleave([time_start, time_start, time_start, time_end, time_end, time_end], len(time_start)),
+            y=_interleave([y_low, y_high, y, y, y_low, y_high], len(time_start)),
             mode="lines",
             line={"color": "black", "width": config.bar_line_width},
-            **config.scatter_kwargs(time_block.hover_text)
+            **_trace_kwargs(config, hover_text, 6)
         )
     )
 
 
-def create_line(fig: go.Figure, time_block: TimeBlock, y: float, config: ConfigPlot):
+def create_line(fig: go.Figure, time_start: np.ndarray, hover_text: np.ndarray | None, y: float, config: ConfigPlot):
+    """ one trace for all blocks of a row without end: | """
     fig.add_trace(
         go.Scatter(
-            x=(time_block.time_start, time_block.time_start),
-            y=[y - config.bar_vertical_span, y + config.bar_vertical_span],
+            x=_interleave([time_start, time_start], len(time_start)),
+            y=_interleave([y - config.bar_vertical_span, y + config.bar_vertical_span], len(time_start)),
             mode="lines",
             line={"color": "black", "width": config.bar_line_width},
-            **config.scatter_kwargs(time_block.hover_text)
+            **_trace_kwargs(config, hover_text, 2)
         )
     )
 
 
-def create_box(fig: go.Figure, time_block: TimeBlock, y: float, config: ConfigPlot):
+def create_box(fig: go.Figure, time_start: np.ndarray, time_end: np.ndarray, hover_text: np.ndarray | None, y: float,
+               config: ConfigPlot):
+    """ one trace for all blocks of a row: thick line from start to end """
     fig.add_trace(
         go.Scatter(
-            x=(time_block.time_start, time_block.time_end),
-            y=(y, y),
+            x=_interleave([time_start, time_end], len(time_start)),
+            y=_interleave([y, y], len(time_start)),
             mode="lines",
             line={"color": "black", "width": config.box_line_width},
-            **config.scatter_kwargs(time_block.hover_text)
+            **_trace_kwargs(config, hover_text, 2)
         )
     )
 
 
-def create_box2(fig: go.Figure, time_block: TimeBlock, y: float, config: ConfigPlot):
-    delta = (time_block.time_end - time_block.time_start) * 0.05
-    fig.add_shape(type="rect",
-                  x0=time_block.time_start + delta,
-                  y0=y-config.box_width,
-                  x1=time_block.time_end - delta,
-                  y1=y+config.box_width,
-                  line={"color": "black", "width": 1},
-                  fillcolor="black",
-                  )
-    #
+def get_row_blocks(row: Row, x_range: tuple[float, float] | None, resolution: float | None, config: ConfigPlot) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    """
+    time_start, time_end and hover_text of the blocks of a row to draw: only blocks in x_range, and merged if there
+    are more than config.max_blocks_per_row visible
+    """
+    if x_range is None:
+        visible = slice(0, len(row))
+    else:
+        visible = row.get_visible(*x_range)
+    time_start = row.time_start[visible]
+    time_end = row.time_end[visible]
+    hover_text = row.hover_text[visible] if config.hover else None
+    if x_range is not None:
+        in_range = np.where(np.isnan(time_end), time_start, time_end) >= x_range[0]
+        time_start, time_end = time_start[in_range], time_end[in_range]
+        hover_text = hover_text[in_range] if hover_text is not None else None
+
+    if len(time_start) > config.max_blocks_per_row and resolution is not None:
+        time_start, time_end, counts = merge_blocks(time_start, time_end, resolution)
+        if hover_text is not None:
+            merged = counts > 1
+            hover_text = hover_text[np.cumsum(np.append(0, counts[:-1]))]
+            hover_text[merged] = [f"{count} blocks" for count in counts[merged]]
+
+    return time_start, time_end, hover_text
 
 
 def add_current_time(fig: go.Figure, x_min: datetime, x_max: datetime, num_rows: int, config: ConfigPlot):
@@ -215,27 +256,46 @@ def add_current_time(fig: go.Figure, x_min: datetime, x_max: datetime, num_rows:
     )
 
 
-def create_gantt_chart(data: GanttChart, config: ConfigPlot = None) -> go.Figure:
-    """ main function """
+def create_gantt_chart(data: GanttChart, config: ConfigPlot = None, x_range: tuple[datetime, datetime] = None) \
+        -> go.Figure:
+    """
+    main function
+
+    Every row is one trace (two if it has blocks without end); only blocks in x_range (the viewport) are drawn,
+    and blocks less than a pixel apart are merged if a row has more than config.max_blocks_per_row visible.
+    """
     if config is None:
         config = ConfigPlot()
 
     fig = go.Figure()
 
+    x_range_view = x_range
+    if x_range is None and data.time_min is not None:
+        x_range = (data.time_min, data.time_max)
+    resolution = None
+    if x_range is not None:
+        x_range = tuple(datetime_to_ms(x_range))
+        resolution = (x_range[1] - x_range[0]) / config.width  # ms per pixel
+
     for i, row in enumerate(data):
         i = i + 1  # time_start at y=1 instead y=0
-        for time_block in row.time_blocks:
-            if time_block.time_end is None:
-                create_line(fig, time_block, y=i, config=config)
-            else:
-                if config.mode == ConfigPlot.BOX:
-                    create_box2(fig, time_block, y=i, config=config)
-                    create_box(fig, time_block, y=i, config=config)
-                else:
-                    create_bar(fig, time_block, y=i, config=config)
+        time_start, time_end, hover_text = get_row_blocks(row, x_range, resolution, config)
+        no_end = np.isnan(time_end)
+        if no_end.any():
+            create_line(fig, time_start[no_end], hover_text[no_end] if hover_text is not None else None, i, config)
+            has_end = ~no_end
+            time_start, time_end = time_start[has_end], time_end[has_end]
+            hover_text = hover_text[has_end] if hover_text is not None else None
+
+        if config.mode == ConfigPlot.BOX:
+            create_box(fig, time_start, time_end, hover_text, y=i, config=config)
+        else:
+            create_bar(fig, time_start, time_end, hover_text, y=i, config=config)
 
     if data.current_time is not None:
         add_current_time(fig, data.time_min, data.current_time, data.number_of_rows, config)
 
     fig.update_layout(**config.layout_kwargs(data))
+    if x_range_view is not None:
+        fig.update_xaxes(range=x_range_view)
     return fig
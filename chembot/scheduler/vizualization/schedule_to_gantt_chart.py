@@ -1,22 +1,48 @@
+from datetime import datetime
 
-from chembot.scheduler.vizualization.gantt_chart import GanttChart, Row, TimeBlock
+import numpy as np
+
+from chembot.scheduler.vizualization.gantt_chart import GanttChart, Row
 from chembot.scheduler.schedule import Schedule
+from chembot.scheduler.schedule_delta import ScheduleTable
 
 
 def schedule_to_gantt_chart(schedule: Schedule) -> GanttChart:
     gantt_chart = GanttChart()
 
     for resource in schedule.resources:
-        row = Row(resource.name)
-        for event in resource.events:
-            row.add_time_block(
-                TimeBlock(
-                    time_start=event.time_start,
-                    time_end=event.time_end,
-                    name=event.name,
-                    hover_text=event.hover_text()
-                )
+        events = resource.events  # sorted by time_start_with_delay
+        time_start = [event.time_start_with_delay for event in events]
+        gantt_chart.add_row(
+            Row.from_arrays(
+                resource.name,
+                time_start=time_start,
+                time_end=[time_ + event.duration for time_, event in zip(time_start, events)],
+                names=[event.name for event in events],
+                hover_text=[event.hover_text() for event in events],
+                is_sorted=True
+            )
+        )
+
+    return gantt_chart
+
+
+def schedule_table_to_gantt_chart(table: ScheduleTable) -> GanttChart:
+    """ gantt chart from the client copy of the schedule (see JobSubmitter.update_schedule) """
+    gantt_chart = GanttChart()
+
+    # POSIX timestamps -> local wall clock ms (what rows take); uses the current UTC offset
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    for resource in np.unique(table.resource):
+        index = np.flatnonzero(table.resource == resource)
+        gantt_chart.add_row(
+            Row.from_arrays(
+                resource,
+                time_start=(table.time_start[index] + offset) * 1000,
+                time_end=(table.time_end[index] + offset) * 1000,
+                names=table.name[index],
+                hover_text=table.name[index]
             )
-        gantt_chart.add_row(row)
+        )
 
     return gantt_chart
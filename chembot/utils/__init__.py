@@ -1,2 +1,3 @@
 
 from chembot.utils.threading_utils import EquipmentManager
+from chembot.utils.asyncio_utils import AsyncEquipmentManager
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import Protocol
+
+from chembot.configuration import config
+from chembot.utils.threading_utils import equipment_to_list
+
+logger = logging.getLogger(config.root_logger_name)
+
+
+class AsyncEquipmentInterface(Protocol):
+    name = ""
+    _deactivation_event: bool
+
+    async def activate(self):
+        ...
+
+    def write_deactivate(self):
+        ...
+
+
+ASYNC_EQUIPMENT_TYPE = list[AsyncEquipmentInterface, ...] | tuple[AsyncEquipmentInterface, ...] | \
+                       AsyncEquipmentInterface
+
+
+class AsyncEquipmentManager:
+    """
+    Runs all AsyncEquipment of a process on a single event loop (one thread) instead of one thread per equipment
+    (see EquipmentManager).
+    """
+    def __init__(self, equipment: ASYNC_EQUIPMENT_TYPE = None):
+        self.equipment = []
+        self.tasks: dict[str, asyncio.Task] = {}
+
+        if equipment is not None:
+            self.add(equipment)
+
+    def add(self, equipment: ASYNC_EQUIPMENT_TYPE):
+        self.equipment += equipment_to_list(equipment)
+
+    def activate(self):
+        """ blocking; returns when all equipment has deactivated """
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logger.info("\n\n\tKeyboardInterrupt raised\n")
+
+    async def run(self):
+        self.tasks = {equip.name: asyncio.create_task(equip.activate(), name=equip.name) for equip in self.equipment}
+        logger.info("UTILS || All equipment started\n" + "#" * 48 + "\n\n\n")
+
+        try:
+            await asyncio.gather(*self.tasks.values())
+        finally:
+            await self.deactivate()
+
+    async def deactivate(self):
+        logger.info("UTILS || Cleaning up equipment")
+        for equip in self.equipment:
+            if not equip._deactivation_event:
+                equip.write_deactivate()
+                logger.debug(f"UTILS || Deactivating: {equip.name}")
+
+        # equipment loops exit on their next pass; give them a chance to unregister before cancelling
+        _, pending = await asyncio.wait(self.tasks.values(), timeout=2)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
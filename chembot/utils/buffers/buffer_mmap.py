@@ -0,0 +1,364 @@
+"""
+Ring buffer in a memory-mapped file, so data survives a crash of the process writing it and other processes (GUI,
+analysis) can read it live without an RPC and without copying.
+
+File layout (.ring):
+
+| offset                        | content                                                                   |
+|-------------------------------|---------------------------------------------------------------------------|
+| 0                             | header page (4096 bytes): see _HEADER_DTYPE                               |
+| 4096                          | rows: (capacity, columns) of dtype, C order                               |
+| 4096 + rows bytes             | time of each row: (capacity,) float64 (if timestamps)                     |
+
+`write_count` in the header counts rows since the file was created; row i is at index i % capacity. Writes are
+published seqlock style: the writer first sets `write_start` to the row count the write ends at, then stores the rows,
+then sets `write_count` to the same value. So after a crash every row below write_count is complete (the OS writes
+the pages back even if the process dies; call flush() to also survive a power loss), and rows below
+write_start - capacity may be being overwritten right now (or were, when the writer crashed). write_start never
+goes back, so rows torn by a crash stay excluded after recover().
+
+Only one process writes (BufferRingMemmap); any number read (BufferRingMemmapReader). Readers check with
+overwritten() (after using the rows) how many of them the writer overwrote or was overwriting meanwhile.
+
+"""
+from __future__ import annotations
+
+import pathlib
+import time
+from typing import Sequence
+
+import numpy as np
+
+_MAGIC = b"CBRING01"
+_HEADER_SIZE = 4096
+_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("header_size", "<u8"),
+    ("capacity", "<u8"),
+    ("columns", "<u8"),
+    ("dtype", "S16"),  # numpy dtype.str e.g. b'<f8'
+    ("timestamps", "<u8"),  # 1 if the time of each row is stored
+    ("write_count", "<u8"),  # cursor; updated after the rows
+    ("time_created", "<f8"),
+    ("time_last", "<f8"),  # time of the last write
+    ("write_start", "<u8"),  # write_count the write in progress ends at; updated before the rows
+])
+
+
+def _get_slices(capacity: int, start: int, end: int) -> list[slice]:
+    """ ring slices of rows [start, end) (row counts); at most two """
+    rows = end - start
+    if rows <= 0:
+        return []
+    index = start % capacity
+    if index + rows <= capacity:
+        return [slice(index, index + rows)]
+    return [slice(index, capacity), slice(0, index + rows - capacity)]
+
+
+class _BufferRingMemmapBase:
+    suffix = ".ring"
+
+    def __init__(self, path: str | pathlib.Path):
+        path = pathlib.Path(path)
+        self.path = path.with_suffix(self.suffix)
+        self._header: np.ndarray | None = None
+        self.buffer: np.memmap | None = None
+        self.buffer_time: np.memmap | None = None
+
+    def __str__(self):
+        return f"{type(self).__name__}({self.path.name}, shape: {self.shape}, written: {self.write_count})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _map(self, mode: str):
+        """ map the data of an existing file """
+        self._header = np.memmap(self.path, dtype=_HEADER_DTYPE, mode=mode, shape=(1,))
+        header = self._header[0]
+        if header["magic"] != _MAGIC:
+            raise ValueError(f"{self.path} is not a ring buffer file.")
+        capacity = int(header["capacity"])
+        columns = int(header["columns"])
+        dtype = np.dtype(header["dtype"].decode())
+        offset = int(header["header_size"])
+        self.buffer = np.memmap(self.path, dtype=dtype, mode=mode, offset=offset, shape=(capacity, columns))
+        if header["timestamps"]:
+            self.buffer_time = np.memmap(self.path, dtype=np.float64, mode=mode, shape=(capacity,),
+                                         offset=offset + self.buffer.nbytes)
+
+    @property
+    def shape(self) -> tuple[int, int] | None:
+        if self.buffer is None:
+            return None
+        return self.buffer.shape
+
+    @property
+    def dtype(self):
+        if self.buffer is None:
+            return None
+        return self.buffer.dtype
+
+    @property
+    def capacity(self) -> int | None:
+        if self.buffer is None:
+            return None
+        return self.buffer.shape[0]
+
+    @property
+    def write_count(self) -> int:
+        if self._header is None:
+            return 0
+        return int(self._header["write_count"][0])
+
+    @property
+    def write_start(self) -> int:
+        """ == write_count unless a write is in progress (or the writer crashed during one) """
+        if self._header is None:
+            return 0
+        return int(self._header["write_start"][0])
+
+    @property
+    def time_last(self) -> float | None:
+        if self._header is None:
+            return None
+        return float(self._header["time_last"][0])
+
+    @property
+    def position(self) -> int:
+        """ ring index of the last row written; -1 if empty """
+        write_count = self.write_count
+        if write_count == 0:
+            return -1
+        return (write_count - 1) % self.capacity
+
+    @property
+    def last_measurement(self) -> np.ndarray | None:
+        if self.buffer is None or self.write_count == 0:
+            return None
+        return self.buffer[self.position, :]
+
+    def get_slices(self, start: int, end: int) -> list[slice]:
+        return _get_slices(self.capacity, start, end)
+
+    def overwritten(self, start: int) -> int:
+        """ rows from `start` the writer has overwritten (or is overwriting) since """
+        return max(0, self.write_start - self.capacity - start)
+
+    def get_data(self, start: int = None, end: int = None, merge: bool = True) \
+            -> tuple[np.ndarray, np.ndarray] | np.ndarray | None:
+        """
+        copy of rows [start, end) (row counts since the file was created); default: all in the ring.
+        merge: [time, data...] in one array (if timestamps)
+        """
+        if self.buffer is None:
+            return None
+        write_count = self.write_count
+        if end is None:
+            end = write_count
+        if start is None:
+            start = end - min(end, self.capacity)
+        start = max(start, write_count - self.capacity)
+        if start >= end:
+            return None
+
+        spans = self.get_slices(start, end)
+        data = np.concatenate([self.buffer[span] for span in spans])
+        if self.buffer_time is None:
+            return data[self.overwritten(start):]
+
+        time_ = np.concatenate([self.buffer_time[span] for span in spans])
+        lost = self.overwritten(start)  # overwritten while copying
+        data, time_ = data[lost:], time_[lost:]
+        if merge:
+            return np.column_stack((time_, data))
+        return time_, data
+
+
+class BufferRingMemmap(_BufferRingMemmapBase):
+    """
+    writer; the file is created with the first row (or when `columns` is given). Use recover() to continue writing
+    a file after a crash.
+    """
+    _DEFAULT_LENGTH = 1000
+
+    def __init__(self,
+                 path: str | pathlib.Path,
+                 length: int = None,
+                 columns: int = None,
+                 dtype: np.dtype | str = np.float64,
+                 timestamps: bool = True
+                 ):
+        """
+
+        Parameters
+        ----------
+        path:
+            file (suffix .ring); overwritten if it exists
+        length:
+            number of rows in the ring
+        columns:
+            number of columns; if not given it comes from the first row
+        dtype:
+            only used when `columns` is given; otherwise from the first row
+        timestamps:
+            store the time of each row
+        """
+        super().__init__(path)
+        self.length = length if length is not None else self._DEFAULT_LENGTH
+        self.timestamps = timestamps
+        self.total_rows = 0
+        self._write_start = 0
+        if columns is not None:
+            self._create_file(columns, np.dtype(dtype))
+
+    @classmethod
+    def recover(cls, path: str | pathlib.Path) -> BufferRingMemmap:
+        """ open an existing file (e.g. after a crash) and continue writing after its last complete row """
+        buffer = cls.__new__(cls)
+        _BufferRingMemmapBase.__init__(buffer, path)
+        buffer._map("r+")
+        buffer.length = buffer.capacity
+        buffer.timestamps = buffer.buffer_time is not None
+        buffer.total_rows = buffer.write_count
+        buffer._write_start = buffer.write_start  # > write_count if it crashed while writing
+        return buffer
+
+    def _create_file(self, columns: int, dtype: np.dtype):
+        data_bytes = self.length * columns * dtype.itemsize
+        time_bytes = self.length * 8 if self.timestamps else 0
+        with open(self.path, mode="wb") as f:
+            f.truncate(_HEADER_SIZE + data_bytes + time_bytes)
+
+        header = np.memmap(self.path, dtype=_HEADER_DTYPE, mode="r+", shape=(1,))
+        header["magic"] = _MAGIC
+        header["header_size"] = _HEADER_SIZE
+        header["capacity"] = self.length
+        header["columns"] = columns
+        header["dtype"] = dtype.str.encode()
+        header["timestamps"] = int(self.timestamps)
+        header["write_count"] = 0
+        header["write_start"] = 0
+        header["time_created"] = time.time()
+        header.flush()
+        del header
+        self._map("r+")
+
+    def _create_buffer(self, data: int | float | Sequence[int | float] | np.ndarray):
+        """ file from the first row """
+        if isinstance(data, int):
+            self._create_file(1, np.dtype(np.int64))
+        elif isinstance(data, float):
+            self._create_file(1, np.dtype(np.float64))
+        elif isinstance(data, (list, tuple)):
+            self._create_file(len(data), np.asarray(data).dtype)
+        elif isinstance(data, np.ndarray):
+            self._create_file(data.shape[-1] if data.ndim else 1, data.dtype)
+        else:
+            raise TypeError(f"Invalid type.\t\nGive: {data}\t\nExpected: int | float | np.ndarray\n")
+
+    def _begin(self, write_count: int):
+        """ before the rows are written; write_count: the one the write ends at """
+        if write_count > self._write_start:
+            self._write_start = write_count
+            self._header[0]["write_start"] = write_count
+
+    def _publish(self, write_count: int, time_: float):
+        """ after the rows are written """
+        header = self._header[0]
+        header["time_last"] = time_
+        header["write_count"] = write_count
+
+    def add_data(self, data: int | float | Sequence[int | float] | np.ndarray):
+        if self.buffer is None:
+            self._create_buffer(data)
+        write_count = self.write_count
+        index = write_count % self.capacity
+        time_ = time.time()
+        self._begin(write_count + 1)
+        self.buffer[index] = data
+        if self.buffer_time is not None:
+            self.buffer_time[index] = time_
+        self._publish(write_count + 1, time_)
+        self.total_rows += 1
+
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        """
+        add rows (rows, columns) with at most two slice assignments. If the block is longer than the ring only its
+        last rows are kept. timestamps: time of each row; default is now for every row
+        """
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        rows = data.shape[0]
+        if rows == 0:
+            return
+        if self.buffer is None:
+            self._create_buffer(data[0])
+
+        time_now = time.time()
+        skipped = max(rows - self.capacity, 0)
+        write_count = self.write_count + skipped
+        spans = self.get_slices(write_count, write_count + rows - skipped)
+        first = spans[0].stop - spans[0].start
+        data = data[skipped:]
+        self._begin(write_count + rows - skipped)
+        self.buffer[spans[0]] = data[:first]
+        if len(spans) == 2:
+            self.buffer[spans[1]] = data[first:]
+        if self.buffer_time is not None:
+            timestamps = np.full(rows, time_now) if timestamps is None else np.asarray(timestamps, np.float64)
+            timestamps = timestamps[skipped:]
+            self.buffer_time[spans[0]] = timestamps[:first]
+            if len(spans) == 2:
+                self.buffer_time[spans[1]] = timestamps[first:]
+        self._publish(write_count + rows - skipped, time_now)
+        self.total_rows += rows
+
+    def flush(self):
+        """ write dirty pages to disk (only needed to survive an OS crash or power loss) """
+        if self.buffer is None:
+            return
+        self.buffer.flush()
+        if self.buffer_time is not None:
+            self.buffer_time.flush()
+        self._header.flush()
+
+    def save_all(self):
+        """ data is always in the file; just flush it """
+        self.flush()
+
+
+class BufferRingMemmapReader(_BufferRingMemmapBase):
+    """
+    read-only view of a file another process is writing. views() gives new rows without copying:
+
+        reader = BufferRingMemmapReader(path)
+        count = 0
+        while True:
+            start, views = reader.views(count)
+            ...  # use views
+            if reader.overwritten(start):  # writer lapped the reader; drop that many rows from the start
+                ...
+            count = start + sum(len(view) for view in views)
+
+    """
+    def __init__(self, path: str | pathlib.Path):
+        super().__init__(path)
+        self._map("r")
+
+    def views(self, since: int = 0, max_rows: int = None, time_: bool = False) \
+            -> tuple[int, list[np.ndarray]] | tuple[int, list[np.ndarray], list[np.ndarray]]:
+        """
+        rows written since row count `since` as memmap views (at most two); rows no longer in the ring are skipped.
+        Returns (first row count, views) or (first row count, views, time views) if time_.
+        """
+        end = self.write_count
+        start = max(since, self.write_start - self.capacity)
+        if max_rows is not None:
+            end = min(end, start + max_rows)
+        spans = self.get_slices(start, end)
+        views = [self.buffer[span] for span in spans]
+        if time_:
+            return start, views, [self.buffer_time[span] for span in spans]
+        return start, views
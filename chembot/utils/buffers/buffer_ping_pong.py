@@ -1,18 +1,34 @@
+import logging
 import pathlib
-import queue
 import threading
 import numpy as np
 from typing import Sequence
 
+from chembot.utils.buffers.buffer_spsc import BufferRingSPSC, FullPolicy
+from chembot.utils.buffers.buffer_writer_service import get_buffer_writer_service
+from chembot.utils.buffers.buffer_writers import BufferWriter, get_buffer_writer
 
-class SavingThread:
-    def __init__(self, path: pathlib.Path):
+logger = logging.getLogger("buffer")
+
+
+class RingSaver:
+    """
+    consumer of the ring for the BufferWriterService: writes unread rows straight from the ring (no copy)
+    rows are appended to one file till it has more than _FILE_SIZE_LIMIT rows, then the next file is started
+    """
+    _FILE_SIZE_LIMIT = 30_000
+
+    def __init__(self, path: pathlib.Path, ring: BufferRingSPSC, writer: str | type[BufferWriter] = "csv",
+                 owner: str = None):
+        self._writer_type = get_buffer_writer(writer)
+        self._writer: BufferWriter | None = None  # opened with the first data; chunks are appended
+        self._writer_lock = threading.RLock()  # service thread vs. save_all()
         self._path = None
         self.path = path
-        self.data_queue = queue.Queue(maxsize=1)
-        self.thread = threading.Thread(target=self._run)
-        self.thread.start()
-        self.file_counter = 0
+        self.ring = ring
+        self.file_counter = 0  # index of the next file
+        self._service = get_buffer_writer_service()
+        self._service.register(self, owner)
 
     @property
     def path(self) -> pathlib.Path | None:
@@ -22,50 +38,94 @@ class SavingThread:
     def path(self, path: str | pathlib.Path):
         if not isinstance(path, pathlib.Path):
             path = pathlib.Path(path)
-        if not path.suffix == ".csv":
-            path = path.with_suffix(".csv")
-        self._path = path
+        self._path = path.with_suffix(self._writer_type.suffix)
+
+    @property
+    def name(self) -> str:
+        return self.path.stem
 
-    def add_data_to_queue(self, data: np.ndarray):
-        """ Blocking if queue is full """
-        self.data_queue.put(data)
+    # backpressure (see BufferMetrics)
+    @property
+    def pending_rows(self) -> int:
+        return self.ring.available
+
+    @property
+    def capacity(self) -> int:
+        return self.ring.capacity
+
+    @property
+    def overruns(self) -> int:
+        return self.ring.overruns
+
+    def notify(self, urgent: bool = False):
+        """ non-blocking; the service saves every unread row """
+        self._service.notify(self, urgent)
+
+    def save_all(self):
+        """ blocks till every row is saved, then closes the file (more rows go to the next file) """
+        self._service.drain(self)
+        self._close_writer()
 
     def _get_file_path(self) -> pathlib.Path:
-        path = self.path
-        path = path.with_stem(path.stem + "_" + str(self.file_counter))
+        stem = self.path.stem + "_" + str(self.file_counter)
+        path = self.path.with_stem(stem)
 
         counter = 0
-        while True:
-            if path.exists():
-                path = path.with_stem(path.stem + "_" + str(counter))
-            else:
-                break
+        while path.exists():
+            path = self.path.with_stem(stem + "_" + str(counter))
+            counter += 1
 
         return path
 
-    def _run(self):
-        main_thread = threading.main_thread()
-        while True:
-            try:
-                data = self.data_queue.get(timeout=0.25)
-                self._save(data)
-            except queue.Empty:
-                if not main_thread.is_alive() and self.data_queue.empty():
-                    break
-
-    def _save(self, data):
-        np.savetxt(self._get_file_path(), data, delimiter=",")
+    def _open_writer(self) -> BufferWriter:
+        writer = self._writer_type(self._get_file_path())
         self.file_counter += 1
+        logger.info(f"opening: {writer.path}")
+        return writer
+
+    # called by the writer service
+    def _save_pending(self) -> int:
+        with self._writer_lock:
+            start, views = self.ring.views()
+            if not views:
+                return 0
+            if self._writer is None:
+                self._writer = self._open_writer()
+            for view in views:
+                self._writer.write(view)
+            rows = sum(view.shape[0] for view in views)
+            self.ring.advance(rows)
+            if self._writer.rows > self._FILE_SIZE_LIMIT:
+                self._close_writer()
+            return rows
+
+    def _flush_writer(self, fsync: bool):
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.flush(fsync)
+
+    def _close_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                return
+            self._writer.close()
+            logger.info(f"closing: {self._writer.path}")
+            self._writer = None
 
 
 class PingPongBuffer:
-    def __init__(self, path: pathlib.Path, capacity: int = 50_000):
-        self.buffer_active = None
-        self.buffer_passive = None
-        self.capacity = capacity
-        self.position = 0
+    """
+    Two halves of one BufferRingSPSC: when a half is full it is saved by the BufferWriterService while the other half
+    fills.
+    add_data() blocks if the saving thread is still writing the half it needs.
+    """
+    def __init__(self, path: pathlib.Path, capacity: int = 50_000, writer: str | type[BufferWriter] = "csv",
+                 owner: str = None):
+        """ owner: e.g. the equipment name, for its buffer_metrics """
+        self.capacity = capacity  # rows per half
+        self.ring = BufferRingSPSC(2 * capacity, FullPolicy.BLOCK)
         self.total_rows = 0
-        self.saving_thread = SavingThread(path)
+        self.saver = RingSaver(path, self.ring, writer, owner)
 
     def __enter__(self):
         return self
@@ -73,45 +133,30 @@ class PingPongBuffer:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.save_all()
 
-    def add_data(self, data: int | float | Sequence[int | float] | np.ndarray):
-        try:
-            # try-except is used for improved performance
-            self.buffer_active[self.position, :] = data
-            self.position += 1
-            self._check()  # will raise an Attribute error if no buffer created yet
-        except TypeError as _:
-            self._create_buffer(data)
-            self.buffer_active[self.position, :] = data
-            self.position += 1
+    @property
+    def position(self) -> int:
+        """ rows in the active half """
+        return self.ring.write_count % self.capacity
 
+    def add_data(self, data: int | float | Sequence[int | float] | np.ndarray):
+        self.ring.put(data)
         self.total_rows += 1
-
-    def _check(self):
-        if self.position == len(self.buffer_active):
-            self.buffer_active, self.buffer_passive = self.buffer_passive, self.buffer_active
-            self.position = 0
+        if self.position == 0:
             self.save_passive()
 
-    def _create_buffer(self, data: int | float | Sequence[int | float] | np.ndarray):
-        if isinstance(data, int):
-            self.buffer_active = np.zeros((self.capacity, 1), dtype=np.int64)
-        elif isinstance(data, float):
-            self.buffer_active = np.zeros((self.capacity, 1), dtype=np.float64)
-        elif isinstance(data, list) or isinstance(data, tuple):
-            self.buffer_active = np.zeros((self.capacity, len(data)))
-        elif isinstance(data, np.ndarray):
-            self.buffer_active = np.zeros((self.capacity, data.shape[0]), dtype=data.dtype)
-        else:
-            raise TypeError(f"Invalid type.\t\nGive: {data}\t\nExpected: int | float | np.ndarray\n")
-
-        self.buffer_passive = np.zeros_like(self.buffer_active)
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        """ add rows (rows, columns) with at most two slice assignments; timestamps are not used """
+        halves = self.ring.write_count // self.capacity
+        self.total_rows += self.ring.write(data)
+        if self.ring.write_count // self.capacity != halves:  # a half was filled
+            self.save_passive()
 
     def save_all(self):
-        self.saving_thread.add_data_to_queue(self.buffer_active[:self.position])
-        # buffer_passive should already be saved
+        """ blocks till every row is saved and the file is closed """
+        self.saver.save_all()
 
     def save_passive(self):
-        self.saving_thread.add_data_to_queue(self.buffer_passive)
+        self.saver.notify(urgent=True)  # must be saved before the active half is full
 
 
 def main():
@@ -1,16 +1,25 @@
 import abc
-import os
 import pathlib
 import queue
-import threading
 import time
 import logging
 
 import numpy as np
 
+from chembot.utils.buffers.buffer_spsc import BufferRingSPSC, FullPolicy
+from chembot.utils.buffers.buffer_writer_service import get_buffer_writer_service
+from chembot.utils.buffers.buffer_writers import BufferWriter, get_buffer_writer
+
 logger = logging.getLogger("buffer")
 
 
+def _write_block(buffer: np.ndarray, start: int, data: np.ndarray):
+    """ data into buffer from index start, wrapping around; at most two slice assignments """
+    first = min(data.shape[0], buffer.shape[0] - start)
+    buffer[start:start + first] = data[:first]
+    buffer[:data.shape[0] - first] = data[first:]
+
+
 class BufferRing:
     """
     The buffer ring is an efficient way to reuse the same memory over and over  again for data streaming in.
@@ -63,6 +72,32 @@ class BufferRing:
 
         self.total_rows += 1
 
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        """
+        add rows (rows, columns) with at most two slice assignments. If the block is longer than the buffer only its
+        last rows are kept. timestamps are only used by BufferRingTime.
+        """
+        self._add_block(data)
+
+    def _add_block(self, data: np.ndarray) -> tuple[int, int]:
+        """ returns (index of the first row kept, number of rows of the block not kept) """
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        rows = data.shape[0]
+        if rows == 0:
+            return 0, 0
+        if self.buffer is None:
+            self._create_buffer(data[0])
+
+        length = self.buffer.shape[0]
+        skipped = max(rows - length, 0)
+        start = (self.position + 1 + skipped) % length
+        _write_block(self.buffer, start, data[skipped:])
+        self.position = (self.position + rows) % length
+        self.total_rows += rows
+        return start, skipped
+
     def _update_position(self):
         if self.position == self.buffer.shape[0] - 1:
             self.position = 0
@@ -129,6 +164,17 @@ class BufferRingTime(BufferRing):
         super().add_data(data)
         self.buffer_time[self.position] = time.time()
 
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        """ timestamps: time of each row; default is now for every row """
+        rows = len(data)
+        start, skipped = self._add_block(data)
+        if timestamps is None:
+            timestamps = np.full(rows - skipped, time.time())
+        else:
+            timestamps = np.asarray(timestamps, dtype=np.float64)[skipped:]
+        if timestamps.shape[0]:
+            _write_block(self.buffer_time, start, timestamps)
+
     def _create_buffer(self, data: int | float | np.ndarray):
         super()._create_buffer(data)
         self.buffer_time = np.zeros(self.buffer.shape[0], dtype=np.float64)
@@ -155,34 +201,43 @@ class BufferRingTime(BufferRing):
 
 
 class SavingMixin(abc.ABC):
+    """
+    Rows are saved by the process-wide BufferWriterService (see buffer_writer_service): the buffer queues what to
+    save and notifies the service, which writes it on its thread.
+    """
     _FILE_SIZE_LIMIT = 30_000
 
-    def __init__(self, path: str | pathlib.Path, queue_size: int, saving: bool = True):
+    def __init__(self, path: str | pathlib.Path, queue_size: int, saving: bool = True,
+                 writer: str | type[BufferWriter] = "csv", owner: str = None):
         self._path = None
         self.path = path
+        self._writer_type = get_buffer_writer(writer)
+        self._writer: BufferWriter | None = None  # opened by the service with the first rows
 
-        # stuff for saving via thread
         self.saving = saving
-        self._data_queue = queue.Queue(maxsize=queue_size)
+        self._data_queue = queue.Queue(maxsize=queue_size)  # what to save; emptied by the service
 
         self._file_counter = 0
         self._resets = 0
         self._reset_saving = False
-        self._thread = threading.Thread(target=self._thread_save)
-        self._thread.start()
+        self._service = get_buffer_writer_service()
+        self._service.register(self, owner)
 
     @property
     def path(self) -> pathlib.Path | None:
+        """ suffix is set by the writer """
         return self._path
 
     @path.setter
     def path(self, path: str | pathlib.Path):
         if not isinstance(path, pathlib.Path):
             path = pathlib.Path(path)
-        if not path.suffix == ".csv":
-            path = path.with_suffix(".csv")
         self._path = path
 
+    @property
+    def name(self) -> str:
+        return self.path.stem
+
     def get_file_path(self, index: int) -> pathlib.Path:
         path = self.path
         if self._resets > 0:
@@ -192,73 +247,74 @@ class SavingMixin(abc.ABC):
 
         return path
 
-    def _thread_save(self):
-        """
-        this function periodically saves data from the buffer to csv.
-        this function is called by the thread.
-        """
-        main_thread = threading.main_thread()
-        index = -1
-        close_thread = False
-        while not close_thread:
-            index += 1  # counter for index path name for each new file
-            counter = 0  # counter when to start a new file
-            file_path = self.get_file_path(index)
+    # backpressure (see BufferMetrics)
+    @property
+    def pending_rows(self) -> int:
+        return 0
+
+    @property
+    def capacity(self) -> int:
+        return self.shape[0] if self.shape is not None else 0
+
+    @property
+    def overruns(self) -> int:
+        return 0
+
+    # called by the writer service
+    def _open_writer(self) -> BufferWriter:
+        file_path = self.get_file_path(self._file_counter)
+        self._file_counter += 1  # counter for index path name for each new file
+        try:
+            writer = self._writer_type(file_path)
+        except PermissionError:
+            new_path = file_path.with_stem(file_path.stem + f"_{int(time.time())}")
+            logger.warning(f"{file_path} could not open. Renaming file to: {new_path}")
+            writer = self._writer_type(new_path)
+        logger.info(f"opening: {writer.path}")
+        return writer
+
+    def _close_writer(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        logger.info(f"closing: {self._writer.path}")
+        self._writer = None
+
+    def _flush_writer(self, fsync: bool):
+        if self._writer is not None:
+            self._writer.flush(fsync)
+
+    def _save_pending(self) -> int:
+        """ write everything queued; returns number of rows written """
+        if self._reset_saving:
+            # move onto next file
+            self._reset_saving = False
+            self._close_writer()
+
+        rows = 0
+        while True:
+            data = self._next_data_to_save()
+            if data is None:
+                return rows
+            if self._writer is None:
+                self._writer = self._open_writer()
+            self._writer.write(data)  # one bulk write per chunk
+            rows += data.shape[0]
+
+            # check if we have hit row limit for current file
+            if self._writer.rows > self._FILE_SIZE_LIMIT:
+                self._close_writer()
+
+    def _next_data_to_save(self) -> np.ndarray | None:
+        """ next chunk queued for saving; None when there is nothing left """
+        while True:
             try:
-                logger.warning(f"opening: {file_path}")
-                counter = self._write_data_to_file(file_path, counter, main_thread)
-                logger.warning(f"closing: {file_path}")
-            except PermissionError:
-                new_path = file_path.with_stem(file_path.stem + f"_{int(time.time())}")
-                logger.warning(f"{file_path} could not open. Renaming file to: {new_path}")
-                file_path = new_path
-                counter = self._write_data_to_file(file_path, counter, main_thread)
-
-            if counter == 0:
-                logger.warning(f"removing: {file_path}")
-                try:
-                    os.remove(file_path)
-                except PermissionError:
-                    logger.warning(f"couldn't delete blank file: {file_path}. This could be because it was already "
-                                   f"deleted by another thread; which means there could be two threads saving to the "
-                                   f"same path. Double check that buffers are saving to different paths.")
-                    # blank file doesn't get deleted
-
-    def _write_data_to_file(self, file_path, counter, main_thread):
-        with open(file_path, mode="w", encoding="utf-8") as f:
-            while True:
-                try:
-                    range_ = self._data_queue.get(timeout=0.2)  # blocking
-                except queue.Empty:
-                    if not main_thread.is_alive():
-                        if close_thread:
-                            break
-                        self.save_all()
-                        close_thread = True
-                        continue
-                    if self._reset_saving:
-                        # move onto next file
-                        self._reset_saving = False
-                        break
-
-                    # continue waiting for data to come into queue
-                    continue
-
-                ########################################################
-                # data has come in for saving
-                logger.warning(f"saving data: {range_}")
-                data: np.ndarray | None = self.get_data(*range_)
-                if data is None:
-                    continue
-                for row in data:
-                    f.write(','.join(str(i) for i in row))
-                    f.write('\n')
-
-                # check if we have hit row limit for current file
-                counter += data.shape[0]
-                if counter > self._FILE_SIZE_LIMIT:
-                    break
-        return counter
+                range_ = self._data_queue.get_nowait()
+            except queue.Empty:
+                return None
+            data = self.get_data(*range_)
+            if data is not None:
+                return data
 
     @abc.abstractmethod
     def save_all(self):
@@ -274,7 +330,7 @@ class BufferRingSavable(BufferRing, SavingMixin):
     The buffer ring is an efficient way to reuse the same memory over and over  again for data streaming in.
     It will periodically save data to a csv for long term storage.
 
-    threading is used to ensure data can still be added while the save is happening.
+    The BufferWriterService saves on its own thread to ensure data can still be added while the save is happening.
     Note that data is saved from the buffer at the same time data is being written to it 'creating a data race'.
     This is not a problem if the buffer is big enough to not be reading and writing to the same cell at the same
     time. A check is added to stop if buffer is overfilled.
@@ -287,24 +343,40 @@ class BufferRingSavable(BufferRing, SavingMixin):
                  path: pathlib.Path,
                  buffer: np.ndarray = None,
                  number_of_rows_per_save: int = None,
-                 length: int = None
+                 length: int = None,
+                 writer: str | type[BufferWriter] = "csv",
+                 owner: str = None
                  ):
         """
 
         Parameters
         ----------
         path:
-            location where data will be saved.
+            location where data will be saved (suffix is set by the writer).
         buffer:
             buffer; make sure the length is sufficiently large to avoid data races
         number_of_rows_per_save:
             number of rows saved at a time
+        writer:
+            file format; see chembot.utils.buffers.buffer_writers
+        owner:
+            who the data belongs to (e.g. an equipment name); see BufferWriterService.get_metrics
         """
         BufferRing.__init__(self, buffer, length)
-        SavingMixin.__init__(self, path, 2)
         self.number_of_rows_per_save = number_of_rows_per_save
         self._last_save = 0
         self._next_save = None
+        self._total_rows_last_save = 0  # total_rows at the last save
+        self._rows_queued = 0
+        self._rows_saved = 0
+        SavingMixin.__init__(self, path, 2, writer=writer, owner=owner)  # queue size is set with the buffer
+        if buffer is not None:
+            self._get_number_of_rows_per_save()
+            self._next_save = self._compute_next_save()
+
+    @property
+    def pending_rows(self) -> int:
+        return self._rows_queued - self._rows_saved
 
     def add_data(self, data: int | float | np.ndarray):
         BufferRing.add_data(self, data)
@@ -312,25 +384,58 @@ class BufferRingSavable(BufferRing, SavingMixin):
         if self.saving and self.position == self._next_save:
             self.save(self._last_save, self.position + 1)  # +1 is for non-exclusive
 
-        self.total_rows += 1
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        if self.saving:
+            self._check_block(len(data))
+        BufferRing.add_block(self, data)
+        if self.saving:
+            self._save_block()
+
+    def _check_block(self, rows: int):
+        """ raise if the block would overwrite rows that are not saved yet """
+        length = self.shape[0] if self.buffer is not None else (self.length or self._DEFAULT_LENGTH)
+        unsaved = self.pending_rows + self.total_rows - self._total_rows_last_save
+        if unsaved + rows > length:
+            raise OverflowError(f"Block of {rows} rows would overwrite rows not saved yet ({unsaved} rows "
+                                f"unsaved, buffer length: {length}). Make buffer bigger or add smaller blocks.")
+
+    def _save_block(self):
+        """ one save for all rows since the last save once a save boundary is crossed """
+        if self.total_rows - self._total_rows_last_save >= self.number_of_rows_per_save:
+            self.save(self._last_save, self.position + 1)
 
     def save_all(self):
+        if self.buffer is None:
+            return  # nothing was added
         self.save(self._last_save, self.position + 1)  # +1 is for non-exclusive
         self.reset()
 
     def save(self, last_save: int, position: int):
-        if last_save == position or position == -1:
+        rows = self.total_rows - self._total_rows_last_save  # last_save == position: the whole ring
+        if rows == 0:
             return
         if self._data_queue.full():
             raise OverflowError("Queue is not being saved fast enough. Make buffer bigger or slow down data "
                                 "collection.")
         self._data_queue.put((last_save, position))
+        self._rows_queued += rows
+        self._total_rows_last_save = self.total_rows
         self._last_save = position
         self._next_save = self._compute_next_save()
+        # write now once half of the ring waits to be saved; otherwise coalesced at the next flush interval
+        self._service.notify(self, urgent=self._data_queue.qsize() * 2 >= self._data_queue.maxsize)
+
+    def _next_data_to_save(self) -> np.ndarray | None:
+        data = SavingMixin._next_data_to_save(self)
+        if data is not None:
+            self._rows_saved += data.shape[0]
+        return data
 
     def _get_number_of_rows_per_save(self):
         if self.number_of_rows_per_save is None:
             self.number_of_rows_per_save = min(self._NUMBER_OF_ROWS_PER_SAVE_DEFAULT, int(self.buffer.shape[0] / 2) - 1)
+        # chunks that fit in the ring without being overwritten before they are saved
+        self._data_queue.maxsize = max(self.buffer.shape[0] // self.number_of_rows_per_save - 1, 1)
 
     def _create_buffer(self, data: int | float | np.ndarray):
         BufferRing._create_buffer(self, data)
@@ -338,20 +443,15 @@ class BufferRingSavable(BufferRing, SavingMixin):
         self._next_save = self._compute_next_save()
 
     def reset(self):
-        time_out = time.time() + self._SAVING_TIMEOUT
-        while time.time() < time_out:
-            if self._data_queue.empty():
-                time.sleep(0.1)
-                self._reset_saving = True
-                BufferRing.reset(self)
-                self._resets += 1
-                self._last_save = 0
-                self._next_save = self._compute_next_save()
-                return
-            else:
-                time.sleep(0.1)
-
-        raise TimeoutError("Queue never emptied out, so reset can't happened.")
+        """ wait till everything queued is saved, then start a new file """
+        if not self._service.drain(self, self._SAVING_TIMEOUT):
+            raise TimeoutError("Queue never emptied out (saving timed out or failed), so reset can't happened.")
+        self._reset_saving = True
+        BufferRing.reset(self)
+        self._resets += 1
+        self._last_save = 0
+        self._total_rows_last_save = 0
+        self._next_save = self._compute_next_save()
 
     def _compute_next_save(self):
         rows_left_in_ring = self.shape[0] - self._last_save
@@ -360,64 +460,187 @@ class BufferRingSavable(BufferRing, SavingMixin):
         return self._last_save - 1 + self.number_of_rows_per_save
 
 
-class BufferRingTimeSavable(BufferRingSavable):
+class BufferRingTimeSavable(SavingMixin):
+    """
+    Ring buffer with a time for every row that is periodically saved to file for long term storage.
+
+    Built on BufferRingSPSC: add_data() is the producer and the writer service the consumer, so rows are only
+    overwritten after they are saved. When the saving thread falls behind, `full_policy` decides what add_data()
+    does (see FullPolicy); rows lost or refused are counted in `overruns`. With `saving` False nothing consumes the
+    ring, so rows are marked as read when added and the ring keeps the last `capacity` rows.
+
+    """
+    _NUMBER_OF_ROWS_PER_SAVE_DEFAULT = 1000
+    _SAVING_TIMEOUT = 3  # seconds
+
     def __init__(self,
                  path: pathlib.Path,
                  buffer: np.ndarray = None,
                  number_of_rows_per_save: int = None,
                  buffer_time: np.ndarray = None,
-                 length: int = None
+                 length: int = None,
+                 writer: str | type[BufferWriter] = "csv",
+                 full_policy: str = FullPolicy.RAISE,
+                 owner: str = None
                  ):
         """
 
         Parameters
         ----------
         path:
-            location where data will be saved.
+            location where data will be saved (suffix is set by the writer).
         buffer:
-            buffer; make sure the length is sufficiently large to avoid data races
+            buffer (rows, columns)
         number_of_rows_per_save:
             number of rows saved at a time
         buffer_time:
-
+            time of each row; created with the buffer if not given
+        length:
+            number of rows when the buffer is created from the first row
+        writer:
+            file format; see chembot.utils.buffers.buffer_writers
+        full_policy:
+            what add_data() does when no rows are free; see FullPolicy
+        owner:
+            who the data belongs to (e.g. an equipment name); see BufferWriterService.get_metrics
         """
-        super().__init__(path, buffer, number_of_rows_per_save, length=length)
-        if buffer is not None:
-            self.buffer_time = np.zeros(self.buffer.shape[0], dtype=np.float64)
-        self.buffer_time = buffer_time
+        self.ring = BufferRingSPSC(length, full_policy, timestamps=True, buffer=buffer)
+        if buffer_time is not None:
+            self.ring.buffer_time = buffer_time
+        if number_of_rows_per_save is None:
+            number_of_rows_per_save = max(min(self._NUMBER_OF_ROWS_PER_SAVE_DEFAULT, self.ring.capacity // 2 - 1), 1)
+        self.number_of_rows_per_save = number_of_rows_per_save
+        self.total_rows = 0
+        self._last_save = 0  # write count when the writer service was last notified
+        # rows to save come from the ring, not the queue
+        SavingMixin.__init__(self, path, 1, writer=writer, owner=owner)
+
+    def __str__(self):
+        return f"buffer: {self.shape}, position: {self.position}, unsaved: {self.ring.available}, " \
+               f"overruns: {self.overruns}"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def buffer(self) -> np.ndarray | None:
+        return self.ring.buffer
+
+    @property
+    def buffer_time(self) -> np.ndarray | None:
+        return self.ring.buffer_time
+
+    @property
+    def shape(self) -> tuple[int, int] | None:
+        return self.ring.shape
+
+    @property
+    def dtype(self):
+        return self.ring.dtype
+
+    @property
+    def position(self) -> int:
+        return self.ring.position
+
+    @property
+    def overruns(self) -> int:
+        return self.ring.overruns
+
+    @property
+    def pending_rows(self) -> int:
+        return self.ring.available
+
+    @property
+    def capacity(self) -> int:
+        return self.ring.capacity
+
+    @property
+    def last_measurement(self) -> np.ndarray | None:
+        if self.ring.buffer is None:
+            return None
+        return self.ring.buffer[self.position, :]
 
     @property
     def last_time(self) -> float:
-        return self.buffer_time[self.position]
+        return self.ring.buffer_time[self.position]
 
     def add_data(self, data: int | float | np.ndarray):
-        BufferRing.add_data(self, data)
-        self.buffer_time[self.position] = time.time()
+        self.ring.put(data, time.time())
+        self.total_rows += 1
 
-        if self.saving and self.position == self._next_save:
-            self.save(self._last_save, self._next_save + 1)  # +1 is for non-exclusive
+        if not self.saving:
+            self._skip_unsaved()
+        elif self.ring.write_count - self._last_save >= self.number_of_rows_per_save:
+            self.save()
 
-        self.total_rows += 1
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        """
+        add rows (rows, columns) with at most two slice assignments.
+        timestamps: time of each row; default is now for every row
+        """
+        data = np.asarray(data)
+        if timestamps is None:
+            timestamps = np.full(data.shape[0], time.time())
+        if not self.saving:
+            self._skip_unsaved()
+            if data.shape[0] > self.ring.capacity:
+                data, timestamps = data[-self.ring.capacity:], timestamps[-self.ring.capacity:]
+        rows = self.ring.write(data, timestamps)
+        self.total_rows += rows
+
+        if not self.saving:
+            self._skip_unsaved()
+        elif self.ring.write_count - self._last_save >= self.number_of_rows_per_save:
+            self.save()
+
+    def _skip_unsaved(self):
+        """ not saving: the producer marks rows as read itself, so the full policy never applies """
+        self.ring.read_count = self.ring.write_count
+
+    def save(self):
+        """ notify the writer service; it saves every unsaved row """
+        self._last_save = self.ring.write_count
+        # write now once half of the ring waits to be saved; otherwise coalesced at the next flush interval
+        self._service.notify(self, urgent=self.ring.available * 2 >= self.ring.capacity)
+
+    def _next_data_to_save(self) -> np.ndarray | None:
+        """ consumer side of the ring: unsaved rows as [time, data...] """
+        start, spans = self.ring.spans()
+        if not spans:
+            return None
+        data = [np.column_stack((self.ring.buffer_time[span], self.ring.buffer[span])) for span in spans]
+        data = data[0] if len(data) == 1 else np.concatenate(data)
+        lost = self.ring.overwritten(start)  # only with FullPolicy.DROP_OLDEST
+        self.ring.advance(data.shape[0])
+        return data[lost:] if lost else data
 
-    def _create_buffer(self, data: int | float | np.ndarray):
-        BufferRingSavable._create_buffer(self, data)
-        self.buffer_time = np.zeros(self.buffer.shape[0], dtype=np.float64)
+    def save_all(self):
+        if self.ring.buffer is None:
+            return  # nothing was added
+        self.reset()
+
+    def reset(self):
+        """ wait till everything is saved, then start a new file """
+        if not self._service.drain(self, self._SAVING_TIMEOUT):
+            raise TimeoutError("Queue never emptied out (saving timed out or failed), so reset can't happened.")
+        self._reset_saving = True
+        self._resets += 1
+        self.total_rows = 0
 
     def get_data(self, start: int = None, end: int = None, merge: bool = True) \
             -> tuple[np.ndarray, np.ndarray] | np.ndarray | None:
-        start, end = self._get_data_index(start, end)
-
-        if start >= end:
-            data = (
-                np.concatenate((self.buffer_time[start:], self.buffer_time[:end])),
-                np.concatenate((self.buffer[start:, :], self.buffer[0:end, :]))
-            )
+        """ rows [start, end) counted since the buffer was created (default: all in the ring since the last reset) """
+        if self.ring.buffer is None or self.total_rows == 0:
+            return None
+        if start is None and end is None:
+            spans = self.ring.get_last(self.total_rows)
         else:
-            data = (
-                self.buffer_time[start:end],
-                self.buffer[start:end, :]
-            )
+            spans = self.ring.get_slices(start, end)
 
+        data = (
+            np.concatenate([self.ring.buffer_time[span] for span in spans]),
+            np.concatenate([self.ring.buffer[span] for span in spans])
+        )
         if merge:
             data = np.column_stack(data)
 
@@ -0,0 +1,275 @@
+"""
+Single-producer / single-consumer ring buffer.
+
+The producer only writes `write_count` and the consumer only writes `read_count`; both count rows since the start
+(python ints, so they never wrap) and the ring index is `count % capacity`. Each side reads the other's counter
+without a lock (attribute stores are atomic under the GIL), so rows are never read while they are being written
+unless the full policy is 'drop_oldest'; then the consumer checks what was overwritten with `overwritten()`.
+
+Unread rows are exposed as at most two slices of the ring (two only when they wrap around), so the consumer can
+use them without copying.
+
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Sequence
+
+import numpy as np
+
+logger = logging.getLogger("buffer")
+
+
+class FullPolicy:
+    BLOCK = "block"  # producer waits for the consumer (TimeoutError after `timeout`)
+    DROP_OLDEST = "drop_oldest"  # unread rows are overwritten; counted in `overruns`
+    RAISE = "raise"  # OverflowError; counted in `overruns`
+
+
+class BufferRingSPSC:
+    _DEFAULT_CAPACITY = 1000
+
+    def __init__(self,
+                 capacity: int = None,
+                 full_policy: str = FullPolicy.BLOCK,
+                 timestamps: bool = False,
+                 timeout: float | None = None,
+                 buffer: np.ndarray = None
+                 ):
+        """
+
+        Parameters
+        ----------
+        capacity:
+            number of rows
+        full_policy:
+            what the producer does when all rows are unread; see FullPolicy
+        timestamps:
+            keep a float64 time (s) per row in buffer_time
+        timeout:
+            longest wait (s) for the 'block' policy; None waits forever
+        buffer:
+            ring memory (rows, columns); created from the first row if not given
+        """
+        if full_policy not in (FullPolicy.BLOCK, FullPolicy.DROP_OLDEST, FullPolicy.RAISE):
+            raise ValueError(f"Invalid full_policy: {full_policy}")
+        self.full_policy = full_policy
+        self.timeout = timeout
+        self.timestamps = timestamps
+        self.capacity = capacity if capacity is not None else \
+            (buffer.shape[0] if buffer is not None else self._DEFAULT_CAPACITY)
+        self.buffer: np.ndarray | None = None
+        self.buffer_time: np.ndarray | None = None
+        if buffer is not None:
+            self._set_buffer(buffer)
+
+        self.write_count = 0  # producer only
+        self.read_count = 0  # consumer only
+        self.overruns = 0  # rows lost or refused (producer only)
+        self._dropped_to = 0  # producer only; rows below this were counted in overruns
+        self._space = threading.Event()  # set by the consumer when it frees rows
+
+    def __str__(self):
+        return f"BufferRingSPSC(capacity: {self.capacity}, unread: {self.available}, written: {self.write_count}, " \
+               f"overruns: {self.overruns})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return self.available
+
+    @property
+    def shape(self) -> tuple[int, int] | None:
+        if self.buffer is None:
+            return None
+        return self.buffer.shape
+
+    @property
+    def dtype(self):
+        if self.buffer is None:
+            return None
+        return self.buffer.dtype
+
+    @property
+    def available(self) -> int:
+        """ unread rows (including rows lost with 'drop_oldest' that the consumer has not skipped yet) """
+        return min(self.write_count - self.read_count, self.capacity)
+
+    @property
+    def free(self) -> int:
+        return self.capacity - (self.write_count - self.read_count)
+
+    @property
+    def position(self) -> int:
+        """ ring index of the last row written; -1 if empty """
+        if self.write_count == 0:
+            return -1
+        return (self.write_count - 1) % self.capacity
+
+    def _set_buffer(self, buffer: np.ndarray):
+        if buffer.shape[0] != self.capacity:
+            raise ValueError(f"buffer has {buffer.shape[0]} rows; capacity is {self.capacity}.")
+        self.buffer = buffer
+        if self.timestamps and self.buffer_time is None:
+            self.buffer_time = np.zeros(self.capacity, dtype=np.float64)
+
+    def _create_buffer(self, data: int | float | Sequence[int | float] | np.ndarray):
+        """ from the first row """
+        if isinstance(data, int):
+            buffer = np.zeros((self.capacity, 1), dtype=np.int64)
+        elif isinstance(data, float):
+            buffer = np.zeros((self.capacity, 1), dtype=np.float64)
+        elif isinstance(data, (list, tuple)):
+            buffer = np.zeros((self.capacity, len(data)), dtype=np.asarray(data).dtype)
+        elif isinstance(data, np.ndarray):
+            buffer = np.zeros((self.capacity, data.shape[-1] if data.ndim else 1), dtype=data.dtype)
+        else:
+            raise TypeError(f"Invalid type.\t\nGive: {data}\t\nExpected: int | float | np.ndarray\n")
+        self._set_buffer(buffer)
+
+    # producer
+    def _make_space(self, rows: int):
+        """ called when `rows` more rows do not fit """
+        if self.full_policy == FullPolicy.DROP_OLDEST:
+            floor = self.write_count + rows - self.capacity
+            lost = floor - max(self.read_count, self._dropped_to)
+            if lost > 0:
+                if self.overruns == 0:
+                    logger.warning(f"{self}: consumer fell behind; oldest rows are being overwritten.")
+                self.overruns += lost
+                self._dropped_to = floor
+            return
+
+        if self.full_policy == FullPolicy.RAISE:
+            self.overruns += rows
+            raise OverflowError(f"{self}: consumer is not keeping up. Make the buffer bigger or slow down data "
+                                f"collection.")
+
+        # FullPolicy.BLOCK
+        while self.write_count + rows - self.read_count > self.capacity:
+            self._space.clear()
+            if self.write_count + rows - self.read_count <= self.capacity:
+                break  # consumer freed rows between the check and clear()
+            if not self._space.wait(self.timeout):
+                self.overruns += rows
+                raise TimeoutError(f"{self}: consumer did not free rows within {self.timeout} s.")
+
+    def put(self, data: int | float | Sequence[int | float] | np.ndarray, time_: float = None):
+        """ add one row """
+        if self.buffer is None:
+            self._create_buffer(data)
+        count = self.write_count
+        if count - self.read_count >= self.capacity:
+            self._make_space(1)
+        index = count % self.capacity
+        self.buffer[index] = data
+        if self.buffer_time is not None:
+            self.buffer_time[index] = time_
+        self.write_count = count + 1  # publish after the row is written
+
+    def write(self, data: np.ndarray, time_: np.ndarray = None) -> int:
+        """
+        add a block of rows (rows, columns) with at most two slice assignments; returns number of rows added.
+        Blocks longer than the capacity keep only their last `capacity` rows ('drop_oldest' policy only).
+        """
+        data = np.asarray(data)
+        if data.ndim < 2:
+            data = data.reshape(-1, 1)
+        rows = data.shape[0]
+        if rows == 0:
+            return 0
+        if self.buffer is None:
+            self._create_buffer(data[0])
+        if rows > self.capacity:
+            if self.full_policy != FullPolicy.DROP_OLDEST:
+                raise ValueError(f"Block of {rows} rows is longer than the capacity ({self.capacity}).")
+            self._make_space(rows)
+            self.write_count += rows - self.capacity  # skipped rows were counted as overruns
+            data = data[-self.capacity:]
+            time_ = None if time_ is None else time_[-self.capacity:]
+            rows = self.capacity
+
+        count = self.write_count
+        if count + rows - self.read_count > self.capacity:
+            self._make_space(rows)
+
+        index = count % self.capacity
+        first = min(rows, self.capacity - index)
+        self.buffer[index:index + first] = data[:first]
+        self.buffer[:rows - first] = data[first:]
+        if self.buffer_time is not None:
+            self.buffer_time[index:index + first] = time_[:first]
+            self.buffer_time[:rows - first] = time_[first:]
+        self.write_count = count + rows
+        return rows
+
+    # consumer
+    def spans(self, max_rows: int = None) -> tuple[int, list[slice]]:
+        """
+        unread rows as (first row count, ring slices); at most two slices. Rows already overwritten ('drop_oldest')
+        are skipped. Call advance() when done with them.
+        """
+        end = self.write_count
+        start = max(self.read_count, end - self.capacity)
+        self.read_count = start
+        rows = end - start
+        if max_rows is not None:
+            rows = min(rows, max_rows)
+        if rows == 0:
+            return start, []
+
+        return start, self.get_slices(start, start + rows)
+
+    def views(self, max_rows: int = None) -> tuple[int, list[np.ndarray]]:
+        """ unread rows without copying; see spans() """
+        start, spans = self.spans(max_rows)
+        return start, [self.buffer[span] for span in spans]
+
+    def overwritten(self, start: int) -> int:
+        """ rows from `start` the producer has overwritten since (only with 'drop_oldest') """
+        return max(0, self.write_count - self.capacity - start)
+
+    def advance(self, rows: int):
+        """ mark rows as read; the producer can reuse them """
+        self.read_count += rows
+        self._space.set()
+
+    def read(self, max_rows: int = None) -> np.ndarray | None:
+        """ copy of the unread rows (marked as read) """
+        start, spans = self.spans(max_rows)
+        if not spans:
+            return None
+        if len(spans) == 1:
+            data = self.buffer[spans[0]].copy()
+        else:
+            data = np.concatenate([self.buffer[span] for span in spans])
+        rows = data.shape[0]
+        lost = self.overwritten(start)  # overwritten while copying
+        self.advance(rows)
+        return data[lost:] if lost else data
+
+    def get_slices(self, start: int, end: int) -> list[slice]:
+        """ ring slices of rows [start, end) (row counts, not ring indexes); at most two """
+        rows = end - start
+        if rows <= 0:
+            return []
+        index = start % self.capacity
+        if index + rows <= self.capacity:
+            return [slice(index, index + rows)]
+        return [slice(index, self.capacity), slice(0, index + rows - self.capacity)]
+
+    def get_last(self, rows: int = None) -> list[slice]:
+        """ ring slices of the last `rows` rows written, read or not (default: all still in the ring) """
+        end = self.write_count
+        available = min(end, self.capacity)
+        rows = available if rows is None else min(rows, available)
+        return self.get_slices(end - rows, end)
+
+    def reset(self):
+        """ only when the consumer is idle """
+        self.write_count = 0
+        self.read_count = 0
+        self._dropped_to = 0
+        self._space.set()
@@ -0,0 +1,307 @@
+"""
+One writer thread per process that saves every buffer (BufferRingSavable, BufferRingTimeSavable, PingPongBuffer).
+
+Buffers notify the service when they have rows to save. Notifications are coalesced: the rows of every buffer that
+notified are written (and the files flushed) together once per `config.buffer_flush_interval`, or right away when a
+buffer is filling up (urgent). The thread sleeps while nothing is pending.
+
+Buffers are held weakly: one that is garbage collected is dropped from the service (with the rows it had not handed
+over), so call save_all() before letting go of a buffer that is still filling.
+
+Shutdown is deterministic: close() (also registered with atexit, which runs before daemon threads are stopped) saves
+everything pending, closes the files and joins the thread. BufferSavable.save_all() saves one buffer synchronously.
+
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+import weakref
+from typing import Protocol
+
+from chembot.configuration import config
+
+logger = logging.getLogger("buffer")
+
+_FAILED = object()  # returned by BufferWriterService._call when the call raised
+
+
+class BufferWriterSource(Protocol):
+    """ what a buffer provides to the service (everything is called on the service thread, except properties) """
+    name: str
+
+    @property
+    def pending_rows(self) -> int:
+        """ rows waiting to be saved """
+        ...
+
+    @property
+    def capacity(self) -> int:
+        """ rows the buffer can hold before data is lost or the producer waits (0 if not known yet) """
+        ...
+
+    @property
+    def overruns(self) -> int:
+        ...
+
+    def _save_pending(self) -> int:
+        """ write rows waiting to be saved; returns number of rows written """
+        ...
+
+    def _flush_writer(self, fsync: bool):
+        ...
+
+    def _close_writer(self):
+        ...
+
+    def save_all(self):
+        """ hand over every row (called by the service when it closes) """
+        ...
+
+
+class BufferMetrics:
+    """ backpressure of one buffer """
+    __slots__ = ("notifications", "writes", "rows_written", "write_time", "write_time_max", "pending_rows_max",
+                 "time_last_write", "failures")
+
+    def __init__(self):
+        self.notifications = 0
+        self.writes = 0  # < notifications when coalesced
+        self.rows_written = 0
+        self.write_time = 0.0  # s
+        self.write_time_max = 0.0  # s
+        self.pending_rows_max = 0
+        self.time_last_write: float | None = None
+        self.failures = 0  # saves or flushes that raised (logged)
+
+    def __str__(self):
+        return f"BufferMetrics(writes: {self.writes}, rows: {self.rows_written}, " \
+               f"max pending rows: {self.pending_rows_max}, failures: {self.failures})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def as_dict(self, source: BufferWriterSource) -> dict[str, int | float | None]:
+        pending_rows = source.pending_rows
+        capacity = source.capacity
+        return {
+            "pending_rows": pending_rows,
+            "fill": pending_rows / capacity if capacity else 0.0,  # 1: producer waits or loses data
+            "pending_rows_max": self.pending_rows_max,
+            "overruns": source.overruns,
+            "notifications": self.notifications,
+            "writes": self.writes,
+            "rows_written": self.rows_written,
+            "write_time": self.write_time,
+            "write_time_max": self.write_time_max,
+            "time_last_write": self.time_last_write,
+            "failures": self.failures,
+        }
+
+
+class _DrainRequest:
+    __slots__ = ("key", "done", "ok")
+
+    def __init__(self, key: int | None):
+        self.key = key  # id(source); None: all buffers
+        self.done = threading.Event()  # set after the next write
+        self.ok = True  # False if saving raised
+
+
+class BufferWriterService:
+    def __init__(self, flush_interval: float = None, fsync: bool = None):
+        """
+
+        Parameters
+        ----------
+        flush_interval:
+            seconds between coalesced writes; default config.buffer_flush_interval
+        fsync:
+            fsync files at every flush; default config.buffer_fsync
+        """
+        self.flush_interval = flush_interval if flush_interval is not None else config.buffer_flush_interval
+        self.fsync = fsync if fsync is not None else config.buffer_fsync
+        # key: id(source); weak so buffers that are not used anymore are not kept alive till exit
+        self._sources: weakref.WeakValueDictionary[int, BufferWriterSource] = weakref.WeakValueDictionary()
+        self._metrics: dict[int, BufferMetrics] = {}  # entries of collected sources are removed at register
+        self._owners: dict[int, str | None] = {}  # e.g. equipment name; see get_metrics()
+        self._pending: set[int] = set()  # sources that notified since the last write
+        self._drained: list[_DrainRequest] = []  # answered after the next write
+        self._lock = threading.Lock()
+        self._wake = threading.Event()  # urgent notification, drain request or close
+        self._closing = False
+        self._thread: threading.Thread | None = None
+
+    def __str__(self):
+        return f"BufferWriterService(buffers: {len(self._sources)}, flush_interval: {self.flush_interval} s)"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="buffer_writer_service", daemon=True)
+        self._thread.start()
+
+    # called by buffers (producer threads)
+    def register(self, source: BufferWriterSource, owner: str = None):
+        """ owner: who the data belongs to (e.g. an equipment name); see get_metrics() """
+        with self._lock:
+            for key in self._metrics.keys() - self._sources.keys():
+                del self._metrics[key]
+                del self._owners[key]
+            self._sources[id(source)] = source
+            self._metrics[id(source)] = BufferMetrics()
+            self._owners[id(source)] = owner
+        self.start()
+
+    def unregister(self, source: BufferWriterSource):
+        """ saves what is pending and closes the buffer's file """
+        self.drain(source)
+        with self._lock:
+            self._sources.pop(id(source), None)
+            self._metrics.pop(id(source), None)
+            self._owners.pop(id(source), None)
+            self._pending.discard(id(source))
+        self._call(source._close_writer)
+
+    def notify(self, source: BufferWriterSource, urgent: bool = False):
+        """ source has rows to save; urgent: write now instead of at the next flush interval """
+        with self._lock:
+            self._pending.add(id(source))
+            metrics = self._metrics.get(id(source))
+            if metrics is not None:
+                metrics.notifications += 1
+        if urgent:
+            self._wake.set()
+
+    def drain(self, source: BufferWriterSource | None = None, timeout: float = 5) -> bool:
+        """
+        block till everything pending (of source, or of all buffers) is written; False on time out or if saving raised
+        (see BufferMetrics.failures)
+        """
+        if threading.current_thread() is self._thread or not self.running:
+            failed = self._write(None if source is None else [source])  # e.g. from atexit after close()
+            return not failed if source is None else id(source) not in failed
+        request = _DrainRequest(None if source is None else id(source))
+        with self._lock:
+            if source is not None:
+                self._pending.add(id(source))
+            else:
+                self._pending.update(self._sources)
+            self._drained.append(request)
+        self._wake.set()
+        return request.done.wait(timeout) and request.ok
+
+    def get_metrics(self, owner: str = None) -> dict[str, dict[str, int | float | None]]:
+        """ key: buffer name; only the buffers registered with owner if given """
+        with self._lock:
+            items = [(source, self._metrics[key]) for key, source in self._sources.items()
+                     if owner is None or self._owners[key] == owner]
+        return {source.name: metrics.as_dict(source) for source, metrics in items}
+
+    def close(self, timeout: float = 10):
+        """ write everything pending, close all files and stop the thread """
+        if self.running:
+            self._closing = True
+            self._wake.set()
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.error(f"{self}: writer thread did not stop; buffer data may be lost.")
+        else:
+            self._write_remaining()
+        self._thread = None
+        with self._lock:
+            sources = list(self._sources.values())
+        for source in sources:
+            self._call(source._close_writer)
+
+    # service thread
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._closing:
+                self._write_remaining()
+                return
+            self._write([])
+
+    def _write_remaining(self):
+        """ rows buffers have not handed over yet, then everything pending """
+        with self._lock:
+            sources = list(self._sources.values())
+        for source in sources:
+            self._call(source.save_all)
+        self._write(None)
+
+    def _write(self, sources: list[BufferWriterSource] | None) -> set[int]:
+        """ sources: [] -> the ones that notified, None -> all; returns keys of the sources whose saving raised """
+        with self._lock:
+            keys = set(self._sources) if sources is None else self._pending.union(id(source) for source in sources)
+            self._pending.clear()
+            drained, self._drained = self._drained, []
+            items = [(key, self._sources.get(key), self._metrics.get(key)) for key in keys]
+            items = [item for item in items if item[1] is not None and item[2] is not None]
+
+        failed = set()
+        for key, source, metrics in items:
+            metrics.pending_rows_max = max(metrics.pending_rows_max, source.pending_rows)
+            start = time.perf_counter()
+            rows = self._call(source._save_pending, metrics=metrics)
+            if rows is _FAILED:
+                failed.add(key)
+                continue
+            if not rows:
+                continue
+            if self._call(source._flush_writer, self.fsync, metrics=metrics) is _FAILED:  # one flush per interval
+                failed.add(key)
+            time_ = time.perf_counter() - start
+            metrics.writes += 1
+            metrics.rows_written += rows
+            metrics.write_time += time_
+            metrics.write_time_max = max(metrics.write_time_max, time_)
+            metrics.time_last_write = time.time()
+
+        for request in drained:
+            request.ok = not failed if request.key is None else request.key not in failed
+            request.done.set()
+        return failed
+
+    def _call(self, func, *args, metrics: BufferMetrics = None):
+        """ func(*args); _FAILED if it raised (logged and counted in metrics) """
+        try:
+            return func(*args)
+        except Exception:
+            logger.exception(f"{self}: saving buffer failed ({func.__qualname__}).")
+            if metrics is not None:
+                metrics.failures += 1
+            return _FAILED
+
+
+_service: BufferWriterService | None = None
+_service_lock = threading.Lock()
+
+
+def get_buffer_writer_service() -> BufferWriterService:
+    """ the process-wide service; created on first use and closed at exit """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = BufferWriterService()
+            atexit.register(_service.close)
+        return _service
+
+
+def get_buffer_metrics(owner: str = None) -> dict[str, dict[str, int | float | None]]:
+    """ backpressure metrics of the buffers (of owner if given; empty if no buffer is saving) """
+    if _service is None:
+        return {}
+    return _service.get_metrics(owner)
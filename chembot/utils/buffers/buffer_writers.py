@@ -0,0 +1,238 @@
+"""
+File formats the saving threads of the buffers can write. Every chunk of rows is written with one bulk call.
+
+| name    | file(s)                                | notes                                                  |
+|---------|----------------------------------------|--------------------------------------------------------|
+| csv     | .csv                                   | np.savetxt; human readable, slowest                    |
+| binary  | .bin (raw little-endian rows) + .json  | append only; BinaryWriter.read()                       |
+| npy     | _00000.npy, _00001.npy, ... (chunks)   | NpyChunkWriter.read()                                  |
+| feather | .arrow (Arrow IPC file)                | optional; needs pyarrow                                |
+| hdf5    | .h5 (dataset 'data', resizable)        | optional; needs h5py                                   |
+
+"""
+import abc
+import importlib.util
+import json
+import os
+import pathlib
+
+import numpy as np
+
+
+class BufferWriter(abc.ABC):
+    name: str
+    suffix: str
+    module: str | None = None  # optional dependency
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path.with_suffix(self.suffix)
+        self.rows = 0
+
+    def __str__(self):
+        return f"{type(self).__name__}({self.path.name}, rows: {self.rows})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return cls.module is None or importlib.util.find_spec(cls.module) is not None
+
+    def write(self, data: np.ndarray):
+        """ data: 2D array (rows, columns) """
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        self._write(data)
+        self.rows += data.shape[0]
+
+    @abc.abstractmethod
+    def _write(self, data: np.ndarray):
+        ...
+
+    @abc.abstractmethod
+    def close(self):
+        ...
+
+    def flush(self, fsync: bool = False):
+        """ hand written rows to the OS; fsync: also wait till they are on disk """
+        pass
+
+    @property
+    def files(self) -> list[pathlib.Path]:
+        """ files written """
+        return [self.path]
+
+
+class CSVWriter(BufferWriter):
+    name = "csv"
+    suffix = ".csv"
+
+    def __init__(self, path: pathlib.Path):
+        super().__init__(path)
+        self._file = open(self.path, mode="w", encoding="utf-8")
+
+    def _write(self, data: np.ndarray):
+        fmt = "%d" if data.dtype.kind in "iub" else "%.18g"
+        np.savetxt(self._file, data, fmt=fmt, delimiter=",")
+
+    def close(self):
+        self._file.close()
+
+    def flush(self, fsync: bool = False):
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+
+class BinaryWriter(BufferWriter):
+    """ raw little-endian rows appended to .bin; dtype, columns and rows in the .json sidecar """
+    name = "binary"
+    suffix = ".bin"
+
+    def __init__(self, path: pathlib.Path):
+        super().__init__(path)
+        self._file = open(self.path, mode="wb")
+        self.dtype: np.dtype | None = None
+        self.columns: int | None = None
+
+    @property
+    def path_header(self) -> pathlib.Path:
+        return self.path.with_suffix(".json")
+
+    @property
+    def files(self) -> list[pathlib.Path]:
+        return [self.path, self.path_header]
+
+    def _write(self, data: np.ndarray):
+        if self.dtype is None:
+            self.dtype = data.dtype.newbyteorder("<")
+            self.columns = data.shape[1]
+            self._write_header()
+        np.ascontiguousarray(data, dtype=self.dtype).tofile(self._file)
+
+    def _write_header(self):
+        header = {"dtype": self.dtype.str, "columns": self.columns, "rows": self.rows, "order": "C"}
+        with open(self.path_header, mode="w", encoding="utf-8") as f:
+            json.dump(header, f)
+
+    def close(self):
+        self._file.close()
+        if self.dtype is not None:
+            self._write_header()  # final row count
+
+    def flush(self, fsync: bool = False):
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    @staticmethod
+    def read(path: pathlib.Path) -> np.ndarray:
+        path = pathlib.Path(path)
+        with open(path.with_suffix(".json"), encoding="utf-8") as f:
+            header = json.load(f)
+        # rows from the file size: rows in the header are only updated on close
+        return np.fromfile(path.with_suffix(".bin"), dtype=np.dtype(header["dtype"])).reshape(-1, header["columns"])
+
+
+class NpyChunkWriter(BufferWriter):
+    """ one .npy file per chunk: <stem>_00000.npy, <stem>_00001.npy, ... """
+    name = "npy"
+    suffix = ".npy"
+
+    def __init__(self, path: pathlib.Path):
+        super().__init__(path)
+        self._files: list[pathlib.Path] = []
+
+    @property
+    def files(self) -> list[pathlib.Path]:
+        return self._files
+
+    def _write(self, data: np.ndarray):
+        path = self.path.with_stem(f"{self.path.stem}_{len(self._files):05d}")
+        np.save(path, data)
+        self._files.append(path)
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def read(path: pathlib.Path) -> np.ndarray:
+        path = pathlib.Path(path)
+        files = sorted(path.parent.glob(path.stem + "_[0-9][0-9][0-9][0-9][0-9].npy"))
+        return np.concatenate([np.load(file) for file in files])
+
+
+class FeatherWriter(BufferWriter):
+    """ Arrow IPC (feather v2) file; one record batch per chunk; columns 'c0', 'c1', ... """
+    name = "feather"
+    suffix = ".arrow"
+    module = "pyarrow"
+
+    def __init__(self, path: pathlib.Path):
+        super().__init__(path)
+        import pyarrow
+        self._pyarrow = pyarrow
+        self._writer = None
+
+    def _write(self, data: np.ndarray):
+        pa = self._pyarrow
+        batch = pa.record_batch([pa.array(data[:, i]) for i in range(data.shape[1])],
+                                names=[f"c{i}" for i in range(data.shape[1])])
+        if self._writer is None:
+            self._writer = pa.ipc.new_file(str(self.path), batch.schema)
+        self._writer.write_batch(batch)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class HDF5Writer(BufferWriter):
+    """ dataset 'data' (rows, columns) grown per chunk """
+    name = "hdf5"
+    suffix = ".h5"
+    module = "h5py"
+
+    def __init__(self, path: pathlib.Path):
+        super().__init__(path)
+        import h5py
+        self._file = h5py.File(self.path, mode="w")
+        self._dataset = None
+
+    def _write(self, data: np.ndarray):
+        if self._dataset is None:
+            self._dataset = self._file.create_dataset("data", shape=(0, data.shape[1]), maxshape=(None, data.shape[1]),
+                                                      dtype=data.dtype, chunks=True)
+        self._dataset.resize(self.rows + data.shape[0], axis=0)
+        self._dataset[self.rows:] = data
+
+    def close(self):
+        self._file.close()
+
+    def flush(self, fsync: bool = False):
+        self._file.flush()
+
+
+buffer_writers: dict[str, type[BufferWriter]] = {
+    writer.name: writer for writer in (CSVWriter, BinaryWriter, NpyChunkWriter, FeatherWriter, HDF5Writer)
+}
+
+
+def get_buffer_writer(writer: str | type[BufferWriter]) -> type[BufferWriter]:
+    if isinstance(writer, str):
+        if writer not in buffer_writers:
+            raise ValueError(f"Unknown buffer writer: {writer}. Options: {list(buffer_writers)}")
+        writer = buffer_writers[writer]
+    if not writer.is_available():
+        raise ImportError(f"'{writer.module}' needs to be installed for the {writer.name} buffer writer.")
+    return writer
+
+
+def available_buffer_writers() -> list[str]:
+    return [name for name, writer in buffer_writers.items() if writer.is_available()]
@@ -13,6 +13,9 @@ class Buffer(Protocol):
     def add_data(self, data: int | float | np.ndarray):
         ...
 
+    def add_block(self, data: np.ndarray, timestamps: np.ndarray | None = None):
+        ...
+
 
 class BufferSavable(Buffer):
     save_data: bool
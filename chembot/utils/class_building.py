@@ -1,3 +1,5 @@
+import inspect
+
 
 def get_actions_list(class_) -> list[str]:
     actions = []
@@ -6,3 +8,15 @@ def get_actions_list(class_) -> list[str]:
             actions.append(func)
 
     return actions
+
+
+def long_running(func):
+    """ decorator: mark a write_* action as long-running (executed on the equipment's worker pool) """
+    if inspect.iscoroutinefunction(func):
+        raise TypeError(f"'{func.__name__}' is a coroutine; it doesn't block the event loop, so can't be long-running.")
+    func.long_running = True
+    return func
+
+
+def is_long_running(func) -> bool:
+    return getattr(func, "long_running", False)
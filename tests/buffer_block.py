@@ -0,0 +1,117 @@
+"""
+Ring buffers: add_block() stores the same rows as add_data() row by row (wraparound, blocks longer than the ring,
+saves at save boundaries), and rows per second for single vs. block insert.
+"""
+import atexit
+import pathlib
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from chembot.utils.buffers.buffer_ring import BufferRing, BufferRingTime, BufferRingSavable, BufferRingTimeSavable
+from chembot.utils.buffers.buffer_writers import BinaryWriter
+
+
+def check_same():
+    data = np.arange(2500 * 2).reshape(-1, 2)
+    for block in (1, 7, 333, 1000, 1700):
+        single = BufferRing(length=1000)
+        blocked = BufferRing(length=1000)
+        for i in range(0, data.shape[0], block):
+            for row in data[i:i + block]:
+                single.add_data(row)
+            blocked.add_block(data[i:i + block])
+            assert single.position == blocked.position and single.total_rows == blocked.total_rows
+        assert np.array_equal(single.get_data(), blocked.get_data())
+
+    buffer = BufferRingTime(length=10)
+    buffer.add_block(np.arange(14), timestamps=np.arange(14) + 0.5)
+    assert np.array_equal(buffer.get_data(), np.column_stack((np.arange(4, 14) + 0.5, np.arange(4, 14))))
+
+
+def check_saving(folder: pathlib.Path):
+    data = np.arange(3000 * 2).reshape(-1, 2)
+    buffer = BufferRingSavable(folder / "savable", length=1000, number_of_rows_per_save=100, writer="binary")
+    for i in range(0, data.shape[0], 37):
+        buffer.add_block(data[i:i + 37])
+        time.sleep(0.001)
+    buffer.save_all()
+
+    buffer = BufferRingTimeSavable(folder / "time_savable", length=1000, number_of_rows_per_save=100,
+                                   writer="binary")
+    for i in range(0, data.shape[0], 37):
+        buffer.add_block(data[i:i + 37])
+        time.sleep(0.001)
+    buffer.save_all()
+
+    for name in ("savable", "time_savable"):
+        saved = np.concatenate([BinaryWriter.read(file) for file in sorted(folder.glob(f"{name}_0_*.bin"))])
+        assert np.array_equal(saved[:, -2:], data), name
+
+    # a block filling the whole ring, then one wrapping past the last save
+    data = np.arange(1200).reshape(-1, 1)
+    buffer = BufferRingSavable(folder / "full_ring", length=1000, writer="binary")
+    buffer.add_block(data[:1000])
+    buffer._service.drain(buffer)
+    buffer.add_block(data[1000:])
+    buffer.save_all()
+    saved = np.concatenate([BinaryWriter.read(file) for file in sorted(folder.glob("full_ring_0_*.bin"))])
+    assert np.array_equal(saved, data)
+
+    # a block overwriting rows not saved yet
+    buffer = BufferRingSavable(folder / "overflow", length=1000, number_of_rows_per_save=900, writer="binary")
+    buffer.add_block(data[:600])  # not queued yet
+    for block in (data[:1001], data[600:1001]):
+        try:
+            buffer.add_block(block)
+        except OverflowError:
+            pass
+        else:
+            raise AssertionError("block overwriting unsaved rows did not raise")
+    assert buffer.total_rows == 600
+
+
+def benchmark(folder: pathlib.Path, rows: int = 200_000, block: int = 100):
+    data = np.random.default_rng(0).random((rows, 3))
+    buffers = {
+        "BufferRing": lambda: BufferRing(length=10_000),
+        "BufferRingTime": lambda: BufferRingTime(length=10_000),
+        # 'block': add_block() outpaces the writer service, so this measures inserting + saving
+        "BufferRingTimeSavable": lambda: BufferRingTimeSavable(folder / "benchmark", length=50_000,
+                                                               number_of_rows_per_save=5_000, writer="binary",
+                                                               full_policy="block"),
+    }
+    print(f"{rows} rows x 3 columns, blocks of {block} rows")
+    for name, make in buffers.items():
+        buffer = make()
+        start = time.perf_counter()
+        for row in data:
+            buffer.add_data(row)
+        time_single = time.perf_counter() - start
+        if hasattr(buffer, "save_all"):
+            buffer.save_all()
+
+        buffer = make()
+        start = time.perf_counter()
+        for i in range(0, rows, block):
+            buffer.add_block(data[i:i + block])
+        time_block = time.perf_counter() - start
+        if hasattr(buffer, "save_all"):
+            buffer.save_all()
+        print(f"\t{name:22}: add_data {rows / time_single:12,.0f} rows/s | add_block {rows / time_block:14,.0f} "
+              f"rows/s ({time_single / time_block:5.0f}x)")
+
+
+def main():
+    folder = pathlib.Path(tempfile.mkdtemp())
+    atexit.register(shutil.rmtree, folder)  # the buffer writer service closes its files at exit
+    check_same()
+    check_saving(folder)
+    print("checks: ok")
+    benchmark(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Memory-mapped ring buffer: a writer process is killed mid-stream and every row below the saved cursor is intact and
+the file can be continued; another process tails the file live without copying; a reader racing the writer on a small
+(always full) ring never takes a row that was being overwritten as valid; rows torn by a crash stay excluded.
+"""
+import multiprocessing
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+
+from chembot.utils.buffers.buffer_mmap import BufferRingMemmap, BufferRingMemmapReader
+
+
+def write_forever(path: pathlib.Path, block: int, length: int = 10_000, pause: float = 0.001):
+    buffer = BufferRingMemmap(path, length=length, columns=2, dtype=np.int64)
+    i = 0
+    while True:
+        rows = np.arange(i, i + block)
+        buffer.add_block(np.column_stack((rows, 2 * rows)))
+        i += block
+        time.sleep(pause)
+
+
+def check_crash(path: pathlib.Path):
+    process = multiprocessing.Process(target=write_forever, args=(path, 37))
+    process.start()
+    try:
+        time.sleep(0.5)
+        reader = BufferRingMemmapReader(path)
+        count = 0
+        rows_tailed = 0
+        time_end = time.time() + 0.5
+        while time.time() < time_end:  # tail while it is being written
+            start, views = reader.views(count)
+            if not views:
+                continue
+            data = np.concatenate(views)
+            data = data[reader.overwritten(start):]  # the writer may lap the reader
+            assert np.array_equal(data[:, 1], 2 * data[:, 0])
+            rows_tailed += data.shape[0]
+            count = start + sum(view.shape[0] for view in views)
+        print(f"tailed {rows_tailed} rows live")
+    finally:
+        process.kill()  # crash
+        process.join()
+
+    buffer = BufferRingMemmap.recover(path)
+    write_count = buffer.write_count
+    data = buffer.get_data(merge=False)[1]
+    assert np.array_equal(data[:, 0], np.arange(write_count - buffer.capacity, write_count))
+    assert np.array_equal(data[:, 1], 2 * data[:, 0])
+    buffer.add_data(np.array([write_count, 2 * write_count]))
+    assert buffer.last_measurement[0] == write_count and buffer.write_count == write_count + 1
+    print(f"recovered {buffer} after kill")
+
+
+def check_race(path: pathlib.Path):
+    """ the writer laps the reader all the time; every row kept after overwritten() is the row that was asked for """
+    process = multiprocessing.Process(target=write_forever, args=(path, 1000, 2048, 0))
+    process.start()
+    try:
+        time.sleep(0.5)
+        reader = BufferRingMemmapReader(path)
+        rows_read = 0
+        rows_lost = 0
+        time_end = time.time() + 1
+        while time.time() < time_end:
+            start, views = reader.views(0)  # the whole ring; the oldest rows are the next ones overwritten
+            if not views:
+                continue
+            data = np.concatenate(views)  # copy
+            lost = reader.overwritten(start)
+            data = data[lost:]
+            assert np.array_equal(data[:, 0], np.arange(start + lost, start + lost + data.shape[0]))
+            assert np.array_equal(data[:, 1], 2 * data[:, 0])
+            rows_read += data.shape[0]
+            rows_lost += lost
+        print(f"race: {rows_read} rows read consistent | {rows_lost} rows dropped as overwritten")
+    finally:
+        process.kill()
+        process.join()
+
+
+def check_torn(path: pathlib.Path):
+    """ crash between publishing write_start and write_count """
+    buffer = BufferRingMemmap(path, length=10, columns=1, dtype=np.int64)
+    buffer.add_block(np.arange(25))
+    buffer._begin(buffer.write_count + 4)
+    buffer.buffer[5:9] = -1  # partly written rows 25..28 (over rows 15..18), then crash
+    del buffer
+
+    buffer = BufferRingMemmap.recover(path)
+    assert buffer.write_count == 25 and buffer.overwritten(15) == 4
+    assert np.array_equal(buffer.get_data(merge=False)[1][:, 0], np.arange(19, 25))
+    buffer.add_block(np.arange(25, 27))  # continues at write_count; rows torn before stay excluded
+    assert np.array_equal(buffer.get_data(merge=False)[1][:, 0], np.arange(19, 27))
+    assert np.array_equal(np.concatenate(BufferRingMemmapReader(path).views(0)[1])[:, 0], np.arange(19, 27))
+    print("rows torn by a crash excluded after recover")
+
+
+def benchmark(path: pathlib.Path, rows: int = 1_000_000, block: int = 1000):
+    buffer = BufferRingMemmap(path, length=100_000, columns=3)
+    data = np.random.default_rng(0).random((block, 3))
+    start = time.perf_counter()
+    for _ in range(rows // block):
+        buffer.add_block(data)
+    time_ = time.perf_counter() - start
+    print(f"add_block: {rows / time_:14,.0f} rows/s (blocks of {block}, in the page cache)")
+
+    reader = BufferRingMemmapReader(path)
+    start = time.perf_counter()
+    for _ in range(1000):
+        reader.views(buffer.write_count - 10_000)
+    print(f"reader views() of 10k rows: {(time.perf_counter() - start) * 1000:.3f} us")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        check_crash(pathlib.Path(folder) / "crash")
+        check_race(pathlib.Path(folder) / "race")
+        check_torn(pathlib.Path(folder) / "torn")
+        benchmark(pathlib.Path(folder) / "benchmark")
+    print("checks: ok")
+
+
+if __name__ == "__main__":
+    main()
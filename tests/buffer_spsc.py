@@ -0,0 +1,116 @@
+"""
+SPSC ring buffer: with a producer and a consumer thread every row arrives once and in order ('block'), lost rows are
+counted ('drop_oldest') and a full ring raises ('raise'). Also the buffers built on it, with and without saving.
+"""
+import atexit
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from chembot.utils.buffers.buffer_spsc import BufferRingSPSC, FullPolicy
+from chembot.utils.buffers.buffer_ping_pong import PingPongBuffer
+from chembot.utils.buffers.buffer_ring import BufferRingTimeSavable
+from chembot.utils.buffers.buffer_writers import BinaryWriter
+
+
+def consume(ring: BufferRingSPSC, received: list, done: threading.Event):
+    while True:
+        finished = done.is_set()
+        start, spans = ring.spans()
+        assert len(spans) <= 2
+        if spans:
+            data = np.concatenate([ring.buffer[span, 0] for span in spans])
+            lost = ring.overwritten(start)
+            ring.advance(data.shape[0])
+            received.append(data[lost:])
+        elif finished:
+            return
+        else:
+            time.sleep(0.0001)
+
+
+def run(policy: str, rows: int = 200_000, capacity: int = 1000, block: int = 7) -> tuple[np.ndarray, float]:
+    ring = BufferRingSPSC(capacity, policy, timeout=5)
+    received = []
+    done = threading.Event()
+    consumer = threading.Thread(target=consume, args=(ring, received, done))
+    consumer.start()
+    start = time.perf_counter()
+    data = np.arange(rows, dtype=np.int64).reshape(-1, 1)
+    for i in range(0, rows, block):
+        ring.write(data[i:i + block])
+    time_ = time.perf_counter() - start
+    done.set()
+    consumer.join()
+    return ring, np.concatenate(received), time_
+
+
+def check_policies():
+    ring, received, time_ = run(FullPolicy.BLOCK)
+    assert np.array_equal(received, np.arange(200_000)) and ring.overruns == 0
+    print(f"block      : {200_000 / time_:12,.0f} rows/s | all rows once, in order")
+
+    ring, received, time_ = run(FullPolicy.DROP_OLDEST)
+    assert np.all(np.diff(received) > 0)  # in order, no repeats
+    assert received.shape[0] + ring.overruns >= 200_000
+    print(f"drop_oldest: {200_000 / time_:12,.0f} rows/s | received {received.shape[0]}, overruns {ring.overruns}")
+
+    ring = BufferRingSPSC(10, FullPolicy.RAISE)
+    ring.write(np.arange(8))
+    try:
+        ring.write(np.arange(3))
+    except OverflowError:
+        assert ring.overruns == 3
+    else:
+        raise AssertionError("full ring did not raise")
+    start, views = ring.views()
+    assert [view.shape[0] for view in views] == [8]
+    ring.advance(5)
+    ring.write(np.arange(6))  # wraps around
+    start, views = ring.views()
+    assert start == 5 and [view.shape[0] for view in views] == [5, 4]
+
+
+def check_buffers(folder: pathlib.Path):
+    with PingPongBuffer(folder / "ping_pong", capacity=100, writer="binary") as buffer:
+        for i in range(1050):
+            buffer.add_data((i, 1.2))
+    time.sleep(0.5)
+    assert buffer.ring.read_count == 1050
+
+    buffer = BufferRingTimeSavable(folder / "ring_time", length=100, number_of_rows_per_save=20, writer="binary")
+    for i in range(500):
+        buffer.add_data(np.array([i, 2 * i]))
+        if i % 20 == 0:
+            time.sleep(0.01)
+    assert np.array_equal(buffer.get_data()[:, 1], np.arange(400, 500))
+    buffer.save_all()
+    data = BinaryWriter.read(next(folder.glob("ring_time_0_*.bin")))
+    assert np.array_equal(data[:, 1], np.arange(500)) and buffer.overruns == 0
+
+    # not saving: nothing consumes the ring, it keeps the last rows
+    buffer = BufferRingTimeSavable(folder / "not_saving", length=100, writer="binary")
+    buffer.saving = False
+    for i in range(250):
+        buffer.add_data(np.array([i]))
+    buffer.add_block(np.arange(250, 400).reshape(-1, 1))
+    buffer.add_block(np.arange(400, 420).reshape(-1, 1))
+    assert np.array_equal(buffer.get_data()[:, 1], np.arange(320, 420)) and buffer.overruns == 0
+    buffer.save_all()
+    assert not list(folder.glob("not_saving_*"))
+
+
+def main():
+    check_policies()
+    folder = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, folder)  # the buffer writer service closes its files at exit
+    check_buffers(pathlib.Path(folder))
+    print("checks: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Buffer writer service: many buffers are saved by one thread, notifications are coalesced into fewer writes, metrics
+are reported per buffer (failed saves included), buffers that are let go are not kept alive by the service, and a
+process that exits without calling save_all() still has every row on disk.
+"""
+import gc
+import logging
+import pathlib
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from chembot.utils.buffers.buffer_ring import BufferRingTimeSavable
+from chembot.utils.buffers.buffer_ping_pong import PingPongBuffer
+from chembot.utils.buffers.buffer_writer_service import get_buffer_writer_service, get_buffer_metrics
+from chembot.utils.buffers.buffer_writers import BinaryWriter
+
+EXIT_SCRIPT = """
+import pathlib, sys
+import numpy as np
+from chembot.utils.buffers.buffer_ring import BufferRingTimeSavable
+buffer = BufferRingTimeSavable(pathlib.Path(sys.argv[1]) / "exit", length=10_000, number_of_rows_per_save=100,
+                               writer="binary")
+buffer.add_block(np.arange(2345).reshape(-1, 1))
+# no save_all(): the service drains at exit
+"""
+
+
+def check_many(folder: pathlib.Path, buffers: int = 50, rows: int = 2000):
+    threads = threading.active_count()
+    service = get_buffer_writer_service()
+    service.flush_interval = 0.2
+    ring_buffers = [BufferRingTimeSavable(folder / f"sensor_{i}", length=5000, number_of_rows_per_save=50,
+                                          writer="binary", owner="sensors") for i in range(buffers)]
+    assert threading.active_count() <= threads + 1  # one writer thread for all buffers
+
+    for j in range(0, rows, 10):
+        for buffer in ring_buffers:
+            buffer.add_block(np.arange(j, j + 10).reshape(-1, 1))
+        time.sleep(0.001)
+
+    metrics = get_buffer_metrics("sensors")
+    assert len(metrics) == buffers
+    notifications = sum(m["notifications"] for m in metrics.values())
+    writes = sum(m["writes"] for m in metrics.values())
+    print(f"{buffers} buffers, 1 writer thread | notifications: {notifications} -> writes: {writes}")
+    assert writes < notifications  # coalesced
+
+    for buffer in ring_buffers:
+        buffer.save_all()
+    for i in range(buffers):
+        data = BinaryWriter.read(next(folder.glob(f"sensor_{i}_0_*.bin")))
+        assert np.array_equal(data[:, 1], np.arange(rows))
+    print(f"\tsensor_0: {get_buffer_metrics('sensors')['sensor_0']}")
+
+    with PingPongBuffer(folder / "ping_pong", capacity=100, writer="binary") as buffer:
+        for i in range(1050):
+            buffer.add_data((i, 1.2))
+    assert buffer.ring.read_count == 1050  # save_all() is synchronous
+    data = BinaryWriter.read(folder / "ping_pong_0.bin")  # closed by save_all()
+    assert np.array_equal(data[:, 0], np.arange(1050))
+
+    with PingPongBuffer(folder / "rotate", capacity=100, writer="binary") as buffer:
+        buffer.saver._FILE_SIZE_LIMIT = 250
+        for i in range(1050):
+            buffer.add_data((i, 1.2))
+    files = sorted(folder.glob("rotate_*.bin"), key=lambda path_: int(path_.stem.split("_")[1]))
+    assert len(files) > 1
+    data = np.concatenate([BinaryWriter.read(file) for file in files])
+    assert np.array_equal(data[:, 0], np.arange(1050))
+    print(f"ping pong: 1050 rows in {len(files)} files")
+
+
+def check_owner(folder: pathlib.Path):
+    bath = BufferRingTimeSavable(folder / "bath_temp", length=100, writer="binary", owner="bath")
+    bath2 = PingPongBuffer(folder / "bath2_temp", capacity=100, writer="binary", owner="bath2")
+    assert list(get_buffer_metrics("bath")) == ["bath_temp"]  # not bath2's buffers
+    assert list(get_buffer_metrics("bath2")) == ["bath2_temp"]
+    bath.save_all()
+    bath2.save_all()
+
+
+class FailingWriter(BinaryWriter):
+    def _write(self, data: np.ndarray):
+        raise OSError("disk full")
+
+
+def check_failure(folder: pathlib.Path):
+    buffer = PingPongBuffer(folder / "failing", capacity=100, writer=FailingWriter, owner="failing")
+    for i in range(50):
+        buffer.add_data((i, 1.2))
+    logging.disable(logging.CRITICAL)  # the failure is logged with a traceback
+    try:
+        assert not get_buffer_writer_service().drain(buffer.saver)  # not "nothing to write"
+    finally:
+        logging.disable(logging.NOTSET)
+    assert get_buffer_metrics("failing")["failing"]["failures"] >= 1
+    del buffer  # not retried at exit
+    gc.collect()
+    assert get_buffer_writer_service().drain()
+    print("failed save: counted, drain() returns False")
+
+
+def check_release(folder: pathlib.Path):
+    buffer = BufferRingTimeSavable(folder / "released", length=100, number_of_rows_per_save=20, writer="binary")
+    buffer.add_block(np.arange(50).reshape(-1, 1))
+    buffer.save_all()
+    assert "released" in get_buffer_metrics()
+    del buffer
+    gc.collect()
+    assert "released" not in get_buffer_metrics()
+    print("released buffer: not kept by the service")
+
+
+def check_exit(folder: pathlib.Path):
+    subprocess.run([sys.executable, "-c", EXIT_SCRIPT, str(folder)], check=True, timeout=60)
+    data = BinaryWriter.read(next(folder.glob("exit_0_*.bin")))
+    assert np.array_equal(data[:, 1], np.arange(2345))
+    print("exit without save_all(): all rows saved")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        check_many(pathlib.Path(folder))
+        check_release(pathlib.Path(folder))
+        check_owner(pathlib.Path(folder))
+        check_failure(pathlib.Path(folder))
+        check_exit(pathlib.Path(folder))
+        get_buffer_writer_service().close()  # before the folder is deleted
+    print("checks: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Buffer writers: data read back matches what was written, and rows per second per backend.
+"""
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+
+from chembot.utils.buffers.buffer_writers import buffer_writers, available_buffer_writers, BinaryWriter, \
+    NpyChunkWriter
+
+
+def check(folder: pathlib.Path):
+    data = np.random.default_rng(0).random((1000, 3))
+    with BinaryWriter(folder / "check") as writer:
+        writer.write(data[:600])
+        writer.write(data[600:])
+    assert np.array_equal(BinaryWriter.read(folder / "check.bin"), data)
+
+    with NpyChunkWriter(folder / "check") as writer:
+        writer.write(data[:600])
+        writer.write(data[600:])
+    assert np.array_equal(NpyChunkWriter.read(folder / "check.npy"), data)
+
+    with buffer_writers["csv"](folder / "check") as writer:
+        writer.write(data)
+    assert np.allclose(np.loadtxt(folder / "check.csv", delimiter=","), data)
+
+
+def benchmark(folder: pathlib.Path, rows: int = 200_000, chunk: int = 10_000, columns: int = 3):
+    data = np.random.default_rng(0).random((rows, columns))
+    print(f"{rows} rows x {columns} columns (float64), {chunk} rows per write")
+    for name, writer_type in buffer_writers.items():
+        if name not in available_buffer_writers():
+            print(f"\t{name:8}: not installed ({writer_type.module})")
+            continue
+        start = time.perf_counter()
+        with writer_type(folder / f"benchmark_{name}") as writer:
+            for i in range(0, rows, chunk):
+                writer.write(data[i:i + chunk])
+        time_ = time.perf_counter() - start
+        size = sum(file.stat().st_size for file in writer.files)
+        print(f"\t{name:8}: {rows / time_:12,.0f} rows/s | {size / 1e6:6.2f} MB")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        check(pathlib.Path(folder))
+        print("checks: ok")
+        benchmark(pathlib.Path(folder))
+
+
+if __name__ == "__main__":
+    main()
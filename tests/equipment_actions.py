@@ -0,0 +1,197 @@
+"""
+Long-running equipment actions: they run on the worker pool while the equipment keeps processing messages, their
+replies are sent when they finish, and write_stop cancels only the actions submitted before it (each action has its
+own cancel flag). NMR.write_measure is cancelled while it waits, and the ATIR DDE conversation is only used from the
+worker thread that created it.
+"""
+import threading
+import time
+
+import numpy as np
+from unitpy import Quantity
+
+from chembot.equipment.equipment import Equipment
+from chembot.equipment.sensors.infrared_spetrometer import atir
+from chembot.equipment.sensors.nmr import nmr
+from chembot.rabbitmq.messages import RabbitMessageAction, RabbitMessageReply, RabbitMessageError
+from chembot.utils.class_building import long_running
+
+
+class FakeRabbit:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message, check: bool = True):
+        self.sent.append(message)
+
+
+class SlowEquipment(Equipment):
+    max_workers = 2
+
+    def _create_rabbit_connection(self):
+        return FakeRabbit()
+
+    def _activate(self):
+        pass
+
+    def _deactivate(self):
+        pass
+
+    def _stop(self):
+        pass
+
+    @long_running
+    def write_wait(self, seconds: float = 0.2) -> float:
+        if self.wait_cancelled(seconds):
+            return -1
+        return seconds
+
+    @long_running
+    def write_spin(self) -> int:
+        loops = 0
+        while not self.action_cancelled:
+            loops += 1
+            time.sleep(0.001)
+        return loops
+
+    def read_value(self) -> int:
+        return 1
+
+
+def action(name: str, **kwargs) -> RabbitMessageAction:
+    return RabbitMessageAction("slow", "test", name, kwargs=kwargs or None)
+
+
+def run_until(equipment: SlowEquipment, timeout: float = 2):
+    """ the part of the equipment loop that sends replies of finished actions """
+    time_end = time.monotonic() + timeout
+    while equipment.action_queue_depth and time.monotonic() < time_end:
+        equipment._check_running_actions()
+        time.sleep(0.005)
+
+
+def replies(equipment: SlowEquipment) -> list:
+    return [message.value for message in equipment.rabbit.sent if isinstance(message, RabbitMessageReply)]
+
+
+def check_pool():
+    equipment = SlowEquipment("slow")
+    start = time.perf_counter()
+    equipment._process_action(action("write_wait", seconds=0.2))
+    equipment._process_action(action("write_wait", seconds=0.2))
+    equipment._process_action(action("read_value"))  # not blocked by the running actions
+    assert replies(equipment) == [1] and equipment.action_queue_depth == 2
+    run_until(equipment)
+    assert replies(equipment) == [1, 0.2, 0.2]
+    assert time.perf_counter() - start < 0.35  # two workers
+    assert equipment.action_execution_time["write_wait"] >= 0.2
+
+    for _ in range(equipment.max_queued_actions + 1):
+        equipment._process_action(action("write_wait", seconds=0.05))
+    assert isinstance(equipment.rabbit.sent[-1], RabbitMessageError)  # queue full
+    run_until(equipment)
+    equipment._executor.shutdown()
+
+
+def check_cancel():
+    equipment = SlowEquipment("slow")
+    equipment._process_action(action("write_spin"))
+    equipment._process_action(action("write_wait", seconds=10))
+    time.sleep(0.05)
+    running = list(equipment._running_actions)
+    start = time.perf_counter()
+    equipment.write_stop()
+    assert all(action_.cancelled for action_ in running)
+
+    # submitted after write_stop: not cancelled
+    equipment._process_action(action("write_wait", seconds=0.05))
+    run_until(equipment)
+    assert time.perf_counter() - start < 1  # cancelled actions returned early
+    assert running[0].future.result() > 0 and running[1].future.result() == -1
+    assert replies(equipment) == [0.05]  # replies of cancelled actions are not sent
+    assert not equipment.action_cancelled  # outside a long-running action
+    equipment._executor.shutdown()
+
+
+class FakeNMRComm:
+    def __init__(self, ip_address: str, port: int):
+        pass
+
+
+class FakeNMR(nmr.NMR):
+    def _create_rabbit_connection(self):
+        return FakeRabbit()
+
+    def _read_total_flow_rate(self) -> Quantity:
+        return Quantity("0.5 ml/min")
+
+    def _stop(self):
+        pass
+
+
+def check_nmr():
+    nmr.NMRComm = FakeNMRComm
+    equipment = FakeNMR("nmr", "localhost", 13000)
+    message = RabbitMessageAction("nmr", "test", "write_measure")
+    equipment._process_action(message)
+    assert str(message.kwargs["flow_rate"]) == str(Quantity("0.5 ml/min"))  # read on the equipment loop
+    assert equipment.action_queue_depth == 1  # runs on the worker pool
+
+    time.sleep(0.05)
+    start = time.perf_counter()
+    equipment.write_stop()
+    run_until(equipment)
+    assert time.perf_counter() - start < 0.5 and equipment.action_queue_depth == 0
+    assert [m.kwargs["position"] for m in equipment.rabbit.sent] == ["NMR"] and not replies(equipment)
+    equipment._executor.shutdown()
+
+
+class FakeATIRRunner:
+    def __init__(self):
+        self.threads = {threading.get_ident()}
+
+    def measure_sample(self, *args) -> str:
+        self.threads.add(threading.get_ident())
+        return "file"
+
+    def get_results(self, result_file: str):
+        self.threads.add(threading.get_ident())
+        return np.ones((3, 2))
+
+    def run_background_scans(self, *args):
+        self.threads.add(threading.get_ident())
+
+
+class FakeATIR(atir.ATIR):
+    def _create_rabbit_connection(self):
+        return FakeRabbit()
+
+
+def check_atir():
+    atir.ATIRRunner = FakeATIRRunner
+    equipment = FakeATIR("atir")
+    equipment._activate()
+    equipment._process_action(action("write_background"))
+    equipment._process_action(action("write_measure"))
+    run_until(equipment)
+    assert len(equipment._runner.threads) == 1 and threading.get_ident() not in equipment._runner.threads
+    assert len(replies(equipment)) == 1
+    try:
+        equipment._get_runner()  # not the worker thread
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("DDE conversation used from another thread")
+    equipment._executor.shutdown()
+
+
+def main():
+    check_pool()
+    check_cancel()
+    check_nmr()
+    check_atir()
+    print("checks: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+AsyncEquipment round trip on an in-memory broker (no RabbitMQ server): the equipment registers, replies to normal,
+coroutine and long-running actions and unregisters; a long-running action doesn't block the event loop, and a message
+sent with check=True to a queue that does not exist raises.
+"""
+import asyncio
+import time
+
+from chembot.equipment.equipment_async import AsyncEquipment
+from chembot.rabbitmq.messages import RabbitMessageAction, RabbitMessageRegister, RabbitMessageReply, \
+    RabbitMessageUnRegister
+from chembot.rabbitmq.rabbit_async import AsyncRabbitMQ, AsyncRabbitMQConnection
+from chembot.utils.class_building import long_running
+
+
+class FakeBroker:
+    def __init__(self):
+        self.queues: set[str] = set()
+        self.bindings: dict[str, str] = {}  # key: routing key, value: queue
+        self.consumers: dict[str, callable] = {}  # key: queue
+        self.return_callbacks = []
+
+
+class FakeChannel:
+    """ the part of a pika channel AsyncRabbitMQConnection uses; deliveries are scheduled on the loop like pika's """
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self.is_open = True
+        self._close_callbacks = []
+
+    def queue_declare(self, queue: str, callback, auto_delete: bool = False, passive: bool = False):
+        if passive and queue not in self.broker.queues:
+            self.is_open = False
+            for callback_ in self._close_callbacks:
+                callback_(self, "NOT_FOUND")
+            return
+        self.broker.queues.add(queue)
+        callback(None)
+
+    def queue_purge(self, queue: str, callback):
+        callback(None)
+
+    def queue_bind(self, queue: str, exchange: str, routing_key: str, callback):
+        self.broker.bindings[routing_key] = queue
+        callback(None)
+
+    def basic_consume(self, queue: str, on_message_callback, auto_ack: bool, consumer_tag: str, callback):
+        self.broker.consumers[queue] = on_message_callback
+        callback(None)
+
+    def basic_cancel(self, consumer_tag: str, callback):
+        self.broker.consumers.pop(consumer_tag, None)
+        self.broker.queues.discard(consumer_tag)
+        callback(None)
+
+    def add_on_return_callback(self, callback):
+        self.broker.return_callbacks.append(callback)
+
+    def add_on_close_callback(self, callback):
+        self._close_callbacks.append(callback)
+
+    def close(self):
+        self.is_open = False
+
+    def basic_publish(self, exchange: str, routing_key: str, body: bytes, properties, mandatory: bool = False):
+        loop = asyncio.get_running_loop()
+        consumer = self.broker.consumers.get(self.broker.bindings.get(routing_key))
+        if consumer is not None:
+            loop.call_soon(consumer, self, None, properties, body)
+        elif mandatory:
+            for callback in self.broker.return_callbacks:
+                loop.call_soon(callback, self, None, properties, body)
+
+
+class FakeAsyncRabbitMQ:
+    """ stands in for the shared AMQP connection of the event loop """
+    call = staticmethod(AsyncRabbitMQ.call)
+    is_open = True
+
+    def __init__(self):
+        self.broker = FakeBroker()
+        self.channel = FakeChannel(self.broker)
+
+    async def open_channel(self) -> FakeChannel:
+        return FakeChannel(self.broker)
+
+
+class EchoEquipment(AsyncEquipment):
+    def _activate(self):
+        pass
+
+    def _deactivate(self):
+        pass
+
+    def _stop(self):
+        pass
+
+    def read_value(self) -> int:
+        return 1
+
+    async def write_echo(self, value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    @long_running
+    def write_slow(self, seconds: float) -> float:
+        time.sleep(seconds)  # blocking; runs on the worker pool
+        return seconds
+
+
+async def master_controller(rabbit: AsyncRabbitMQConnection, messages: list):
+    """ accepts registrations """
+    while True:
+        message = await rabbit.consume(1)
+        if message is None:
+            continue
+        messages.append(message)
+        if isinstance(message, RabbitMessageRegister):
+            rabbit.send(RabbitMessageReply.create_reply(message, True))
+
+
+async def run():
+    loop = asyncio.get_running_loop()
+    fake = FakeAsyncRabbitMQ()
+    AsyncRabbitMQ._instances[loop] = fake  # AsyncRabbitMQ.get() returns it
+    try:
+        controller = AsyncRabbitMQConnection("master_controller")
+        await controller.open()
+        messages = []
+        controller_task = asyncio.create_task(master_controller(controller, messages))
+
+        equipment = EchoEquipment("echo")
+        equipment_task = asyncio.create_task(equipment.activate())
+        tester = AsyncRabbitMQConnection("tester")
+        await tester.open()
+        await asyncio.sleep(0.1)
+        assert isinstance(messages[0], RabbitMessageRegister) and equipment.state == equipment.states.STANDBY
+
+        reply = await tester.send_and_consume(RabbitMessageAction("echo", "tester", "read_value"), error_out=True)
+        assert reply.value == 1
+        reply = await tester.send_and_consume(RabbitMessageAction("echo", "tester", "write_echo", kwargs={"value": 5}),
+                                              error_out=True)
+        assert reply.value == 5
+
+        # the loop keeps replying while the long-running action runs
+        start = time.perf_counter()
+        slow = asyncio.create_task(tester.send_and_consume(
+            RabbitMessageAction("echo", "tester", "write_slow", kwargs={"seconds": 0.3}), timeout=2, error_out=True))
+        await asyncio.sleep(0.02)
+        tester_two = AsyncRabbitMQConnection("tester_two")  # one waiting consume_replies() per connection
+        await tester_two.open()
+        reply = await tester_two.send_and_consume(RabbitMessageAction("echo", "tester_two", "read_value"),
+                                                  error_out=True)
+        assert reply.value == 1 and time.perf_counter() - start < 0.2
+        assert (await slow).value == 0.3 and time.perf_counter() - start >= 0.3
+
+        # the broker returns the message; no need to wait for the timeout
+        start = time.perf_counter()
+        try:
+            await tester.send_and_consume(RabbitMessageAction("missing", "tester", "read_value"), timeout=5)
+        except ValueError:
+            assert time.perf_counter() - start < 1
+        else:
+            raise AssertionError("message to missing queue did not raise")
+        assert not tester._waiting and not tester._returned
+
+        equipment.write_deactivate()
+        await asyncio.wait_for(equipment_task, 2)
+        await asyncio.sleep(0.05)
+        assert isinstance(messages[-1], RabbitMessageUnRegister)
+        controller_task.cancel()
+    finally:
+        AsyncRabbitMQ._instances.pop(loop, None)
+        AsyncRabbitMQ._locks.pop(loop, None)
+
+
+def check_coroutine_not_long_running():
+    try:
+        @long_running
+        async def write_x():
+            pass
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("long_running accepted a coroutine")
+
+
+def main():
+    check_coroutine_not_long_running()
+    asyncio.run(run())
+    asyncio.run(run())  # a new event loop works as well
+    print("checks: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Startup time of get_equipment_interface(): docstring parsing vs on-disk cache. The cache key changes when a parser
+module changes.
+"""
+import pathlib
+import shutil
+import tempfile
+import time
+
+from chembot.configuration import config
+from chembot.communication import PicoSerial
+from chembot.equipment.lights import LightPico
+from chembot.equipment.pumps import SyringePumpHarvard
+import chembot.equipment.equipment_interface as equipment_interface
+from chembot.equipment.equipment_interface import get_equipment_interface, parse_equipment_interface, \
+    get_class_hash, load_equipment_interface, EquipmentRegistry
+
+
+def check_parser_change():
+    """ an edited copy of the parser module stands in for an updated chembot """
+    hash_ = get_class_hash(LightPico)
+    parser_files = equipment_interface._PARSER_FILES
+    with tempfile.TemporaryDirectory() as folder:
+        file = pathlib.Path(folder) / "numpy_parser.py"
+        shutil.copy(parser_files[0], file)
+        try:
+            equipment_interface._PARSER_FILES = (str(file), parser_files[1])
+            assert get_class_hash(LightPico) == hash_
+            with open(file, "a") as f:
+                f.write("\n# changed\n")
+            equipment_interface._get_file_hash.cache_clear()
+            assert get_class_hash(LightPico) != hash_
+        finally:
+            equipment_interface._PARSER_FILES = parser_files
+            equipment_interface._get_file_hash.cache_clear()
+    print("parser change: new hash")
+
+
+def main(devices: int = 20):
+    classes = [PicoSerial, LightPico, SyringePumpHarvard]
+    classes = [classes[i % len(classes)] for i in range(devices)]  # as for a rig with 'devices' equipment
+
+    start = time.perf_counter()
+    for class_ in classes:
+        parse_equipment_interface(class_)
+    print(f"parse:  {(time.perf_counter() - start) * 1000:8.2f} ms for {devices} devices")
+
+    config.equipment_interface_cache = True
+    for class_ in set(classes):
+        get_equipment_interface(class_)  # fill on-disk cache
+
+    start = time.perf_counter()
+    for class_ in classes:
+        load_equipment_interface(get_class_hash(class_))
+    print(f"cached: {(time.perf_counter() - start) * 1000:8.2f} ms for {devices} devices")
+
+    # master controller side: only the hash is needed for known interfaces
+    registry = EquipmentRegistry()
+    for i, class_ in enumerate(classes):
+        interface = get_equipment_interface(class_)
+        assert registry.register_hash(f"device_{i}", interface.hash_)
+    assert not registry.register_hash("unknown", "0" * 40)
+    print(f"registered: {len(registry.equipment)}")
+    check_parser_change()
+
+
+if __name__ == "__main__":
+    main()
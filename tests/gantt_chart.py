@@ -0,0 +1,97 @@
+"""
+Gantt chart of a large schedule: build the rows (columns), the figure (one trace per row) and serialise it, for the
+whole chart and for a zoomed viewport.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from chembot.scheduler import Event, JobSequence
+from chembot.scheduler.schedular import Schedular
+from chembot.scheduler.vizualization.gantt_chart import Row, TimeBlock, merge_blocks, datetime_to_ms
+from chembot.scheduler.vizualization.gantt_chart_plot import ConfigPlot, create_gantt_chart
+from chembot.scheduler.vizualization.schedule_to_gantt_chart import schedule_to_gantt_chart
+
+
+def check_row():
+    """ blocks added one at a time come out sorted """
+    random.seed(0)
+    now = datetime(2023, 6, 1)
+    row = Row("row")
+    starts = [now + timedelta(seconds=random.randint(0, 1000)) for _ in range(500)]
+    for start in starts:
+        row.add_time_block(TimeBlock(start, start + timedelta(seconds=5)))
+    assert list(row.time_start) == list(datetime_to_ms(sorted(starts)))
+    assert [block.time_start for block in row.time_blocks] == sorted(starts)
+
+
+def check_merge_blocks():
+    """ merged blocks against a loop """
+    rng = np.random.default_rng(0)
+    time_start = np.sort(rng.uniform(0, 10_000, 2000))
+    time_end = time_start + rng.uniform(0, 20, 2000)
+    time_end[rng.random(2000) < 0.1] = np.nan
+    resolution = 5
+
+    expected = []
+    for start, end in zip(time_start, np.where(np.isnan(time_end), time_start, time_end)):
+        if expected and start - expected[-1][1] <= resolution:
+            expected[-1][1] = max(expected[-1][1], end)
+            expected[-1][2] += 1
+        else:
+            expected.append([start, end, 1])
+
+    merged = merge_blocks(time_start, time_end, resolution)
+    assert np.array_equal(np.column_stack(merged), np.array(expected))
+
+
+def make_schedular(events: int, resources: int) -> Schedular:
+    random.seed(0)
+    schedular = Schedular(pack_jobs=True)
+    schedular.add_jobs([
+        JobSequence([
+            Event(f"resource_{random.randrange(resources)}", "write_x", timedelta(seconds=random.randint(1, 30)))
+            for _ in range(10)
+        ])
+        for _ in range(events // 10)
+    ])
+    return schedular
+
+
+def benchmark(events: int = 50_000, resources: int = 10):
+    schedular = make_schedular(events, resources)
+    print(f"events: {sum(len(resource) for resource in schedular.schedule.resources)} | resources: {resources}")
+
+    start = time.perf_counter()
+    gantt_chart = schedule_to_gantt_chart(schedular.schedule)
+    print(f"\tschedule -> rows:      {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    config = ConfigPlot()
+    config_all = ConfigPlot()
+    config_all.max_blocks_per_row = events  # no decimation
+    x_min = gantt_chart.time_min
+    zoom = (x_min, x_min + gantt_chart.time_range / 100)
+    for label, x_range, config in (("all blocks", None, config_all), ("full", None, config),
+                                   ("zoomed (1 %)", zoom, config)):
+        start = time.perf_counter()
+        fig = create_gantt_chart(gantt_chart, config, x_range)
+        time_figure = time.perf_counter() - start
+        start = time.perf_counter()
+        json_ = fig.to_json()
+        time_json = time.perf_counter() - start
+        points = sum(len(trace.x) for trace in fig.data)
+        print(f"\t{label:<14} traces: {len(fig.data):3} | points: {points:8} | figure: {time_figure * 1000:8.1f} ms | "
+              f"to_json: {time_json * 1000:8.1f} ms | {len(json_) / 1e6:6.2f} MB")
+
+
+def main():
+    check_row()
+    check_merge_blocks()
+    print("checks: ok")
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cancel and move jobs in a large schedule; only the job's events are updated in the resource timelines.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from chembot.scheduler import Event, JobSequence
+from chembot.scheduler.schedular import Schedular
+
+
+def make_job(resources: int) -> JobSequence:
+    return JobSequence([
+        Event(f"resource_{random.randrange(resources)}", "write_x", timedelta(seconds=random.randint(1, 30)))
+        for _ in range(4)
+    ])
+
+
+def check(schedular: Schedular):
+    """ timelines sorted, no overlaps, queue ordered """
+    for resource in schedular.schedule.resources:
+        starts = [event.time_start_with_delay for event in resource.events]
+        assert starts == sorted(starts)
+        assert not resource.get_overlapping_events()
+    starts = [job.time_start for job in schedular.jobs_in_queue]
+    assert starts == sorted(starts)
+
+
+def check_move_dispatch():
+    """ a moved job is dispatched at its new time, not at the one it had when it was added """
+    schedular = Schedular()
+    job = JobSequence([Event("r1", "write_on", timedelta(seconds=1))])
+    schedular.add_job(job, datetime.now() + timedelta(seconds=0.2))
+    schedular.move_job(job, datetime.now() + timedelta(hours=1))
+    time.sleep(0.4)
+    assert schedular.get_events_to_run() == []
+    schedular.move_job(job, datetime.now())
+    assert [event.callable_ for event in schedular.get_events_to_run()] == ["write_on"]
+
+
+def main(jobs: int = 10_000, resources: int = 8, operations: int = 1000):
+    random.seed(0)
+    schedular = Schedular(pack_jobs=True)
+    job_list = [make_job(resources) for _ in range(jobs)]
+    schedular.add_jobs(job_list)
+    print(f"jobs: {len(schedular.jobs_in_queue)} | events: {sum(len(r) for r in schedular.schedule.resources)}")
+
+    random.shuffle(job_list)
+    start = time.perf_counter()
+    for job in job_list[:operations]:
+        schedular.remove_job(job.id_)
+    print(f"remove: {(time.perf_counter() - start) / operations * 1e6:8.1f} us/job")
+    check(schedular)
+
+    start = time.perf_counter()
+    for job in job_list[operations:2 * operations]:
+        schedular.move_job(job)  # to earliest free start (e.g. a hole left by a removed job)
+    print(f"move:   {(time.perf_counter() - start) / operations * 1e6:8.1f} us/job")
+    check(schedular)
+    print(f"jobs: {len(schedular.jobs_in_queue)} | events: {sum(len(r) for r in schedular.schedule.resources)}")
+
+    check_move_dispatch()
+    print("moved job dispatched at its new time: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Submission latency (validation against the existing schedule + add) as the queue grows to thousands of jobs.
+"""
+import random
+import time
+from datetime import timedelta
+
+from chembot.equipment.lights import LightPico
+from chembot.equipment.equipment_interface import EquipmentRegistry
+from chembot.scheduler import Event, JobSequence, Schedule, JobSubmitResult
+from chembot.scheduler.schedular import Schedular
+from chembot.scheduler.validate import validate_schedule
+
+
+def make_job(lights: int) -> JobSequence:
+    light = f"light_{random.randrange(lights)}"
+    return JobSequence([
+        Event(light, LightPico.write_on, timedelta(seconds=random.randint(1, 60))),
+        Event(light, LightPico.write_off, timedelta(seconds=1)),
+    ])
+
+
+def submit(schedular: Schedular, registry: EquipmentRegistry, job: JobSequence) -> JobSubmitResult:
+    """ same steps as MasterController.write_add_job """
+    result = JobSubmitResult(job.id_)
+    job.time_start = schedular.get_start_time(job)
+    validate_schedule(Schedule.from_job(job), registry, result, schedular.schedule)
+    if result.validation_success:
+        schedular.add_job(job, job.time_start)
+    return result
+
+
+def main(jobs: int = 5000, lights: int = 8, report_every: int = 1000):
+    random.seed(0)
+    registry = EquipmentRegistry()
+    for i in range(lights):
+        registry.register_equipment(f"light_{i}", LightPico)
+    schedular = Schedular(pack_jobs=True)
+
+    times = []
+    for i in range(1, jobs + 1):
+        job = make_job(lights)
+        start = time.perf_counter()
+        result = submit(schedular, registry, job)
+        times.append(time.perf_counter() - start)
+        if not result.validation_success:
+            print(result)
+        if i % report_every == 0:
+            print(f"queue: {i:6d} | submit: {sum(times) / len(times) * 1e6:8.1f} us/job")
+            times = []
+
+    # job forced onto a busy time is rejected with its conflicts
+    job = make_job(lights)
+    job.time_start = schedular.schedule.get_resources(job.events[0].resource).time_start
+    result = JobSubmitResult(job.id_)
+    validate_schedule(Schedule.from_job(job), registry, result, schedular.schedule)
+    print(f"forced overlap | validation_success: {result.validation_success} | conflicts: {result.conflicts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Job templates and sweeps: jobs built from a template match hand-built ones, duplicates are caught, and the size of
+the bulk submission message vs. the jobs themselves.
+"""
+import copy
+import pickle
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from chembot.configuration import config
+from chembot.scheduler import Event, JobSequence, JobConcurrent, JobTemplate, JobSweep, Parameter
+
+
+def blink(power: int, on_time: float, off_time: float) -> JobSequence:
+    """ how run scripts build jobs now """
+    return JobSequence(
+        [
+            Event("led", "write_power", timedelta(milliseconds=10), kwargs={"power": power}),
+            Event("led", "write_off", timedelta(milliseconds=10), delay=timedelta(seconds=on_time)),
+        ],
+        delay=timedelta(seconds=off_time),
+        name="blink"
+    )
+
+
+def blink_template() -> JobTemplate:
+    return JobTemplate(
+        JobSequence(
+            [
+                Event("led", "write_power", timedelta(milliseconds=10), kwargs={"power": Parameter("power")}),
+                Event("led", "write_off", timedelta(milliseconds=10), delay=Parameter("on_time")),
+            ],
+            delay=Parameter("off_time"),
+            name="blink"
+        )
+    )
+
+
+def check_template():
+    template = blink_template()
+    assert set(template.parameters) == {"power", "off_time", "on_time"}
+    sweep = JobSweep(template, power=np.arange(10), on_time=np.linspace(1, 2, 10), off_time=np.full(10, 0.5))
+    jobs = sweep.expand()
+    assert len(jobs) == len(sweep) == 10
+    for i, job in enumerate(jobs):
+        expected = blink(i, sweep.parameters["on_time"][i], 0.5)
+        assert job.duration == expected.duration and job.delay == expected.delay
+        assert [event.kwargs for event in job.iter_events()] == [event.kwargs for event in expected.iter_events()]
+        assert type(job.events[0].kwargs["power"]) is int
+        assert not job.get_duplicate_ids()
+    assert len({event.id_ for job in jobs for event in job.iter_events()}) == 20
+
+    grid = JobSweep.grid(template, power=[1, 2, 3], on_time=[1, 2], off_time=[0])
+    assert len(grid) == 6
+    assert [job.events[0].kwargs["power"] for job in grid] == [1, 1, 2, 2, 3, 3]
+
+    try:
+        JobSweep(template, power=[1, 2], on_time=[1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("missing parameter not caught")
+
+
+def check_duplicates():
+    event = Event("led", "write_off", timedelta(milliseconds=10))
+    JobSequence([event])
+    for events in ([event], ):
+        try:
+            JobSequence(events)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("event already in a job not caught")
+
+    event = Event("led", "write_off", timedelta(milliseconds=10))
+    try:
+        JobSequence([event, event])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("same event twice not caught")
+
+    job = blink(1, 1, 1)
+    job_copy = copy.deepcopy(job)  # same ids, different objects
+    assert len(JobConcurrent([job, job_copy]).get_duplicate_ids()) == 3
+
+
+def nested(depth: int, width: int) -> JobSequence:
+    if depth == 0:
+        return JobSequence([Event("led", "write_off", timedelta(milliseconds=10)) for _ in range(width)])
+    return JobSequence([nested(depth - 1, width) for _ in range(width)])
+
+
+def benchmark(jobs: int = 2000):
+    template = blink_template()
+    power = np.arange(jobs)
+    on_time = np.linspace(1, 2, jobs)
+
+    start = time.perf_counter()
+    job_list = [blink(int(power[i]), on_time[i], 0.5) for i in range(jobs)]
+    time_loop = time.perf_counter() - start
+    sweep = JobSweep(template, power=power, on_time=on_time, off_time=np.full(jobs, 0.5))
+    start = time.perf_counter()
+    sweep.expand()
+    time_sweep = time.perf_counter() - start
+    print(f"{jobs} jobs | loop: {time_loop * 1000:7.1f} ms | sweep.expand(): {time_sweep * 1000:7.1f} ms")
+
+    size_jobs = len(pickle.dumps(job_list, protocol=config.pickle_protocol))
+    size_sweep = len(pickle.dumps(sweep, protocol=config.pickle_protocol))
+    print(f"\tmessage: jobs {size_jobs / 1000:8.1f} kB | sweep {size_sweep / 1000:8.1f} kB")
+
+    start = time.perf_counter()
+    job = nested(4, 8)
+    print(f"nested job ({len(job)} events, depth 5): build {(time.perf_counter() - start) * 1000:7.1f} ms | "
+          f"duplicate check", end=" ")
+    start = time.perf_counter()
+    job.get_duplicate_ids()
+    print(f"{(time.perf_counter() - start) * 1000:7.1f} ms")
+
+
+def main():
+    check_template()
+    check_duplicates()
+    print("checks: ok")
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of absolute timing of all events in a job tree (computed in one pass and cached).
+"""
+import time
+from datetime import datetime, timedelta
+
+from chembot.scheduler import Event, JobSequence, JobConcurrent
+
+
+def make_job(n: int) -> JobSequence:
+    """ sequence of n/4 concurrent blocks with 4 events each """
+    blocks = []
+    for i in range(n // 4):
+        blocks.append(
+            JobConcurrent(
+                [Event(f"resource_{ii}", "write_x", timedelta(seconds=1), delay=timedelta(seconds=ii))
+                 for ii in range(4)]
+            )
+        )
+    job = JobSequence(blocks, delay=timedelta(seconds=2))
+    job.time_start = datetime.now()
+    return job
+
+
+def all_events(job):
+    for event in job.events:
+        if isinstance(event, Event):
+            yield event
+        else:
+            yield from all_events(event)
+
+
+def main(sizes=(1_000, 10_000, 100_000)):
+    for n in sizes:
+        job = make_job(n)
+        events = list(all_events(job))
+
+        start = time.perf_counter()
+        for event in events:
+            event.time_start_with_delay  # noqa
+        time_first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for event in events:
+            event.time_end  # noqa
+        time_cached = time.perf_counter() - start
+
+        job.delay = timedelta(seconds=5)  # invalidates timing
+        start = time.perf_counter()
+        job.time_end  # noqa
+        time_invalidated = time.perf_counter() - start
+
+        print(f"n: {n:7d} | first pass: {time_first * 1000:8.2f} ms | cached: {time_cached / n * 1e6:5.2f} us/event | "
+              f"after delay change: {time_invalidated * 1000:8.2f} ms | len: {len(job)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Job journal: the job queue rebuilt by replaying the journal matches the queue it was written from, and journaling an
+event dispatch costs only a queue put.
+"""
+import pathlib
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from chembot.master_controller.journal import JobJournal
+from chembot.scheduler import Event, JobSequence
+from chembot.scheduler.schedular import Schedular
+
+
+def make_job(resources: int) -> JobSequence:
+    return JobSequence([
+        Event(f"resource_{random.randrange(resources)}", "write_x", timedelta(seconds=random.randint(1, 30)),
+              kwargs={"value": random.random()})
+        for _ in range(4)
+    ])
+
+
+def restore(journal: JobJournal, pack_jobs: bool) -> Schedular:
+    """ what MasterController._restore_from_journal does """
+    schedular = Schedular(pack_jobs=pack_jobs)
+    state = journal.replay()
+    for id_job, job in state.jobs.items():
+        schedular.add_job(job, state.time_start[id_job])
+    schedular.restore_dispatched(state.dispatched)
+    return schedular
+
+
+def check(schedular: Schedular, restored: Schedular):
+    # order of jobs with the same time_start can differ (moved jobs are re-inserted after the others)
+    assert [(job.time_start, job.id_) for job in sorted(restored.jobs_in_queue, key=lambda job_: job_.id_)] == \
+        [(job.time_start, job.id_) for job in sorted(schedular.jobs_in_queue, key=lambda job_: job_.id_)]
+    assert sorted(job.id_ for job in restored.jobs_running) == sorted(job.id_ for job in schedular.jobs_running)
+    for resource in schedular.schedule.resources:
+        if resource.next_event is None:
+            continue
+        assert restored.schedule.get_resources(resource.name).next_event.id_ == resource.next_event.id_
+
+
+def consistency(path: pathlib.Path, operations: int = 2000, resources: int = 6):
+    random.seed(0)
+    now = [0]
+    schedular = Schedular(timer=lambda: now[0], pack_jobs=True)
+    journal = JobJournal(path)
+    journal.compact_every = 500
+    journal.start()
+
+    for _ in range(operations):
+        # jobs are placed after the (simulated) current time, as in the MasterController
+        time_now = datetime.fromtimestamp(now[0] + schedular._clock_offset)
+        schedular.delay = max(time_now - datetime.now(), timedelta(0)) + Schedular.delay
+        operation = random.random()
+        if operation < 0.5 or not schedular.jobs_in_queue:
+            job = make_job(resources)
+            schedular.add_job(job)
+            journal.add_job(job)
+        elif operation < 0.6:
+            job = schedular.remove_job(random.choice(schedular.jobs_in_queue + schedular.jobs_running))
+            journal.remove_job(job.id_)
+        elif operation < 0.7:
+            journal.move_job(schedular.move_job(random.choice(schedular.jobs_in_queue)))
+        else:
+            now[0] = schedular._to_timer(schedular.time_next_event)  # jump to the next event
+            for event in schedular.get_events_to_run():
+                journal.dispatch(event.id_job, event.id_)
+                if event.root.completed:
+                    journal.complete_job(event.id_job)
+
+    journal.close()
+    print(f"journal: {journal} | jobs in queue: {len(schedular.jobs_in_queue)} | "
+          f"running: {len(schedular.jobs_running)} | completed: {len(schedular.jobs_completed)}")
+    restored = restore(journal, pack_jobs=True)
+    check(schedular, restored)
+
+    records = journal.replay().records
+    journal.compact()
+    check(schedular, restore(journal, pack_jobs=True))
+    print(f"consistency: ok | records: {records} -> {journal.replay().records} after compaction")
+
+    journal.clear()
+    journal.start()
+    journal.close()
+    assert not journal.replay().jobs
+
+
+def benchmark(path: pathlib.Path, records: int = 20_000):
+    """ time the MasterController spends per dispatch record """
+    journal = JobJournal(path)
+    journal.start()
+    start = time.perf_counter()
+    for i in range(records):
+        journal.dispatch(i, i)
+    time_put = time.perf_counter() - start
+    journal.close()
+    time_total = time.perf_counter() - start
+    print(f"dispatch record: {time_put / records * 1e6:6.2f} us in the caller | "
+          f"{records / time_total:10.0f} records/s written")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        consistency(pathlib.Path(folder) / "journal.sqlite")
+        benchmark(pathlib.Path(folder) / "journal_benchmark.sqlite")
+
+
+if __name__ == "__main__":
+    main()
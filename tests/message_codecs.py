@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of RabbitMessage codecs: encode/decode time and size on the wire. Every codec's messages decode to
+the message sent, with either the codec or decode_message() (codec from the first byte).
+"""
+import timeit
+
+import numpy as np
+from unitpy import Quantity
+
+from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageAction, RabbitMessageReply, decode_message, \
+    get_codec
+
+
+def example_messages() -> dict:
+    action = RabbitMessageAction(
+        destination="pump_1",
+        source="master_controller",
+        action="write_infuse",
+        kwargs={"volume": Quantity("1.5 ml"), "flow_rate": Quantity("0.5 ml/min")},
+        id_job=12345
+    )
+    reply_float = RabbitMessageReply.create_reply(action, Quantity("0.5 ml/min"))
+    reply_spectra = RabbitMessageReply.create_reply(action, np.random.random(1754))  # ATIR.write_measure
+    return {"action": action, "reply (Quantity)": reply_float, "reply (ATIR spectra)": reply_spectra}
+
+
+def check_equal(message: RabbitMessage, decoded: RabbitMessage):
+    assert type(decoded) is type(message) and decoded.id_ == message.id_
+    if isinstance(message, RabbitMessageReply):
+        if isinstance(message.value, np.ndarray):
+            assert np.array_equal(decoded.value, message.value)
+        else:
+            assert decoded.value == message.value
+    else:
+        assert decoded.action == message.action and decoded.kwargs == message.kwargs
+
+
+def check_round_trip():
+    for codec_name in ("pickle", "pickle_buffer", "compact", "shared_memory"):
+        codec = get_codec(codec_name)
+        for message in example_messages().values():
+            data = codec.encode(message)
+            check_equal(message, codec.decode(data))
+            check_equal(message, decode_message(data))
+
+    # shared memory: the array is placed in a block and only a reference is sent
+    codec = get_codec("shared_memory")
+    message = example_messages()["reply (ATIR spectra)"]
+    data = codec.encode(message)
+    assert len(data) < message.value.nbytes
+    decoded = decode_message(data)
+    decoded.value[0] = -1  # a copy, not a view into the block
+    check_equal(message, decode_message(data))
+    codec.release_blocks(all_=True)
+    print("round trip: ok")
+
+
+def main(n: int = 10_000):
+    check_round_trip()
+    for label, message in example_messages().items():
+        print(label)
+        for codec_name in ("pickle", "pickle_buffer", "compact"):
+            codec = get_codec(codec_name)
+            data = codec.encode(message)
+            time_encode = timeit.timeit(lambda: codec.encode(message), number=n) / n * 1e6
+            time_decode = timeit.timeit(lambda: codec.decode(data), number=n) / n * 1e6
+            print(f"\t{codec_name:14}| size: {len(data):6} bytes | encode: {time_encode:6.2f} us | "
+                  f"decode: {time_decode:6.2f} us")
+
+
+if __name__ == "__main__":
+    main()
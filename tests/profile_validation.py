@@ -0,0 +1,46 @@
+"""
+Validation of a ContinuousEventHandlerProfile in an event's kwargs: every step of the profile is range checked (one
+numpy check per kwarg), so one step out of range is found.
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from chembot.scheduler import JobSequence, Event, Schedule, JobSubmitResult
+from chembot.scheduler.validate import validate_schedule
+from chembot.equipment.lights import LightPico
+from chembot.equipment.equipment_interface import EquipmentRegistry
+from chembot.equipment.continuous_event_handler import ContinuousEventHandlerProfile
+
+
+def validate_profile(power: np.ndarray) -> JobSubmitResult:
+    profile = ContinuousEventHandlerProfile(LightPico.write_power, ["power"], power,
+                                            np.linspace(0, 600, power.shape[0]))
+    job = JobSequence([
+        Event("red", LightPico.write_continuous_event_handler, timedelta(minutes=10), kwargs={"event_handler": profile})
+    ])
+    job.time_start = datetime.now()
+    schedule = Schedule.from_job(job)
+    result = JobSubmitResult(job.id_)
+    registry = EquipmentRegistry()
+    registry.register_equipment("red", LightPico)
+    validate_schedule(schedule, registry, result)
+    return result
+
+
+def main(n: int = 100_000):
+    power = np.random.randint(0, 65535, n)
+    result = validate_profile(power)
+    assert not result.errors, result.errors
+
+    power[n // 2] = 70_000
+    start = time.perf_counter()
+    result = validate_profile(power)
+    print(f"validate profile ({n} steps): {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(result.errors)
+    assert len(result.errors) == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Round-trip latency benchmark for the action -> reply path.
+
+'polling' mimics the old equipment loop (non-blocking consume + sleep(pulse)).
+'push' is the current equipment loop (consume blocks till a message arrives).
+
+Requires a RabbitMQ server running (see chembot/rabbitmq/README.md).
+"""
+import statistics
+import threading
+import time
+
+from chembot.rabbitmq.messages import RabbitMessageAction, RabbitMessageReply
+from chembot.rabbitmq.rabbit_core import RabbitMQConnection
+
+pulse = 0.01
+
+
+def responder(name: str, mode: str, n: int):
+    rabbit = RabbitMQConnection(name)
+    count = 0
+    while count < n:
+        if mode == "polling":
+            message = rabbit.consume()
+            if message is None:
+                time.sleep(pulse)
+                continue
+        else:
+            message = rabbit.consume(pulse)
+            if message is None:
+                continue
+
+        rabbit.send(RabbitMessageReply.create_reply(message, message.id_))
+        count += 1
+
+    rabbit.deactivate()
+
+
+def run(mode: str, n: int) -> list[float]:
+    name = "bench_responder_" + mode
+    thread = threading.Thread(target=responder, args=(name, mode, n))
+    thread.start()
+    time.sleep(0.5)  # let responder create its queue
+
+    rabbit = RabbitMQConnection("bench_requester_" + mode)
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        rabbit.send(RabbitMessageAction(name, rabbit.topic, "read_state"))
+        rabbit.consume(timeout=1, error_out=True)
+        times.append(time.perf_counter() - start)
+
+    thread.join()
+    rabbit.deactivate()
+    return times
+
+
+def main(n: int = 500):
+    for mode in ("polling", "push"):
+        times = run(mode, n)
+        times_ms = [t * 1000 for t in times]
+        print(f"{mode:8}: mean {statistics.mean(times_ms):6.2f} ms | median {statistics.median(times_ms):6.2f} ms | "
+              f"max {max(times_ms):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
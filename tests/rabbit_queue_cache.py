@@ -0,0 +1,43 @@
+"""
+Benchmark for RabbitMQConnection.send(check=True) with and without the queue cache.
+
+Requires a RabbitMQ server running (see chembot/rabbitmq/README.md).
+"""
+import time
+
+from chembot.rabbitmq.messages import RabbitMessageAction
+from chembot.rabbitmq.rabbit_core import RabbitMQConnection, queue_exists
+
+
+def send_messages(rabbit: RabbitMQConnection, destination: str, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        rabbit.send(RabbitMessageAction(destination, rabbit.topic, "read_state"))
+    end = time.perf_counter()
+    return n / (end - start)
+
+
+def http_check(destination: str, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        queue_exists(destination)
+    end = time.perf_counter()
+    return n / (end - start)
+
+
+def main(n: int = 1000):
+    destination = RabbitMQConnection("bench_destination")
+    rabbit_no_cache = RabbitMQConnection("bench_no_cache", queue_cache=False)
+    rabbit_cache = RabbitMQConnection("bench_cache", queue_cache=True)
+
+    print(f"http check (old):       {http_check(destination.topic, min(n, 100)):10.1f} checks/s")
+    print(f"send, queue cache off:  {send_messages(rabbit_no_cache, destination.topic, n):10.1f} messages/s")
+    print(f"send, queue cache on:   {send_messages(rabbit_cache, destination.topic, n):10.1f} messages/s")
+
+    rabbit_cache.deactivate()
+    rabbit_no_cache.deactivate()
+    destination.deactivate()
+
+
+if __name__ == "__main__":
+    main()
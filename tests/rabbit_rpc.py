@@ -0,0 +1,155 @@
+"""
+RabbitRPC on a RabbitMQConnection with an in-memory broker (no RabbitMQ server): replies arriving out of order and
+interleaved with other messages are matched to their futures, other messages are stashed for consume(), replies for
+later gathers are picked up from the stash, and the NMR fan-out (read_flow_rate of every pump) returns its values in
+order. The default timeout is read from the config at call time.
+"""
+import collections
+import heapq
+import itertools
+import random
+import time
+
+from unitpy import Quantity
+
+from chembot.configuration import config
+from chembot.rabbitmq.messages import RabbitMessage, RabbitMessageAction, RabbitMessageReply
+from chembot.rabbitmq.rabbit_core import RabbitMQConnection
+from chembot.rabbitmq.rabbit_rpc import RabbitRPC
+
+
+class FakeBroker:
+    """ answers every action after a random delay; delivers while the connection processes data events """
+    def __init__(self, rabbit: "FakeConnection", respond: callable):
+        self.rabbit = rabbit
+        self.connection = self  # channel.connection.process_data_events()
+        self.respond = respond  # action -> list of (delay, message)
+        self._pending: list[tuple[float, int, bytes]] = []
+        self._counter = itertools.count()
+
+    def basic_publish(self, exchange: str, routing_key: str, body: bytes, properties):
+        for delay, message in self.respond(RabbitMessage.from_bytes(body)):
+            heapq.heappush(self._pending, (time.monotonic() + delay, next(self._counter), message.to_bytes()))
+
+    def process_data_events(self, time_limit: float):
+        """ deliver what is due within time_limit; returns once something was delivered (like pika) """
+        deadline = time.monotonic() + time_limit
+        if self._pending and self._pending[0][0] <= deadline:
+            time.sleep(max(self._pending[0][0] - time.monotonic(), 0))
+            now = time.monotonic()
+            while self._pending and self._pending[0][0] <= now:
+                self.rabbit._on_message(self, None, None, heapq.heappop(self._pending)[2])
+            return
+        time.sleep(max(deadline - time.monotonic(), 0))
+
+
+class FakeConnection(RabbitMQConnection):
+    def __init__(self, topic: str, respond: callable):  # noqa: no broker connection
+        self.topic = topic
+        self.channel = FakeBroker(self, respond)
+        self.queue_cache = None
+        self._thread_id = None
+        self._messages = collections.deque()
+        self._stash = collections.deque()
+
+    def queue_exists(self, queue_name: str) -> bool:
+        return True
+
+
+def respond_shuffled(message: RabbitMessageAction) -> list[tuple[float, RabbitMessage]]:
+    """ reply after 0-50 ms, with an unrelated message before it now and then """
+    responses = [(random.uniform(0, 0.05), RabbitMessageReply.create_reply(message, message.kwargs["value"]))]
+    if random.random() < 0.5:
+        responses.append((random.uniform(0, 0.05), RabbitMessageAction("test", "other", "write_x")))
+    return responses
+
+
+def check_concurrent():
+    rabbit = FakeConnection("test", respond_shuffled)
+    rpc = RabbitRPC(rabbit)
+    messages = [RabbitMessageAction(f"pump_{i % 4}", "test", "read_x", kwargs={"value": i}) for i in range(50)]
+    start = time.perf_counter()
+    assert rpc.call(messages, timeout=2) == list(range(50))
+    assert time.perf_counter() - start < 0.5  # waits for the slowest reply, not the sum
+    assert rpc.number_of_pending == 0
+
+    # unrelated messages were stashed for consume()
+    others = 0
+    while (message := rabbit.consume(0.1)) is not None:
+        assert isinstance(message, RabbitMessageAction) and message.source == "other"
+        others += 1
+    print(f"concurrent: 50 replies matched | {others} other messages stashed")
+
+
+def check_stash():
+    def respond(message: RabbitMessageAction):
+        delay = 0.05 if message.kwargs["value"] == "slow" else 0
+        return [(delay, RabbitMessageReply.create_reply(message, message.kwargs["value"]))]
+
+    rabbit = FakeConnection("test", respond)
+    fast = RabbitMessageAction("pump", "test", "read_x", kwargs={"value": "fast"})
+    slow = RabbitMessageAction("pump", "test", "read_x", kwargs={"value": "slow"})
+    rpc = RabbitRPC(rabbit)
+    futures_fast = rpc.submit(fast)
+    futures_slow = rpc.submit(slow)
+    assert rpc.number_of_pending == 2
+
+    # gather the slow one first; the fast reply arrives meanwhile and is stashed
+    rpc.gather(futures_slow, timeout=1, error_out=True)
+    assert len(rabbit._stash) == 1 and rpc.number_of_pending == 1
+    start = time.perf_counter()
+    rpc.gather(futures_fast, timeout=0, error_out=True)  # from the stash, no wait
+    assert time.perf_counter() - start < 0.01
+    assert futures_fast[fast.id_].result() == "fast" and futures_slow[slow.id_].result() == "slow"
+    assert rpc.number_of_pending == 0 and not rabbit._stash
+
+    # missing reply: error_out, or None from call()
+    rabbit.channel.respond = lambda message: []
+    timeout = config.rabbit_queue_timeout
+    config.rabbit_queue_timeout = 0.1  # read at call time
+    try:
+        start = time.perf_counter()
+        assert rpc.call([RabbitMessageAction("pump", "test", "read_x")], error_out=False) == [None]
+        assert 0.1 <= time.perf_counter() - start < 0.5
+        try:
+            rpc.gather(error_out=True)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("missing reply did not raise")
+    finally:
+        config.rabbit_queue_timeout = timeout
+    print("stash: ok")
+
+
+def check_nmr_fan_out():
+    """ NMR.write_measure asks every pump for its flow rate and adds them up """
+    flow_rates = {"pump_one": "0.1 ml/min", "pump_two": "0.2 ml/min", "pump_three": "0 ml/min", "pump_four": "1 ml/min"}
+
+    def respond(message: RabbitMessageAction):
+        return [(random.uniform(0, 0.02), RabbitMessageReply.create_reply(message, Quantity(flow_rates[
+            message.destination])))]
+
+    rabbit = FakeConnection("nmr", respond)
+    pumps = list(flow_rates)
+    replies = RabbitRPC(rabbit).call(
+        [RabbitMessageAction(pump, "nmr", "read_flow_rate") for pump in pumps], timeout=3
+    )
+    assert [str(reply) for reply in replies] == [str(Quantity(flow_rates[pump])) for pump in pumps]
+    total = replies[0]
+    for reply in replies[1:]:
+        total += reply
+    assert abs(total.to("ml/min").v - 1.3) < 1e-9
+    print(f"nmr fan-out: {total}")
+
+
+def main():
+    random.seed(0)
+    check_concurrent()
+    check_stash()
+    check_nmr_fan_out()
+    print("checks: ok")
+
+
+if __name__ == "__main__":
+    main()
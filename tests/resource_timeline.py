@@ -0,0 +1,146 @@
+"""
+Resource timeline: random adds/removes match a brute force timeline (overlaps, free slots, time_end), and a benchmark
+of insert (random and in time order), remove + re-insert (moved job), overlap and next free slot queries for 10k -
+100k events, also with one long event in the timeline.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from chembot.scheduler import Event, JobConcurrent
+from chembot.scheduler.resource import Resource
+
+
+def make_events(n: int) -> list[Event]:
+    """ non-overlapping 1 s events with 1 s gaps, in random order """
+    time_start = datetime.now()
+    events = []
+    for i in range(n):
+        event = Event("pump", "write_infuse", timedelta(seconds=1))
+        JobConcurrent([event], time_start=time_start + timedelta(seconds=2 * i))
+        events.append(event)
+
+    random.shuffle(events)
+    return events
+
+
+def check_brute_force(operations: int = 3000):
+    random.seed(0)
+    time_start = datetime.now()
+    resource = Resource("pump")
+    resource_small = Resource("pump")
+    resource_small._events.load = resource_small._blocks.load = 4  # many buckets
+    events = []
+    for _ in range(operations):
+        if events and random.random() < 0.4:
+            event = events.pop(random.randrange(len(events)))
+            index = resource.remove_event(event)
+            assert resource_small.remove_event(event) == index
+        else:
+            event = Event("pump", "write_infuse", timedelta(seconds=random.choice((1, 5, 30, 600))))
+            JobConcurrent([event], time_start=time_start + timedelta(seconds=random.randint(0, 3000)))
+            events.append(event)
+            index = resource.add_event(event)
+            assert resource_small.add_event(event) == index
+
+        sorted_ = sorted(events, key=lambda event_: event_.time_start_with_delay)
+        time_ = time_start + timedelta(seconds=random.uniform(0, 3000))
+        time_end = time_ + timedelta(seconds=random.uniform(0, 60))
+        expected = {event.id_ for event in events if event.time_start_with_delay < time_end and event.time_end > time_}
+        duration = timedelta(seconds=random.uniform(0, 60))
+        for resource_ in (resource, resource_small):
+            assert [event.time_start_with_delay for event in resource_.events] == \
+                   [event.time_start_with_delay for event in sorted_]
+            assert {event.id_ for event in resource_.overlaps(time_, time_end)} == expected
+            assert resource_.is_free(time_, time_end) == (not expected)
+            slot = resource_.next_free_slot(time_, duration)
+            assert slot >= time_ and resource_.is_free(slot, slot + duration)
+            assert slot == time_ or not resource_.is_free(slot - timedelta(milliseconds=1), slot + duration)
+            assert resource_.time_end == max((event.time_end for event in events), default=None)
+    print("brute force: ok")
+
+
+def add_event_linear(events: list[Event], event: Event):
+    """ previous implementation: reverse linear scan """
+    for i, event_ in enumerate(reversed(events)):
+        if event.time_start > event_.time_start:
+            if i == 0:
+                events.append(event)
+            else:
+                events.insert(-i, event)
+            return
+
+    events.insert(0, event)
+
+
+def main(sizes=(10_000, 50_000, 100_000), queries: int = 10_000):
+    check_brute_force()
+    for n in sizes:
+        events = make_events(n)
+        resource = Resource("pump")
+
+        start = time.perf_counter()
+        for event in events:
+            resource.add_event(event)
+        time_insert = time.perf_counter() - start
+
+        # new jobs: each event after the last one
+        resource_append = Resource("pump")
+        events_sorted = sorted(events, key=lambda event_: event_.time_start_with_delay)
+        start = time.perf_counter()
+        for event in events_sorted:
+            resource_append.add_event(event)
+        time_append = time.perf_counter() - start
+
+        # moved jobs: remove and re-insert in the middle
+        moved = random.sample(events, min(n, queries))
+        start = time.perf_counter()
+        for event in moved:
+            resource.remove_event(event)
+            resource.add_event(event)
+        time_move = time.perf_counter() - start
+
+        time_start = resource.time_start
+        times = [time_start + timedelta(seconds=random.uniform(0, 2 * n)) for _ in range(queries)]
+        start = time.perf_counter()
+        for time_ in times:
+            resource.overlaps(time_, time_ + timedelta(seconds=1.5))
+        time_overlap = time.perf_counter() - start
+
+        # one long event at the start (e.g. a continuous event); queries elsewhere shouldn't slow down
+        long_event = Event("pump", "write_infuse", timedelta(seconds=2 * n))
+        JobConcurrent([long_event], time_start=time_start - timedelta(seconds=1))
+        resource.add_event(long_event)
+        start = time.perf_counter()
+        for time_ in times:
+            resource.overlaps(time_, time_ + timedelta(seconds=1.5))
+        time_overlap_long = time.perf_counter() - start
+        resource.remove_event(long_event)
+
+        start = time.perf_counter()
+        for time_ in times:
+            resource.next_free_slot(time_, timedelta(seconds=1))
+        time_free = time.perf_counter() - start
+
+        start = time.perf_counter()
+        conflicts = resource.get_overlapping_events()
+        time_conflicts = time.perf_counter() - start
+
+        print(f"n: {n:7d} | insert: {time_insert / n * 1e6:6.2f} us/event (in order: {time_append / n * 1e6:5.2f}) | "
+              f"move: {time_move / len(moved) * 1e6:6.2f} us/event | "
+              f"overlaps: {time_overlap / queries * 1e6:6.2f} us/query "
+              f"(long event: {time_overlap_long / queries * 1e6:6.2f}) | "
+              f"next_free_slot: {time_free / queries * 1e6:6.2f} us/query | "
+              f"all overlaps: {time_conflicts * 1000:7.2f} ms ({len(conflicts)} conflicts)")
+
+    # previous insert (only smallest size; O(n^2))
+    events = make_events(sizes[0])
+    list_ = []
+    start = time.perf_counter()
+    for event in events:
+        add_event_linear(list_, event)
+    print(f"n: {sizes[0]:7d} | insert (linear scan): {(time.perf_counter() - start) / sizes[0] * 1e6:6.2f} us/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Dispatch of events by Schedular: many resources due at the same time are all sent in one tick.
+"""
+import time
+from datetime import datetime, timedelta
+
+from chembot.scheduler import Event, JobSequence, JobConcurrent
+from chembot.scheduler.schedular import Schedular
+
+
+def main(resources: int = 100, events_per_resource: int = 100):
+    schedular = Schedular()
+    schedular.delay = timedelta(0)
+    job = JobSequence([
+        JobConcurrent([Event(f"resource_{i}", "write_x", timedelta(milliseconds=20)) for i in range(resources)])
+        for _ in range(events_per_resource)
+    ])
+    schedular.add_job(job)
+    print(f"events: {len(job)} | time_end: {job.time_end - job.time_start}")
+
+    ticks = 0
+    dispatched = 0
+    start = time.perf_counter()
+    while dispatched < len(job):
+        dispatched += len(schedular.get_events_to_run())
+        ticks += 1
+        wait = schedular.time_to_next_event
+        if wait is not None and wait > 0:
+            time.sleep(min(wait, 0.01))
+    print(f"dispatched: {dispatched} in {ticks} ticks ({time.perf_counter() - start:.3f} s)")
+    print(schedular.lateness)
+    for bin_, count in schedular.lateness.as_dict()["histogram"].items():
+        print(f"\t{bin_:>10}: {count}")
+    print(f"completed jobs: {len(schedular.jobs_completed)} | in queue: {len(schedular.jobs_in_queue)}")
+
+
+if __name__ == "__main__":
+    main()
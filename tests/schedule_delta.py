@@ -0,0 +1,137 @@
+"""
+Schedule deltas: a client copy (ScheduleTable) kept up to date with read_schedule_delta() must match the schedule,
+and the payload must be much smaller than sending the whole Schedular.
+"""
+import pickle
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from chembot.configuration import config
+from chembot.scheduler import Event, JobSequence
+from chembot.scheduler.schedular import Schedular
+from chembot.scheduler.schedule_delta import ScheduleTable
+
+
+def make_job(resources: int) -> JobSequence:
+    return JobSequence([
+        Event(f"resource_{random.randrange(resources)}", "write_x", timedelta(seconds=random.randint(1, 30)),
+              kwargs={"value": random.random(), "units": "ml/min"})
+        for _ in range(4)
+    ])
+
+
+def check(schedular: Schedular, table: ScheduleTable):
+    """ table has the same events (times, resource, name, sent) as the queued and running jobs of the schedule """
+    assert table.version == schedular.version
+    events = {}
+    for resource in schedular.schedule.resources:
+        for event in resource.events:
+            if not event.root.completed:
+                events[schedular.changes.get_key(event)] = event
+    assert len(schedular.changes._keys) == len(schedular.changes._events) == len(events)
+    assert len(table) == len(events) and len(np.unique(table.key)) == len(table)
+
+    for i, key in enumerate(table.key):
+        event = events[int(key)]
+        assert table.time_start[i] == event.time_start_with_delay.timestamp()
+        assert table.time_end[i] == event.time_end.timestamp()
+        assert table.resource[i] == event.resource
+        assert table.name[i] == event.name
+        assert table.id_job[i] == event.id_job
+        assert table.sent[i] == event.completed
+
+
+def consistency(jobs: int = 300, resources: int = 8, operations: int = 2000):
+    random.seed(0)
+    now = [0]
+    schedular = Schedular(timer=lambda: now[0], pack_jobs=True)
+    job_list = []
+    table = ScheduleTable()
+
+    for i in range(operations):
+        operation = random.random()
+        if operation < 0.5 or not schedular.jobs_in_queue:
+            job = make_job(resources)
+            job_list.append(job)
+            schedular.add_job(job)
+        elif operation < 0.7:
+            schedular.remove_job(random.choice(schedular.jobs_in_queue + schedular.jobs_running))
+        elif operation < 0.9:
+            schedular.move_job(random.choice(schedular.jobs_in_queue))
+        else:
+            now[0] = schedular._to_timer(schedular.time_next_event)  # jump to the next event
+            schedular.get_events_to_run()
+
+        if random.random() < 0.2:
+            table.apply(schedular.get_schedule_delta(table.version))
+            check(schedular, table)
+
+        if i == operations // 10:
+            schedular.changes.max_changes = 500  # old versions get full snapshots
+        if len(job_list) >= jobs:
+            break
+
+    table.apply(schedular.get_schedule_delta(table.version))
+    check(schedular, table)
+
+    schedular.clear_all_jobs()
+    delta = schedular.get_schedule_delta(table.version)
+    assert delta.full and len(delta) == 0
+    table.apply(delta)
+    check(schedular, table)
+    print("consistency: ok")
+
+
+def pruning(jobs: int = 200, resources: int = 8):
+    """ events of completed jobs leave the log (and the client table), so it doesn't grow with the jobs run """
+    random.seed(1)
+    now = [0]
+    schedular = Schedular(timer=lambda: now[0], pack_jobs=True)
+    schedular.add_jobs([make_job(resources) for _ in range(jobs)])
+    table = ScheduleTable()
+    table.apply(schedular.get_schedule_delta(table.version))
+    assert len(table) == 4 * jobs
+
+    sizes = []
+    while schedular.time_next_event is not None:
+        now[0] = schedular._to_timer(schedular.time_next_event)
+        schedular.get_events_to_run()
+        table.apply(schedular.get_schedule_delta(table.version))
+        check(schedular, table)
+        sizes.append(len(schedular.changes._keys))
+    assert len(schedular.jobs_completed) == jobs and sizes[-1] == 0 and len(table) == 0
+    assert len(schedular.changes.get_snapshot()) == 0
+    print(f"pruning: events in log {sizes[0]} -> {sizes[-1]} after {jobs} jobs completed")
+
+
+def payload(jobs: int = 2500, resources: int = 20):
+    """ bytes sent for the whole Schedular vs. a full snapshot vs. the delta after one job is added """
+    random.seed(0)
+    schedular = Schedular(pack_jobs=True)
+    schedular.add_jobs([make_job(resources) for _ in range(jobs)])
+    version = schedular.version
+    schedular.add_job(make_job(resources))
+    print(f"jobs: {jobs + 1} | events: {sum(len(r) for r in schedular.schedule.resources)}")
+
+    def measure(label: str, func):
+        start = time.perf_counter()
+        data = pickle.dumps(func(), protocol=config.pickle_protocol)
+        duration = time.perf_counter() - start
+        print(f"\t{label:<22} {len(data) / 1000:10.1f} kB | {duration * 1000:8.2f} ms")
+
+    measure("Schedular (pickle)", lambda: schedular)
+    measure("snapshot", lambda: schedular.get_schedule_delta(-1))
+    measure("delta (1 job added)", lambda: schedular.get_schedule_delta(version))
+
+
+def main():
+    consistency()
+    pruning()
+    payload()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark of Schedular job placement: serial (append to end) vs. packing jobs across resources.
+
+Synthetic workload: independent flow lines (pump -> valve -> sensor); each job runs on one line.
+Also checks that a high priority job is placed ahead of queued lower priority jobs on its resources (pack_jobs).
+"""
+import random
+import time
+from datetime import timedelta
+
+from chembot.scheduler import Event, JobSequence, JobConcurrent
+from chembot.scheduler.schedular import Schedular
+
+
+def make_job(lines: int) -> JobSequence:
+    line = random.randrange(lines)
+    return JobSequence(
+        [
+            JobConcurrent([
+                Event(f"pump_{line}", "write_infuse", timedelta(seconds=random.randint(10, 60))),
+                Event(f"valve_{line}", "write_move", timedelta(seconds=1)),
+            ]),
+            Event(f"sensor_{line}", "write_measure", timedelta(seconds=random.randint(5, 30)),
+                  delay=timedelta(seconds=random.randint(0, 10))),
+        ],
+        priority=random.randint(0, 2)
+    )
+
+
+def run(jobs: int, lines: int, pack_jobs: bool):
+    random.seed(0)
+    job_list = [make_job(lines) for _ in range(jobs)]
+    schedular = Schedular(pack_jobs=pack_jobs)
+
+    start = time.perf_counter()
+    schedular.add_jobs(job_list)
+    time_scheduling = time.perf_counter() - start
+
+    makespan = schedular.time_end - min(job.time_start for job in job_list)
+    conflicts = sum(len(resource.get_overlapping_events()) for resource in schedular.schedule.resources)
+    print(f"jobs: {jobs:5d} | lines: {lines:2d} | pack_jobs: {pack_jobs!s:5} | makespan: {str(makespan):>18} | "
+          f"scheduling: {time_scheduling * 1000:8.2f} ms | conflicts: {conflicts}")
+
+
+def check_priority():
+    schedular = Schedular(pack_jobs=True)
+    low = [JobSequence([Event("pump_0", "write_infuse", timedelta(seconds=60))]) for _ in range(5)]
+    other = JobSequence([Event("pump_1", "write_infuse", timedelta(seconds=60))])
+    schedular.add_jobs(low + [other])
+    starts = [job.time_start for job in low]
+    time_other = other.time_start
+
+    high = JobSequence([Event("pump_0", "write_infuse", timedelta(seconds=30))], priority=1)
+    moved = schedular.add_jobs([high])
+    assert high.time_start < min(job.time_start for job in low)
+    assert {job.id_ for job in moved} == {job.id_ for job in low}
+    assert all(job.time_start >= start for job, start in zip(low, starts))
+    assert [job.time_start for job in low] == sorted(job.time_start for job in low)  # order kept
+    assert other.time_start == time_other  # other resource: not moved
+    assert not schedular.schedule.get_resources("pump_0").get_overlapping_events()
+
+    # equal priority or without pack_jobs: after the queued jobs
+    for pack_jobs, priority in ((True, 0), (False, 1)):
+        schedular = Schedular(pack_jobs=pack_jobs)
+        schedular.add_jobs(low)
+        job = JobSequence([Event("pump_0", "write_infuse", timedelta(seconds=30))], priority=priority)
+        assert not schedular.add_jobs([job]) and job.time_start >= max(job_.time_end for job_ in low)
+    print("priority: high priority job placed ahead of 5 queued jobs")
+
+
+def main():
+    check_priority()
+    for jobs, lines in ((100, 1), (100, 4), (1000, 4), (1000, 16)):
+        run(jobs, lines, pack_jobs=False)
+        run(jobs, lines, pack_jobs=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of RabbitWatchdog.check_watchdogs() with 10k outstanding watchdogs.
+"""
+import time
+
+from chembot.rabbitmq.messages import RabbitMessageAction, RabbitMessageReply
+from chembot.rabbitmq.watchdog import RabbitWatchdog
+
+
+class FakeRabbit:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message, check: bool = True):
+        self.sent.append(message)
+
+
+class FakeParent:
+    name = "bench"
+
+    def __init__(self):
+        self.rabbit = FakeRabbit()
+
+
+def check_watchdogs_linear(watchdog: RabbitWatchdog):
+    """ previous implementation: scan of all watchdogs """
+    now = time.monotonic()
+    for id_, watchdog_ in watchdog.watchdogs.items():
+        if now > watchdog_.warn_time:
+            pass
+
+
+def main(n: int = 10_000, checks: int = 10_000):
+    parent = FakeParent()
+    watchdog = RabbitWatchdog(parent)
+
+    messages = [RabbitMessageAction("pump", "bench", "read_flow_rate") for _ in range(n)]
+    start = time.perf_counter()
+    for message in messages:
+        watchdog.set_watchdog(message, 60)
+    print(f"set {n} watchdogs: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    for _ in range(checks):
+        watchdog.check_watchdogs()
+    print(f"check (heap):   {(time.perf_counter() - start) / checks * 1e6:10.3f} us/check")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        check_watchdogs_linear(watchdog)
+    print(f"check (linear): {(time.perf_counter() - start) / 100 * 1e6:10.3f} us/check")
+
+    # deactivate half; rest expire
+    start = time.perf_counter()
+    for message in messages[:n // 2]:
+        watchdog.deactivate_watchdog(RabbitMessageReply.create_reply(message, None))
+    print(f"deactivate {n // 2} watchdogs: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    for watchdog_ in watchdog.watchdogs.values():
+        watchdog_.warn_time = 0
+    watchdog._heap = [(0, id_) for id_ in watchdog.watchdogs]
+    watchdog.check_watchdogs()
+    print(f"triggered: {len(parent.rabbit.sent)} (expected: {n - n // 2}) | remaining: {len(watchdog.watchdogs)}")
+
+
+if __name__ == "__main__":
+    main()